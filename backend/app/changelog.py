@@ -0,0 +1,141 @@
+"""
+Change log for delta sync (/sync).
+
+Every flush that inserts, updates or deletes a Match or Prediction through the
+ORM appends one change_log row per object, in the same transaction. Rows carry
+a server-assigned sequence (and, on PostgreSQL, the writing transaction's id),
+so clients sync from a watermark of what has committed instead of comparing
+their clock with ours. Statements that bypass the ORM unit of work (Core
+INSERT/UPDATE/DELETE) must call record() themselves.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import DDL, DateTime, event, func, literal, select, text
+from sqlalchemy.orm import Session
+
+from . import sql_models
+
+# Entities tracked by the change log, by model
+ENTITIES = {sql_models.Match: "match", sql_models.Prediction: "prediction"}
+
+# A first sync from a client timestamp compares it with updatedAt, stamped by
+# our clock when the change was made, not when it committed: the window is read
+# again so rows that committed late are not skipped.
+COMMIT_GRACE = timedelta(seconds=5)
+
+# PostgreSQL hands out sequence numbers before commit, so a later number can be
+# visible while an earlier one is still in flight. Each row records its
+# transaction instead, and watermarks are transaction ids (see watermark()).
+event.listen(
+    sql_models.ChangeLog.__table__,
+    "after_create",
+    DDL(
+        "ALTER TABLE change_log "
+        "ALTER COLUMN txid SET DEFAULT pg_current_xact_id()::text::bigint"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+def _row(entity: str, entity_id: str, user_id: Optional[str], deleted: bool, now):
+    return {
+        "entity": entity,
+        "entityId": entity_id,
+        "userId": user_id,
+        "deleted": deleted,
+        "changedAt": now,
+    }
+
+
+def record(
+    db: Session,
+    entity: str,
+    entity_ids: Iterable[str],
+    user_id: Optional[str] = None,
+    deleted: bool = False,
+) -> None:
+    """Log changes made with Core statements (not seen by the flush hook)."""
+    now = datetime.utcnow()
+    rows = [_row(entity, entity_id, user_id, deleted, now) for entity_id in entity_ids]
+    if rows:
+        db.execute(sql_models.ChangeLog.__table__.insert(), rows)
+
+
+def record_owned(db: Session, entity: str, owners: Dict[str, Optional[str]]) -> None:
+    """Like record(), for rows of several users: owners maps entity id to user id."""
+    now = datetime.utcnow()
+    rows = [
+        _row(entity, entity_id, user_id, False, now)
+        for entity_id, user_id in owners.items()
+    ]
+    if rows:
+        db.execute(sql_models.ChangeLog.__table__.insert(), rows)
+
+
+def record_query(db: Session, entity: str, owners) -> None:
+    """
+    Like record_owned(), for the (id, userId) rows of a SELECT, copied by the
+    database itself with INSERT ... SELECT.
+    """
+    owners = owners.subquery()
+    entity_id, user_id = owners.c
+    db.execute(
+        sql_models.ChangeLog.__table__.insert().from_select(
+            ["entity", "entityId", "userId", "deleted", "changedAt"],
+            select(
+                literal(entity),
+                entity_id,
+                user_id,
+                literal(False),
+                literal(datetime.utcnow(), DateTime),
+            ),
+        )
+    )
+
+
+def watermark(db: Session) -> int:
+    """
+    Position a client can safely resume from, compared with position():
+    everything at or below it has committed.
+
+    On PostgreSQL it is just below the xmin of the current snapshot: every
+    older transaction has finished, so all of its rows are visible, while
+    newer ones may still commit and are read again on the next sync. SQLite
+    serializes writers, so every sequence number already handed out is
+    committed.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        xmin = db.execute(
+            text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        ).scalar()
+        return xmin - 1
+    return db.execute(select(func.max(sql_models.ChangeLog.seq))).scalar() or 0
+
+
+def position(db: Session):
+    """The change_log column a watermark refers to."""
+    log = sql_models.ChangeLog
+    return log.txid if db.get_bind().dialect.name == "postgresql" else log.seq
+
+
+@event.listens_for(Session, "after_flush")
+def _log_flushed_changes(session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+    for objects, deleted in (
+        ((*session.new, *session.dirty), False),
+        (session.deleted, True),
+    ):
+        for obj in objects:
+            entity = ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            if not deleted and obj not in session.new and not session.is_modified(obj):
+                continue
+            rows.append(
+                _row(entity, obj.id, getattr(obj, "userId", None), deleted, now)
+            )
+
+    if rows:
+        session.connection().execute(sql_models.ChangeLog.__table__.insert(), rows)
@@ -1,5 +1,10 @@
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from . import sql_models, models, utils
+from . import changelog, sql_models, models, utils
+from .database import run_after_commit
+from .services.leaderboard import leaderboard
+import base64
 import uuid
 from datetime import datetime
 
@@ -22,6 +27,23 @@ def create_user(db: Session, user: models.User, password: str = None):
         db_user.password_hash = utils.get_password_hash(password)
 
     db.add(db_user)
+    # Every user gets a zeroed totals row so the ranking can read user_scores alone
+    db.add(sql_models.UserScore(userId=user.id))
+    run_after_commit(db, lambda: leaderboard.add_user(user.id, user.name, user.avatar))
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+def update_user_avatar(db: Session, user_id: str, avatar: str):
+    db_user = get_user(db, user_id)
+    if db_user is None:
+        return None
+    db_user.avatar = avatar
+    # The in-memory leaderboard caches names and avatars for /ranking
+    run_after_commit(
+        db, lambda: leaderboard.update_profile(user_id, db_user.name, avatar)
+    )
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -32,6 +54,84 @@ def get_matches(db: Session, status: str = None):
     query = db.query(sql_models.Match)
     if status:
         query = query.filter(sql_models.Match.status == status)
+    return query.order_by(sql_models.Match.date, sql_models.Match.id).all()
+
+
+# Match keyset cursors encode (date, id), the order of the ix_matches_* indexes
+def encode_match_cursor(match) -> str:
+    raw = f"{match.date.isoformat()}|{match.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_match_cursor(cursor: str) -> tuple:
+    """Raises ValueError if the cursor is malformed."""
+    try:
+        date, match_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        )
+        return datetime.fromisoformat(date), match_id
+    except Exception as e:
+        raise ValueError(f"Invalid match cursor: {cursor}") from e
+
+
+def get_matches_with_predictions(
+    db: Session,
+    user_id: str,
+    status: str = None,
+    date_from: datetime = None,
+    date_to: datetime = None,
+    stage: str = None,
+    group: str = None,
+    limit: int = None,
+    after: str = None,
+    match_ids=None,
+):
+    """
+    Matches LEFT OUTER JOIN the user's predictions, in one statement,
+    ordered by (date, id).
+
+    Args:
+        date_from: Only matches at or after this time
+        date_to: Only matches before this time (exclusive)
+        limit: Page size
+        after: Cursor of the last match of the previous page
+        match_ids: Only these matches
+
+    Returns:
+        (match, prediction or None) pairs
+
+    Raises:
+        ValueError: If after is not a valid cursor
+    """
+    match = sql_models.Match
+    prediction = sql_models.Prediction
+    query = db.query(match, prediction).outerjoin(
+        prediction,
+        and_(prediction.matchId == match.id, prediction.userId == user_id),
+    )
+    if status:
+        query = query.filter(match.status == status)
+    if stage:
+        query = query.filter(match.stage == stage)
+    if group:
+        query = query.filter(match.group == group)
+    if match_ids is not None:
+        query = query.filter(match.id.in_(match_ids))
+    if date_from:
+        query = query.filter(match.date >= date_from)
+    if date_to:
+        query = query.filter(match.date < date_to)
+    if after:
+        date, match_id = decode_match_cursor(after)
+        # The redundant date bound lets the planner seek on the index prefix
+        query = query.filter(
+            match.date >= date,
+            or_(match.date > date, match.id > match_id),
+        )
+
+    query = query.order_by(match.date, match.id)
+    if limit:
+        query = query.limit(limit)
     return query.all()
 
 
@@ -39,6 +139,13 @@ def get_match(db: Session, match_id: str):
     return db.query(sql_models.Match).filter(sql_models.Match.id == match_id).first()
 
 
+def get_matches_by_ids(db: Session, match_ids) -> dict:
+    matches = db.query(sql_models.Match).filter(
+        sql_models.Match.id.in_(list(match_ids))
+    )
+    return {match.id: match for match in matches}
+
+
 def create_match(db: Session, match: models.Match):
     db_match = sql_models.Match(
         id=match.id,
@@ -88,25 +195,865 @@ def get_prediction(db: Session, match_id: str, user_id: str):
     )
 
 
-def create_prediction(db: Session, prediction: models.Prediction):
-    existing = get_prediction(db, prediction.matchId, prediction.userId)
-    if existing:
-        existing.homeScore = prediction.homeScore
-        existing.awayScore = prediction.awayScore
-        db.commit()
-        db.refresh(existing)
-        return existing
+def get_user_predictions_by_match(db: Session, user_id: str) -> dict:
+    """All of the user's predictions keyed by matchId."""
+    predictions = db.query(sql_models.Prediction).filter(
+        sql_models.Prediction.userId == user_id
+    )
+    return {prediction.matchId: prediction for prediction in predictions}
+
 
-    db_prediction = sql_models.Prediction(
-        id=prediction.id,
-        matchId=prediction.matchId,
-        userId=prediction.userId,
-        homeScore=prediction.homeScore,
-        awayScore=prediction.awayScore,
-        points=prediction.points,
-        createdAt=datetime.utcnow(),
+def get_user_prediction_ids(db: Session, user_id: str, match_ids) -> dict:
+    """Ids of the user's saved predictions for match_ids, keyed by matchId."""
+    table = sql_models.Prediction.__table__
+    rows = db.execute(
+        select(table.c.matchId, table.c.id).where(
+            table.c.userId == user_id, table.c.matchId.in_(list(match_ids))
+        )
     )
-    db.add(db_prediction)
+    return dict(rows.all())
+
+
+def get_user_predictions(db: Session, user_id: str, prediction_ids) -> list:
+    return (
+        db.query(sql_models.Prediction)
+        .filter(
+            sql_models.Prediction.userId == user_id,
+            sql_models.Prediction.id.in_(prediction_ids),
+        )
+        .all()
+    )
+
+
+def predictions_export_query():
+    """
+    Every prediction with its player and match, for the admin export. Ordered
+    by (userId, matchId), the unique index, so the database needs no sort.
+    """
+    prediction = sql_models.Prediction
+    match = sql_models.Match
+    user = sql_models.User
+    return (
+        select(
+            prediction.id.label("predictionId"),
+            prediction.userId,
+            user.name.label("userName"),
+            user.email.label("userEmail"),
+            prediction.matchId,
+            match.matchNumber,
+            match.stage,
+            match.homeTeam,
+            match.awayTeam,
+            match.date.label("matchDate"),
+            match.status.label("matchStatus"),
+            prediction.homeScore.label("predictedHomeScore"),
+            prediction.awayScore.label("predictedAwayScore"),
+            match.homeScore.label("homeScore"),
+            match.awayScore.label("awayScore"),
+            prediction.points,
+            prediction.pointsBreakdown,
+            prediction.createdAt,
+            prediction.updatedAt,
+        )
+        .join(user, user.id == prediction.userId)
+        .join(match, match.id == prediction.matchId)
+        .order_by(prediction.userId, prediction.matchId)
+    )
+
+
+# Points notifications. Stream event ids encode (updatedAt, id) of the scored
+# prediction, the order of ix_predictions_user_updated_at
+def encode_notification_id(updated_at: datetime, prediction_id: str) -> str:
+    raw = f"{updated_at.isoformat()}|{prediction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_notification_id(event_id: str) -> tuple:
+    """Raises ValueError if the event id is malformed."""
+    try:
+        updated_at, prediction_id = (
+            base64.urlsafe_b64decode(event_id.encode()).decode().split("|", 1)
+        )
+        return datetime.fromisoformat(updated_at), prediction_id
+    except Exception as e:
+        raise ValueError(f"Invalid notification id: {event_id}") from e
+
+
+def _mark_notified(user_id: str):
+    table = sql_models.Prediction.__table__
+    # Keeps updatedAt: it is the event id a notification stream resumes from
+    return (
+        table.update()
+        .values(notified=True, updatedAt=table.c.updatedAt)
+        .execution_options(versioning_user_id=user_id)
+    )
+
+
+def acknowledge_unnotified_predictions(db: Session, user_id: str) -> list:
+    """
+    Fetch the user's scored predictions that were not notified yet and mark
+    them as notified, atomically: concurrent callers (two tabs) never both get
+    the same prediction. One UPDATE ... RETURNING statement. Commits.
+
+    Returns:
+        Prediction row mappings, oldest first
+    """
+    table = sql_models.Prediction.__table__
+    unnotified = and_(
+        table.c.userId == user_id,
+        table.c.points.isnot(None),
+        table.c.notified == False,  # noqa: E712
+    )
+    if db.get_bind().dialect.update_returning:
+        rows = [
+            dict(row)
+            for row in db.execute(
+                _mark_notified(user_id).where(unnotified).returning(*table.c)
+            ).mappings()
+        ]
+    else:
+        # SQLite before 3.35 has no RETURNING: claim the rows one by one, and
+        # keep only those this statement flipped
+        rows = []
+        for row in db.execute(select(table).where(unnotified)).mappings():
+            claimed = db.execute(
+                _mark_notified(user_id).where(
+                    table.c.id == row["id"],
+                    table.c.notified == False,  # noqa: E712
+                )
+            )
+            if claimed.rowcount == 1:
+                rows.append(dict(row, notified=True))
+
+    if rows:
+        changelog.record(db, "prediction", [row["id"] for row in rows], user_id)
     db.commit()
-    db.refresh(db_prediction)
-    return db_prediction
+    return sorted(rows, key=lambda row: (row["updatedAt"], row["id"]))
+
+
+def take_points_notifications(db: Session, user_id: str, after: str = None) -> list:
+    """
+    Scored predictions to push to the user, oldest first, marked as notified.
+    Without after, the ones not notified yet. With after (the Last-Event-ID of
+    a reconnecting stream), every one scored since that event, notified or
+    not, since the stream may have dropped it after sending. Commits.
+
+    Returns:
+        Prediction row mappings (notified already set)
+
+    Raises:
+        ValueError: If after is not a valid notification id
+    """
+    if not after:
+        return acknowledge_unnotified_predictions(db, user_id)
+
+    table = sql_models.Prediction.__table__
+    updated_at, prediction_id = decode_notification_id(after)
+    rows = (
+        db.execute(
+            select(table)
+            .where(
+                table.c.userId == user_id,
+                table.c.points.isnot(None),
+                table.c.updatedAt >= updated_at,
+                or_(table.c.updatedAt > updated_at, table.c.id > prediction_id),
+            )
+            .order_by(table.c.updatedAt, table.c.id)
+        )
+        .mappings()
+        .all()
+    )
+
+    pending = [row["id"] for row in rows if not row["notified"]]
+    if pending:
+        db.execute(
+            _mark_notified(user_id).where(
+                table.c.id.in_(pending), table.c.notified == False  # noqa: E712
+            )
+        )
+        changelog.record(db, "prediction", pending, user_id)
+    db.commit()
+    return [dict(row, notified=True) for row in rows]
+
+
+# Delta sync
+def get_changes_since(
+    db: Session, user_id: str, since_seq: int = None, since_time: datetime = None
+):
+    """
+    Matches and user's predictions changed after a watermark, and deletions.
+
+    With since_seq the change log is read. With since_time the indexed
+    updatedAt columns are read instead, which also covers changes made
+    before the change log existed; deletions still come from the log.
+
+    Returns:
+        (match_ids, prediction_ids, deleted) where deleted holds
+        (entity, id) pairs
+    """
+    log = sql_models.ChangeLog
+    visible = or_(log.userId.is_(None), log.userId == user_id)
+    deleted_by_key = {}
+
+    if since_seq is not None:
+        changes = db.execute(
+            select(log.entity, log.entityId, log.deleted)
+            .where(changelog.position(db) > since_seq, visible)
+            .order_by(log.seq)
+        )
+        # The latest change of each entity wins
+        for entity, entity_id, deleted in changes:
+            deleted_by_key[(entity, entity_id)] = deleted
+    else:
+        match = sql_models.Match
+        prediction = sql_models.Prediction
+        for (match_id,) in db.execute(
+            select(match.id).where(match.updatedAt >= since_time)
+        ):
+            deleted_by_key[("match", match_id)] = False
+        for (prediction_id,) in db.execute(
+            select(prediction.id).where(
+                prediction.userId == user_id, prediction.updatedAt >= since_time
+            )
+        ):
+            deleted_by_key[("prediction", prediction_id)] = False
+        for entity, entity_id in db.execute(
+            select(log.entity, log.entityId).where(
+                log.changedAt >= since_time, log.deleted.is_(True), visible
+            )
+        ):
+            deleted_by_key[(entity, entity_id)] = True
+
+    match_ids, prediction_ids, deleted = [], [], []
+    for (entity, entity_id), is_deleted in deleted_by_key.items():
+        if is_deleted:
+            deleted.append((entity, entity_id))
+        elif entity == "match":
+            match_ids.append(entity_id)
+        else:
+            prediction_ids.append(entity_id)
+    return match_ids, prediction_ids, deleted
+
+
+# Predictions are saved with a native upsert on the (userId, matchId) unique
+# index: one INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement, so
+# concurrent saves from two tabs cannot create duplicates.
+_DIALECT_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _upsert_statement(db: Session, rows: list):
+    """INSERT ... ON CONFLICT (userId, matchId) DO UPDATE ... RETURNING for rows."""
+    table = sql_models.Prediction.__table__
+    insert = _DIALECT_INSERT[db.get_bind().dialect.name]
+    statement = insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.userId, table.c.matchId],
+        set_={
+            "homeScore": statement.excluded.homeScore,
+            "awayScore": statement.excluded.awayScore,
+            "updatedAt": statement.excluded.updatedAt,
+        },
+    ).returning(*table.c)
+
+
+def _upsert_predictions(db: Session, user_id: str, rows: list) -> list:
+    """
+    Insert rows, or update the scores of the user's existing predictions for
+    the same matches. Does not commit.
+
+    Returns:
+        (models.Prediction, created) pairs in rows order
+    """
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault("id", str(uuid.uuid4()))
+        row.update(userId=user_id, createdAt=now, updatedAt=now)
+
+    # Only this user's cached responses depend on the rows written
+    statement = _upsert_statement(db, rows).execution_options(
+        versioning_user_id=user_id
+    )
+    saved = {row["matchId"]: row for row in db.execute(statement).mappings()}
+    # Core statements bypass the flush hook that feeds /sync
+    changelog.record(db, "prediction", [row["id"] for row in saved.values()], user_id)
+
+    return [
+        (
+            models.Prediction.model_validate(dict(saved[row["matchId"]])),
+            # createdAt keeps its old value when the row already existed
+            saved[row["matchId"]]["createdAt"] == now,
+        )
+        for row in rows
+    ]
+
+
+def save_buffered_predictions(db: Session, rows: list) -> int:
+    """
+    Upsert predictions of many users in one statement and commit (the
+    write-behind flush of services.prediction_buffer). Each row carries id,
+    userId, matchId, homeScore and awayScore; (userId, matchId) must be unique
+    within rows.
+
+    Returns:
+        Number of rows written
+    """
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    rows = [dict(row, createdAt=now, updatedAt=now) for row in rows]
+    statement = _upsert_statement(db, rows).execution_options(
+        versioning_user_ids={row["userId"] for row in rows}
+    )
+    saved = db.execute(statement).mappings().all()
+    changelog.record_owned(
+        db, "prediction", {row["id"]: row["userId"] for row in saved}
+    )
+    db.commit()
+    return len(saved)
+
+
+def create_prediction(db: Session, prediction: models.Prediction) -> models.Prediction:
+    """Create the prediction, or update the scores of the existing one."""
+    [(saved, _)] = _upsert_predictions(
+        db,
+        prediction.userId,
+        [
+            {
+                "id": prediction.id,
+                "matchId": prediction.matchId,
+                "homeScore": prediction.homeScore,
+                "awayScore": prediction.awayScore,
+                "points": prediction.points,
+            }
+        ],
+    )
+    db.commit()
+    return saved
+
+
+def upsert_predictions(db: Session, user_id: str, scores: dict) -> list:
+    """
+    Create or update the user's predictions for several matches in a single
+    statement and transaction.
+
+    Args:
+        scores: {matchId: (homeScore, awayScore)}
+
+    Returns:
+        (prediction, created) pairs in scores order
+    """
+    saved = _upsert_predictions(
+        db,
+        user_id,
+        [
+            {"matchId": match_id, "homeScore": home_score, "awayScore": away_score}
+            for match_id, (home_score, away_score) in scores.items()
+        ],
+    )
+    db.commit()
+    return saved
+
+
+def get_match_scorelines(db: Session, match_id: str) -> list:
+    """(homeScore, awayScore, count) of the match's crowd histogram, most picked first."""
+    table = sql_models.MatchScoreline.__table__
+    return db.execute(
+        select(table.c.homeScore, table.c.awayScore, table.c.count)
+        .where(table.c.matchId == match_id, table.c.count > 0)
+        .order_by(table.c.count.desc(), table.c.homeScore, table.c.awayScore)
+    ).all()
+
+
+# Ranking
+def user_totals_query():
+    """
+    Aggregate every user's totals straight from the predictions table
+    (users LEFT JOIN predictions GROUP BY user). Exposes the same columns as
+    user_scores: userId, points, correctPredictions, exactPredictions.
+    """
+    prediction = sql_models.Prediction
+    return (
+        select(
+            sql_models.User.id.label("userId"),
+            func.coalesce(func.sum(prediction.points), 0).label("points"),
+            func.count(case((prediction.points > 0, 1))).label("correctPredictions"),
+            func.count(case((prediction.pointsBreakdown == "exact_result", 1))).label(
+                "exactPredictions"
+            ),
+        )
+        .select_from(sql_models.User)
+        .outerjoin(prediction, prediction.userId == sql_models.User.id)
+        .group_by(sql_models.User.id)
+    )
+
+
+def _score_columns(totals):
+    return (totals.c.points, totals.c.exactPredictions, totals.c.correctPredictions)
+
+
+def _ranking_order(totals, reverse=False):
+    """ORDER BY for the ranking; reverse walks it bottom-up."""
+    if reverse:
+        return (*(c.asc() for c in _score_columns(totals)), totals.c.userId.desc())
+    return (*(c.desc() for c in _score_columns(totals)), totals.c.userId.asc())
+
+
+def _ranking_select(totals, *extra_columns):
+    user = sql_models.User
+    return (
+        select(
+            user.id.label("userId"),
+            user.name,
+            user.avatar,
+            totals.c.points,
+            totals.c.correctPredictions,
+            totals.c.exactPredictions,
+            *extra_columns,
+        )
+        .select_from(totals)
+        .join(user, user.id == totals.c.userId)
+    )
+
+
+def ranking_query(totals=None):
+    """
+    Build the ranking as a single statement with a RANK() window for positions.
+
+    Users are ordered by points, then exact results, then correct predictions;
+    users tied on all three share a position. userId is the final ORDER BY key
+    so the row order is deterministic. Works on SQLite (>= 3.25) and PostgreSQL.
+
+    Args:
+        totals: Selectable with userId/points/correctPredictions/exactPredictions.
+            Defaults to the materialized user_scores table; pass
+            user_totals_query().subquery() to aggregate predictions instead.
+    """
+    if totals is None:
+        totals = sql_models.UserScore.__table__
+
+    position = func.rank().over(order_by=[c.desc() for c in _score_columns(totals)])
+    return _ranking_select(totals, position.label("position")).order_by(
+        *_ranking_order(totals)
+    )
+
+
+def ranking_export_query():
+    """The ranking with each player's email, for the admin export."""
+    return ranking_query().add_columns(sql_models.User.email)
+
+
+def get_ranking(db: Session, totals=None):
+    return db.execute(ranking_query(totals)).mappings().all()
+
+
+# Per-stage rollups (user_stage_scores)
+def user_stage_totals_query():
+    """
+    Aggregate each user's scored predictions per match stage straight from
+    predictions JOIN matches. Same columns as user_stage_scores.
+    """
+    prediction = sql_models.Prediction
+    match = sql_models.Match
+    return (
+        select(
+            prediction.userId,
+            match.stage,
+            func.sum(prediction.points).label("points"),
+            func.count(case((prediction.points > 0, 1))).label("correctPredictions"),
+            func.count(case((prediction.pointsBreakdown == "exact_result", 1))).label(
+                "exactPredictions"
+            ),
+        )
+        .join(match, match.id == prediction.matchId)
+        .where(prediction.points.isnot(None), match.stage.isnot(None))
+        .group_by(prediction.userId, match.stage)
+    )
+
+
+def _stage_totals(stage: str):
+    stage_scores = sql_models.UserStageScore.__table__
+    return select(stage_scores).where(stage_scores.c.stage == stage).subquery()
+
+
+def get_stage_ranking(db: Session, stage: str, limit: int = None):
+    """Ranking of the points earned in one stage, with RANK() positions."""
+    query = ranking_query(_stage_totals(stage))
+    if limit is not None:
+        query = query.limit(limit)
+    return db.execute(query).mappings().all()
+
+
+def get_user_stage_scores(db: Session, user_id: str) -> list:
+    """
+    The user's totals for every stage they have scored predictions in, with
+    their position in each stage ranking (1 + users with a better score in
+    that stage, counted on ix_user_stage_scores_rank). Earliest stage first.
+    """
+    mine = sql_models.UserStageScore.__table__.alias("mine")
+    other = sql_models.UserStageScore.__table__.alias("other")
+    better = (
+        select(func.count())
+        .select_from(other)
+        .where(
+            other.c.stage == mine.c.stage,
+            or_(
+                other.c.points > mine.c.points,
+                and_(
+                    other.c.points == mine.c.points,
+                    or_(
+                        other.c.exactPredictions > mine.c.exactPredictions,
+                        and_(
+                            other.c.exactPredictions == mine.c.exactPredictions,
+                            other.c.correctPredictions > mine.c.correctPredictions,
+                        ),
+                    ),
+                ),
+            ),
+        )
+        .scalar_subquery()
+    )
+    first_match = (
+        select(func.min(sql_models.Match.date))
+        .where(sql_models.Match.stage == mine.c.stage)
+        .scalar_subquery()
+    )
+    rows = db.execute(
+        select(
+            mine.c.stage,
+            mine.c.points,
+            mine.c.correctPredictions,
+            mine.c.exactPredictions,
+            (better + 1).label("position"),
+        )
+        .where(mine.c.userId == user_id)
+        .order_by(first_match, mine.c.stage)
+    )
+    return rows.mappings().all()
+
+
+# Keyset pagination over user_scores. A ranking key is
+# (points, exactPredictions, correctPredictions, userId), the same order as
+# ix_user_scores_rank, so every query below is an index range scan.
+def _ranking_key(row) -> tuple:
+    return (
+        row["points"],
+        row["exactPredictions"],
+        row["correctPredictions"],
+        row["userId"],
+    )
+
+
+def encode_ranking_cursor(row) -> str:
+    raw = "|".join(str(part) for part in _ranking_key(row))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_ranking_cursor(cursor: str) -> tuple:
+    """Raises ValueError if the cursor is malformed."""
+    try:
+        points, exact, correct, user_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 3)
+        )
+        return (int(points), int(exact), int(correct), user_id)
+    except Exception as e:
+        raise ValueError(f"Invalid ranking cursor: {cursor}") from e
+
+
+def _scores_better_than(key):
+    """Rows with a strictly better score (they rank above key)."""
+    scores = sql_models.UserScore.__table__
+    points, exact, correct, _ = key
+    return or_(
+        scores.c.points > points,
+        and_(
+            scores.c.points == points,
+            or_(
+                scores.c.exactPredictions > exact,
+                and_(
+                    scores.c.exactPredictions == exact,
+                    scores.c.correctPredictions > correct,
+                ),
+            ),
+        ),
+    )
+
+
+def _scores_ordered_before(key):
+    """Rows listed before key in ranking order (better score, or tied with lower userId)."""
+    scores = sql_models.UserScore.__table__
+    points, exact, correct, user_id = key
+    tied = and_(
+        scores.c.points == points,
+        scores.c.exactPredictions == exact,
+        scores.c.correctPredictions == correct,
+    )
+    # The redundant points bound lets the planner seek on the index prefix
+    return and_(
+        scores.c.points >= points,
+        or_(_scores_better_than(key), and_(tied, scores.c.userId < user_id)),
+    )
+
+
+def _scores_ordered_after(key):
+    """Rows listed after key in ranking order."""
+    scores = sql_models.UserScore.__table__
+    points, exact, correct, user_id = key
+    tied = and_(
+        scores.c.points == points,
+        scores.c.exactPredictions == exact,
+        scores.c.correctPredictions == correct,
+    )
+    return and_(
+        scores.c.points <= points,
+        ~_scores_better_than(key),
+        ~tied | (scores.c.userId > user_id),
+    )
+
+
+def _with_positions(db: Session, rows) -> list:
+    """
+    Assign RANK() positions to a contiguous slice of the ranking. Needs one
+    count over the rows ordered before the slice instead of ranking everyone.
+    """
+    if not rows:
+        return []
+
+    scores = sql_models.UserScore.__table__
+    first = _ranking_key(rows[0])
+    ordered_before, better = db.execute(
+        select(func.count(), func.count(case((_scores_better_than(first), 1))))
+        .select_from(scores)
+        .where(_scores_ordered_before(first))
+    ).one()
+
+    ranked = []
+    position = better + 1
+    for i, row in enumerate(rows):
+        if i > 0 and _ranking_key(row)[:3] != _ranking_key(rows[i - 1])[:3]:
+            position = ordered_before + i + 1
+        ranked.append({**row, "position": position})
+    return ranked
+
+
+def get_ranking_page(db: Session, limit: int, after: str = None) -> list:
+    """
+    One page of the ranking, starting after the row encoded in the after cursor.
+
+    Raises:
+        ValueError: If after is not a valid cursor
+    """
+    scores = sql_models.UserScore.__table__
+    query = _ranking_select(scores).order_by(*_ranking_order(scores))
+    if after:
+        query = query.where(_scores_ordered_after(decode_ranking_cursor(after)))
+
+    rows = db.execute(query.limit(limit)).mappings().all()
+    return _with_positions(db, rows)
+
+
+def get_ranking_around(db: Session, user_id: str, radius: int):
+    """
+    The user's ranking row with up to radius rows above and below it.
+
+    Returns:
+        (above, me, below) or None if the user has no score row
+    """
+    scores = sql_models.UserScore.__table__
+    me = (
+        db.execute(_ranking_select(scores).where(scores.c.userId == user_id))
+        .mappings()
+        .first()
+    )
+    if me is None:
+        return None
+
+    key = _ranking_key(me)
+    above = []
+    below = []
+    if radius > 0:
+        # Walk the index backwards from the user to fetch the rows above
+        above = (
+            db.execute(
+                _ranking_select(scores)
+                .where(_scores_ordered_before(key))
+                .order_by(*_ranking_order(scores, reverse=True))
+                .limit(radius)
+            )
+            .mappings()
+            .all()
+        )[::-1]
+        below = (
+            db.execute(
+                _ranking_select(scores)
+                .where(_scores_ordered_after(key))
+                .order_by(*_ranking_order(scores))
+                .limit(radius)
+            )
+            .mappings()
+            .all()
+        )
+
+    window = _with_positions(db, [*above, me, *below])
+    return window[: len(above)], window[len(above)], window[len(above) + 1 :]
+
+
+# Ranking snapshots
+def get_ranking_snapshots(db: Session, limit: int = 20):
+    return (
+        db.query(sql_models.RankingSnapshot)
+        .order_by(sql_models.RankingSnapshot.sequence.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def get_snapshot_ranking(db: Session, sequence: int, limit: int = 100):
+    entry = sql_models.RankingSnapshotEntry
+    user = sql_models.User
+    return (
+        db.execute(
+            select(
+                entry.userId,
+                user.name,
+                user.avatar,
+                entry.points,
+                entry.position,
+            )
+            .join(user, user.id == entry.userId)
+            .where(entry.sequence == sequence)
+            .order_by(entry.position, entry.userId)
+            .limit(limit)
+        )
+        .mappings()
+        .all()
+    )
+
+
+def get_user_ranking_history(db: Session, user_id: str):
+    """The user's points and position in every snapshot, oldest first."""
+    entry = sql_models.RankingSnapshotEntry
+    snapshot = sql_models.RankingSnapshot
+    return (
+        db.execute(
+            select(
+                entry.sequence,
+                snapshot.matchId,
+                snapshot.createdAt,
+                entry.points,
+                entry.position,
+            )
+            .join(snapshot, snapshot.sequence == entry.sequence)
+            .where(entry.userId == user_id)
+            .order_by(entry.sequence)
+        )
+        .mappings()
+        .all()
+    )
+
+
+# Groups
+def get_group(db: Session, group_id: str):
+    return db.query(sql_models.Group).filter(sql_models.Group.id == group_id).first()
+
+
+def get_group_by_invite_code(db: Session, invite_code: str):
+    return (
+        db.query(sql_models.Group)
+        .filter(sql_models.Group.inviteCode == invite_code)
+        .first()
+    )
+
+
+def get_group_membership(db: Session, group_id: str, user_id: str):
+    return (
+        db.query(sql_models.GroupMember)
+        .filter(
+            sql_models.GroupMember.groupId == group_id,
+            sql_models.GroupMember.userId == user_id,
+        )
+        .first()
+    )
+
+
+def get_user_group_memberships(db: Session, user_id: str):
+    """Groups of a user as (Group, GroupMember) pairs, via ix_group_members_user."""
+    return (
+        db.query(sql_models.Group, sql_models.GroupMember)
+        .join(
+            sql_models.GroupMember,
+            sql_models.GroupMember.groupId == sql_models.Group.id,
+        )
+        .filter(sql_models.GroupMember.userId == user_id)
+        .order_by(sql_models.Group.createdAt)
+        .all()
+    )
+
+
+def create_group(db: Session, group: sql_models.Group, admin_id: str):
+    db.add(group)
+    db.flush()
+    add_group_member(db, group.id, admin_id, is_admin=True)
+    db.commit()
+    db.refresh(group)
+    return group
+
+
+def add_group_member(db: Session, group_id: str, user_id: str, is_admin: bool = False):
+    """
+    Add a member starting from the user's current totals, so the group
+    leaderboard covers the whole tournament. Does not commit.
+    """
+    score = (
+        db.query(sql_models.UserScore)
+        .filter(sql_models.UserScore.userId == user_id)
+        .first()
+    )
+    member = sql_models.GroupMember(
+        groupId=group_id,
+        userId=user_id,
+        isAdmin=is_admin,
+        joinedAt=datetime.utcnow(),
+        points=score.points if score else 0,
+        correctPredictions=score.correctPredictions if score else 0,
+        exactPredictions=score.exactPredictions if score else 0,
+    )
+    db.add(member)
+
+    groups = sql_models.Group.__table__
+    db.execute(
+        groups.update()
+        .where(groups.c.id == group_id)
+        .values(playerCount=groups.c.playerCount + 1)
+    )
+    return member
+
+
+def get_group_ranking(db: Session, group_id: str):
+    """
+    The group's leaderboard from group_members with RANK() positions, using
+    the same ordering and tie rules as the global ranking.
+    """
+    members = sql_models.GroupMember.__table__
+    user = sql_models.User
+    position = func.rank().over(order_by=[c.desc() for c in _score_columns(members)])
+    return (
+        db.execute(
+            select(
+                members.c.userId,
+                user.name,
+                user.email,
+                user.avatar,
+                members.c.joinedAt,
+                members.c.points,
+                members.c.correctPredictions,
+                members.c.exactPredictions,
+                members.c.isAdmin,
+                position.label("position"),
+            )
+            .join(user, user.id == members.c.userId)
+            .where(members.c.groupId == group_id)
+            .order_by(*_ranking_order(members))
+        )
+        .mappings()
+        .all()
+    )
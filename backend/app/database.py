@@ -1,6 +1,6 @@
 import os
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 # Default to SQLite, but allow override via env var
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
@@ -37,6 +37,7 @@ def run_migrations():
                 "fifaMatchId": "TEXT UNIQUE",
                 "manualOverride": "INTEGER DEFAULT 0",
                 "updatedAt": "DATETIME",
+                "locked": "INTEGER NOT NULL DEFAULT 0",
             }
             predictions_additions = {
                 "pointsBreakdown": "TEXT",
@@ -55,7 +56,8 @@ def run_migrations():
                 ALTER TABLE matches
                     ADD COLUMN IF NOT EXISTS "fifaMatchId" VARCHAR UNIQUE,
                     ADD COLUMN IF NOT EXISTS "manualOverride" BOOLEAN DEFAULT FALSE,
-                    ADD COLUMN IF NOT EXISTS "updatedAt" TIMESTAMP
+                    ADD COLUMN IF NOT EXISTS "updatedAt" TIMESTAMP,
+                    ADD COLUMN IF NOT EXISTS "locked" BOOLEAN NOT NULL DEFAULT FALSE
             """))
             conn.execute(text("""
                 ALTER TABLE predictions
@@ -76,11 +78,76 @@ def run_migrations():
                 END $$
             """))
 
+        # ranking_snapshots.sequence used to be assigned as max + 1 by the app:
+        # give tables created back then a sequence starting after their rows
+        if not is_sqlite:
+            conn.execute(text("""
+                DO $$
+                BEGIN
+                    IF EXISTS (SELECT 1 FROM information_schema.columns
+                        WHERE table_name='ranking_snapshots' AND column_name='sequence'
+                        AND column_default IS NULL) THEN
+                        CREATE SEQUENCE IF NOT EXISTS ranking_snapshots_sequence_seq
+                            OWNED BY ranking_snapshots.sequence;
+                        PERFORM setval('ranking_snapshots_sequence_seq',
+                            COALESCE((SELECT MAX(sequence) FROM ranking_snapshots), 0) + 1,
+                            false);
+                        ALTER TABLE ranking_snapshots ALTER COLUMN sequence
+                            SET DEFAULT nextval('ranking_snapshots_sequence_seq');
+                    END IF;
+                END $$
+            """))
+
         # Backfill fifaMatchId from id for rows seeded before this migration
         conn.execute(text("""
             UPDATE matches SET "fifaMatchId" = id WHERE "fifaMatchId" IS NULL
         """))
 
+        # Before the unique (userId, matchId) index can be created, drop
+        # duplicate predictions, keeping the most recently saved one
+        prediction_indexes = {
+            index["name"] for index in inspect(conn).get_indexes("predictions")
+        }
+        if "uq_predictions_user_match" not in prediction_indexes:
+            conn.execute(text("""
+                DELETE FROM predictions WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY "userId", "matchId"
+                            ORDER BY COALESCE("updatedAt", "createdAt") DESC, id
+                        ) AS copy
+                        FROM predictions
+                    ) ranked
+                    WHERE copy > 1
+                )
+            """))
+
+        # create_all skips indexes of tables that already exist: create any
+        # index declared in the models that the database is still missing
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def run_after_commit(db: Session, callback):
+    """
+    Run callback once the session's current transaction commits. Used to keep
+    in-process state (caches, in-memory leaderboard) in step with the database;
+    callbacks are dropped if the transaction rolls back.
+    """
+    db.info.setdefault("after_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(session):
+    session.info.pop("after_commit", None)
+
 
 def get_db():
     db = SessionLocal()
@@ -41,7 +41,7 @@ class MockDB:
         )
         group2 = Group(
             id="group-2", name="Office League", description="For the office crew.",
-            adminId="user-1", playerCount=0, inviteCode="OFFICE01", scoringSystem="extended",
+            adminId="user-1", playerCount=0, inviteCode="OFFICE01", scoringSystem="classic",
             createdAt=datetime.now(), status="active"
         )
         
@@ -0,0 +1,103 @@
+"""
+Opt-in fast JSON encoding for hot list endpoints (FAST_JSON=true).
+
+By default a list endpoint returns rows and FastAPI validates every one of
+them against response_model before encoding. In fast mode the endpoint
+projects each row onto the response model's fields itself and returns the
+encoded bytes directly, skipping that validation pass. The route keeps its
+response_model, so the OpenAPI schema and the response shape do not change.
+
+Encodes with orjson when it is installed, else with the standard json module.
+"""
+
+import json
+import os
+import typing
+from functools import lru_cache
+from datetime import date, datetime
+from typing import Any, Iterable, List, Optional
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+ENABLED = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    """JSON response for content that is already plain dicts and lists."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _nested_model(annotation) -> Optional[type]:
+    """The BaseModel inside an annotation such as Optional[Match], if any."""
+    for candidate in (annotation, *typing.get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+@lru_cache(maxsize=None)
+def _fields(model: type) -> tuple:
+    """(name, default, nested model) per field; resolves forward references."""
+    hints = typing.get_type_hints(model)
+    return tuple(
+        (
+            name,
+            None if field.is_required() else field.default,
+            _nested_model(hints.get(name, field.annotation)),
+        )
+        for name, field in model.model_fields.items()
+    )
+
+
+def project(row: Any, model: type) -> dict:
+    """
+    A plain dict with exactly model's fields, in model order, read from an ORM
+    object, a row mapping or a dict. Missing fields take the model default.
+    """
+    get = row.get if hasattr(row, "get") else None
+    result = {}
+    for name, default, nested in _fields(model):
+        if get is not None:
+            value = get(name, default)
+        else:
+            value = getattr(row, name, default)
+        if nested is not None and value is not None and not isinstance(value, dict):
+            value = project(value, nested)
+        result[name] = value
+    return result
+
+
+def list_response(
+    rows: Iterable[Any], model: type, response: Response
+) -> Optional[Response]:
+    """
+    In fast mode, the encoded response for rows of model (keeping the headers
+    already set on the injected response, such as the ETag). Returns None
+    when fast mode is off, so the endpoint returns rows as usual.
+    """
+    if not ENABLED:
+        return None
+    content: List[dict] = [project(row, model) for row in rows]
+    return FastJSONResponse(content, headers=dict(response.headers))
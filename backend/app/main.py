@@ -1,14 +1,30 @@
 from fastapi import FastAPI
+from sqlalchemy import select
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from dotenv import load_dotenv
-from .routers import auth, users, matches, predictions, admin, admin_matches
+from .routers import (
+    auth,
+    users,
+    matches,
+    predictions,
+    notifications,
+    admin,
+    admin_matches,
+    groups,
+)
 from .database import engine, SessionLocal, run_migrations
 from . import sql_models, seeder
 from .scheduler import start_scheduler, stop_scheduler
+from .services.score_tracker import rebuild_user_scores
+from .services.crowd_stats import rebuild_crowd_stats
+from .services.leaderboard import leaderboard
+from .services.match_cache import match_cache
+from .services import prediction_buffer as write_behind
+from . import crud
 
 # Load environment variables
 load_dotenv()
@@ -48,9 +64,32 @@ async def startup_event():
         try:
             seeder.seed_data(db)
             print("✅ Database seeding completed")
+
+            # Backfill/verify the materialized user totals
+            rebuild_user_scores(db)
+            print("✅ User scores rebuilt")
+
+            # Backfill the crowd histograms of closed matches; lock_due_matches
+            # builds the rest when they close
+            locked = select(sql_models.Match.id).where(sql_models.Match.locked)
+            rebuild_crowd_stats(db, db.scalars(locked).all())
+            db.commit()
+            print("✅ Crowd stats rebuilt")
+
+            # Serve the ranking from memory from now on
+            leaderboard.load(crud.get_ranking(db))
+            print("✅ Leaderboard loaded")
+
+            # Share one serialized match list across /matches requests
+            match_cache.enable()
         finally:
             db.close()
 
+        # Buffer prediction saves (replays the journal left by a crash)
+        if write_behind.ENABLED:
+            write_behind.prediction_buffer.enable(SessionLocal)
+            print("✅ Prediction write-behind enabled")
+
         # Start the scheduler
         start_scheduler()
         print("✅ Scheduler started")
@@ -72,6 +111,11 @@ async def shutdown_event():
     except Exception as e:
         print(f"❌ Scheduler shutdown failed: {e}")
 
+    try:
+        write_behind.prediction_buffer.disable()
+    except Exception as e:
+        print(f"❌ Prediction buffer flush failed: {e}")
+
 
 # CORS
 origins = [
@@ -95,8 +139,10 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(matches.router, prefix="/api")
 app.include_router(predictions.router, prefix="/api")
+app.include_router(notifications.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
 app.include_router(admin_matches.router, prefix="/api")
+app.include_router(groups.router, prefix="/api")
 
 
 @app.get("/api/health")
@@ -1,5 +1,5 @@
 from typing import List, Optional, Literal
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime, date
 
 
@@ -66,6 +66,7 @@ class Match(BaseModel):
     city: Optional[str] = None
     fifaMatchId: Optional[str] = None
     manualOverride: bool = False
+    locked: bool = False  # Predictions closed (deadline passed)
     updatedAt: Optional[datetime] = None
     userPrediction: Optional[Prediction] = None
     editable: Optional[bool] = (
@@ -76,6 +77,21 @@ class Match(BaseModel):
         from_attributes = True
 
 
+# Sync Models
+class DeletedEntity(BaseModel):
+    entity: Literal["match", "prediction"]
+    id: str
+
+
+class SyncResponse(BaseModel):
+    """Matches and caller's predictions changed since the requested watermark"""
+
+    matches: List[Match]
+    predictions: List[Prediction]
+    deleted: List[DeletedEntity]
+    watermark: int  # Pass back as ?since= on the next sync
+
+
 # Ranking Model
 class UserRanking(BaseModel):
     userId: str
@@ -84,17 +100,138 @@ class UserRanking(BaseModel):
     points: int
     position: int
     correctPredictions: int
+    exactPredictions: int = 0
+
+    class Config:
+        from_attributes = True
+
+
+class RankingAroundMe(BaseModel):
+    """The current user's ranking row with its neighbours"""
+
+    me: UserRanking
+    above: List[UserRanking] = []
+    below: List[UserRanking] = []
+
+
+class RankingSnapshot(BaseModel):
+    """Ranking frozen after one finished match was scored or recalculated"""
+
+    sequence: int
+    matchId: Optional[str] = None
+    createdAt: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class SnapshotRanking(BaseModel):
+    userId: str
+    name: str
+    avatar: Optional[str] = None
+    points: int
+    position: int
+
+
+class RankingHistoryEntry(BaseModel):
+    """A user's points and position in one snapshot"""
+
+    sequence: int
+    matchId: Optional[str] = None
+    createdAt: datetime
+    points: int
+    position: int
+    positionChange: Optional[int] = None  # Places gained since previous snapshot
+
+
+class StageScore(BaseModel):
+    """A user's totals and position within one stage"""
+
+    stage: str
+    points: int
+    correctPredictions: int
+    exactPredictions: int
+    position: int
+
+
+class CrowdScoreline(BaseModel):
+    homeScore: int
+    awayScore: int
+    count: int
+    pct: float
+
+
+class CrowdStats(BaseModel):
+    """How everyone predicted a match (shown once predictions are closed)"""
+
+    matchId: str
+    totalPredictions: int
+    homeWinPct: float
+    drawPct: float
+    awayWinPct: float
+    avgHomeGoals: float
+    avgAwayGoals: float
+    scorelines: List[CrowdScoreline]
+
+
+# Group Models
+class Group(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    adminId: str
+    playerCount: int = 0
+    inviteCode: Optional[str] = None  # Only for members and platform admins
+    inviteLink: Optional[str] = None
+    scoringSystem: Literal["classic", "extended", "simple"]
+    createdAt: Optional[datetime] = None
+    status: Literal["active", "inactive"]
+    isMember: Optional[bool] = None  # Whether the requesting user is a member
+    isAdmin: Optional[bool] = None  # Whether the requesting user is an admin
+
+    class Config:
+        from_attributes = True
+
+
+class GroupMember(BaseModel):
+    userId: str
+    name: str
+    email: Optional[str] = None
+    avatar: Optional[str] = None
+    joinedAt: Optional[datetime] = None
+    points: int
+    correctPredictions: int = 0
+    exactPredictions: int = 0
+    isAdmin: bool = False
+    position: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+class CreateGroupRequest(BaseModel):
+    name: str
+    description: Optional[str] = None
+    # Group rankings only use the classic points (group_members.points):
+    # other systems are refused until they are implemented
+    scoringSystem: Literal["classic"] = "classic"
+
+
+class JoinGroupRequest(BaseModel):
+    inviteCode: str
+
+
 # Auth Models
 class AuthResponse(BaseModel):
     user: User
     token: str
 
 
+class StreamToken(BaseModel):
+    token: str
+    expiresIn: int  # Seconds
+
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -128,6 +265,27 @@ class CreatePredictionRequest(BaseModel):
     awayScore: int
 
 
+class BulkPredictionRequest(BaseModel):
+    predictions: List[CreatePredictionRequest] = Field(
+        ..., min_length=1, max_length=100
+    )
+
+
+class BulkPredictionResult(BaseModel):
+    """Outcome for one item of a bulk submission, in request order"""
+
+    matchId: str
+    status: Literal["created", "updated", "rejected"]
+    prediction: Optional[Prediction] = None
+    error: Optional[str] = None
+
+
+class BulkPredictionResponse(BaseModel):
+    saved: int
+    rejected: int
+    results: List[BulkPredictionResult]
+
+
 # Scraper Models
 class ScraperLog(BaseModel):
     """Log de ejecución del scraper"""
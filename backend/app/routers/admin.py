@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models import User
 from .. import sql_models, crud
+from ..exports import ExportFormat, export_response
 from .auth import get_current_user
 from typing import Dict
 from datetime import datetime, timedelta
@@ -77,6 +78,73 @@ def get_admin_reports(
     }
 
 
+PREDICTION_EXPORT_COLUMNS = (
+    "predictionId",
+    "userId",
+    "userName",
+    "userEmail",
+    "matchId",
+    "matchNumber",
+    "stage",
+    "homeTeam",
+    "awayTeam",
+    "matchDate",
+    "matchStatus",
+    "predictedHomeScore",
+    "predictedAwayScore",
+    "homeScore",
+    "awayScore",
+    "points",
+    "pointsBreakdown",
+    "createdAt",
+    "updatedAt",
+)
+
+RANKING_EXPORT_COLUMNS = (
+    "position",
+    "userId",
+    "name",
+    "email",
+    "points",
+    "correctPredictions",
+    "exactPredictions",
+)
+
+
+@router.get("/admin/export/predictions")
+def export_predictions(
+    format: ExportFormat = Query("csv"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Download every prediction with its player, match and points (CSV or NDJSON)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return export_response(
+        db,
+        crud.predictions_export_query(),
+        PREDICTION_EXPORT_COLUMNS,
+        format,
+        "predictions",
+    )
+
+
+@router.get("/admin/export/ranking")
+def export_ranking(
+    format: ExportFormat = Query("csv"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Download the full ranking with each player's email (CSV or NDJSON)."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return export_response(
+        db, crud.ranking_export_query(), RANKING_EXPORT_COLUMNS, format, "ranking"
+    )
+
+
 @router.post("/admin/users/{user_id}/promote")
 def promote_user(
     user_id: str,
@@ -8,7 +8,15 @@ Endpoints para que los admins manejen matches y el scraper:
 - Recalcular puntos
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    BackgroundTasks,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import Dict, List
@@ -16,10 +24,14 @@ from datetime import datetime
 
 from ..database import get_db
 from ..models import User, UpdateMatchResultRequest, ScraperLog
-from .. import sql_models
+from .. import sql_models, versioning
 from .auth import get_current_user
-from ..services.match_updater import scrape_and_update_matches
-from ..services.points_calculator import calculate_points
+from ..services.match_updater import (
+    scrape_and_update_matches,
+    score_match_predictions,
+)
+from ..services.score_tracker import ScoreDeltas
+from ..services.ranking_snapshots import take_ranking_snapshot
 
 router = APIRouter()
 
@@ -33,7 +45,10 @@ def require_admin(current_user: User) -> User:
 
 @router.get("/admin/matches/scraping-status")
 def get_scraping_status(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ) -> Dict:
     """
     Get the status of the scraper: last execution, next run, errors.
@@ -45,6 +60,10 @@ def get_scraping_status(
     """
     require_admin(current_user)
 
+    not_modified = versioning.conditional_get(request, response, "scraper_logs")
+    if not_modified:
+        return not_modified
+
     # Get last execution
     last_log = (
         db.query(sql_models.ScraperLog)
@@ -160,26 +179,11 @@ def set_match_result(
 
     # If match just became finished, calculate points
     if result.status == "finished" and not was_finished:
-        predictions = (
-            db.query(sql_models.Prediction)
-            .filter(sql_models.Prediction.matchId == match_id)
-            .all()
-        )
-
-        for pred in predictions:
-            points, breakdown = calculate_points(
-                pred.homeScore,
-                pred.awayScore,
-                match.homeScore,
-                match.awayScore,
-            )
-            pred.points = points
-            pred.pointsBreakdown = breakdown
-            pred.notified = False  # Reset notified flag
-            pred.updatedAt = datetime.utcnow()
-            points_calculated += 1
-
+        deltas = ScoreDeltas()
+        points_calculated = score_match_predictions(db, match, deltas)
+        deltas.apply(db)
         db.commit()
+        take_ranking_snapshot(db, match.id)
 
     return {
         "message": f"Match result updated manually by {current_user.name}",
@@ -228,14 +232,11 @@ def recalculate_match_points(
             detail="Cannot recalculate points for non-finished match",
         )
 
-    # Get all predictions
-    predictions = (
-        db.query(sql_models.Prediction)
-        .filter(sql_models.Prediction.matchId == match_id)
-        .all()
-    )
+    # Recalculate points, adjusting user totals by the difference
+    deltas = ScoreDeltas()
+    predictions_updated = score_match_predictions(db, match, deltas)
 
-    if not predictions:
+    if predictions_updated == 0:
         return {
             "message": "No predictions found for this match",
             "predictionsUpdated": 0,
@@ -248,24 +249,13 @@ def recalculate_match_points(
             },
         }
 
-    # Recalculate points
-    for pred in predictions:
-        points, breakdown = calculate_points(
-            pred.homeScore,
-            pred.awayScore,
-            match.homeScore,
-            match.awayScore,
-        )
-        pred.points = points
-        pred.pointsBreakdown = breakdown
-        pred.notified = False  # Reset notified flag so users get notified again
-        pred.updatedAt = datetime.utcnow()
-
+    deltas.apply(db)
     db.commit()
+    take_ranking_snapshot(db, match.id)
 
     return {
-        "message": f"Points recalculated for {len(predictions)} predictions",
-        "predictionsUpdated": len(predictions),
+        "message": f"Points recalculated for {predictions_updated} predictions",
+        "predictionsUpdated": predictions_updated,
         "match": {
             "id": match.id,
             "homeTeam": match.homeTeam,
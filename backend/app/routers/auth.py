@@ -14,18 +14,19 @@ from ..utils import (
 from ..oauth import oauth, validate_email_domain
 import uuid
 import os
+from typing import Optional
 
 router = APIRouter()
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-):
-    token = credentials.credentials
+def user_from_token(token: str, db: Session, scope: Optional[str] = None):
+    """
+    The user a bearer token belongs to; raises 401/404 like get_current_user.
+    Scoped tokens (e.g. "stream") are only accepted where that scope is asked for.
+    """
     payload = verify_token(token)
-    if payload is None:
+    if payload is None or payload.get("scope") != scope:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -44,6 +45,13 @@ def get_current_user(
     return user
 
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    return user_from_token(credentials.credentials, db)
+
+
 @router.post("/auth/login", response_model=AuthResponse)
 def login(request: LoginRequest, db: Session = Depends(get_db)):
     user = crud.get_user_by_email(db, email=request.email)
@@ -149,15 +157,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
         else:
             # Update avatar if changed
             if picture and user.avatar != picture:
-                db_user = (
-                    db.query(crud.sql_models.User)
-                    .filter(crud.sql_models.User.id == user.id)
-                    .first()
-                )
-                if db_user:
-                    db_user.avatar = picture
-                    db.commit()
-                    db.refresh(db_user)
+                crud.update_user_avatar(db, user.id, picture)
 
         # Create JWT token
         access_token = create_access_token(data={"sub": user.email})
@@ -0,0 +1,161 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional, Literal
+from sqlalchemy.orm import Session
+from ..models import User, Group, GroupMember, CreateGroupRequest, JoinGroupRequest
+from ..database import get_db
+from .. import crud, sql_models
+from .auth import get_current_user
+import os
+import secrets
+import uuid
+from datetime import datetime
+
+router = APIRouter()
+
+ADMIN_ROLES = ["admin", "platform_admin"]
+
+
+def _group_response(
+    group: sql_models.Group,
+    membership: Optional[sql_models.GroupMember],
+    viewer: User,
+) -> Group:
+    # The invite code lets anyone join: only members and platform admins see it
+    invite_code = invite_link = None
+    if membership is not None or viewer.role in ADMIN_ROLES:
+        frontend_url = os.getenv("FRONTEND_URL", "http://localhost:8080")
+        invite_code = group.inviteCode
+        invite_link = f"{frontend_url}/groups/join?code={group.inviteCode}"
+    return Group(
+        id=group.id,
+        name=group.name,
+        description=group.description,
+        adminId=group.adminId,
+        playerCount=group.playerCount,
+        inviteCode=invite_code,
+        inviteLink=invite_link,
+        scoringSystem=group.scoringSystem,
+        createdAt=group.createdAt,
+        status=group.status,
+        isMember=membership is not None,
+        isAdmin=bool(membership and membership.isAdmin),
+    )
+
+
+def _new_invite_code(db: Session) -> str:
+    while True:
+        code = secrets.token_hex(4).upper()
+        if not crud.get_group_by_invite_code(db, code):
+            return code
+
+
+@router.get("/groups", response_model=List[Group])
+def list_groups(
+    search: Optional[str] = None,
+    filter: Literal["mine", "all", "admin"] = "mine",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    List groups.
+
+    - mine: groups the current user belongs to
+    - admin: groups the current user administers
+    - all: every group (platform admins only)
+    """
+    my_groups = crud.get_user_group_memberships(db, current_user.id)
+    memberships = {group.id: member for group, member in my_groups}
+
+    if filter == "all":
+        if current_user.role not in ADMIN_ROLES:
+            raise HTTPException(status_code=403, detail="Admin access required")
+        groups = db.query(sql_models.Group).order_by(sql_models.Group.createdAt).all()
+    else:
+        groups = [
+            group for group, member in my_groups if filter == "mine" or member.isAdmin
+        ]
+
+    if search:
+        groups = [g for g in groups if search.lower() in g.name.lower()]
+
+    return [_group_response(g, memberships.get(g.id), current_user) for g in groups]
+
+
+@router.post("/groups", response_model=Group, status_code=201)
+def create_group(
+    request: CreateGroupRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Create a group; the creator joins it as its admin."""
+    group = sql_models.Group(
+        id=str(uuid.uuid4()),
+        name=request.name,
+        description=request.description,
+        adminId=current_user.id,
+        inviteCode=_new_invite_code(db),
+        scoringSystem=request.scoringSystem,
+        status="active",
+        playerCount=0,
+        createdAt=datetime.utcnow(),
+    )
+    group = crud.create_group(db, group, admin_id=current_user.id)
+    membership = crud.get_group_membership(db, group.id, current_user.id)
+    return _group_response(group, membership, current_user)
+
+
+@router.post("/groups/join", response_model=Group)
+def join_group(
+    request: JoinGroupRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Join a group by its invite code. Joining twice is a no-op."""
+    group = crud.get_group_by_invite_code(db, request.inviteCode.strip().upper())
+    if not group or group.status != "active":
+        raise HTTPException(status_code=404, detail="Invalid invite code")
+
+    membership = crud.get_group_membership(db, group.id, current_user.id)
+    if not membership:
+        membership = crud.add_group_member(db, group.id, current_user.id)
+        db.commit()
+        db.refresh(group)
+
+    return _group_response(group, membership, current_user)
+
+
+@router.get("/groups/{id}", response_model=Group)
+def get_group(
+    id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    group = crud.get_group(db, id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    membership = crud.get_group_membership(db, id, current_user.id)
+    return _group_response(group, membership, current_user)
+
+
+@router.get("/groups/{id}/ranking", response_model=List[GroupMember])
+def get_group_ranking(
+    id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the group's leaderboard. Totals are maintained incrementally in
+    group_members, so this is one indexed read regardless of group count.
+    Every group is ranked on classic points (see CreateGroupRequest).
+    Only members (and platform admins) can see it.
+    """
+    group = crud.get_group(db, id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    if current_user.role not in ADMIN_ROLES and not crud.get_group_membership(
+        db, id, current_user.id
+    ):
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    return crud.get_group_ranking(db, id)
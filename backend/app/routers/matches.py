@@ -1,62 +1,260 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional, Literal
 from sqlalchemy.orm import Session
-from ..models import Match, CreateMatchRequest, UpdateMatchRequest, User, Prediction
+from ..models import (
+    Match,
+    CreateMatchRequest,
+    UpdateMatchRequest,
+    User,
+    Prediction,
+    SyncResponse,
+    CrowdStats,
+)
 from ..database import get_db
-from .. import crud
+from .. import changelog, crud, fast_json, versioning
 from .auth import get_current_user
 from .predictions import is_prediction_editable
+from ..services.match_cache import match_cache
+from ..services.crowd_stats import crowd_summary
+from ..services.deadline_locker import lock_due_matches
+from ..scheduler import rearm_deadline_lock
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 
+# Response fields copied straight from the ORM rows. Responses are plain dicts
+# that FastAPI validates once against response_model.
+MATCH_FIELDS = tuple(
+    name for name in Match.model_fields if name not in ("userPrediction", "editable")
+)
+PREDICTION_FIELDS = tuple(Prediction.model_fields)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Match dates are stored as naive UTC; normalize aware query params."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _prediction_response(prediction) -> Optional[dict]:
+    if prediction is None:
+        return None
+    return {name: getattr(prediction, name) for name in PREDICTION_FIELDS}
+
+
+def _match_response(match, prediction, editable: bool) -> dict:
+    match_dict = {name: getattr(match, name) for name in MATCH_FIELDS}
+    match_dict["editable"] = editable
+    match_dict["userPrediction"] = _prediction_response(prediction)
+    return match_dict
+
+
+def _cached_matches_response(
+    db: Session, response: Response, user_id: str, status: Optional[str]
+) -> fast_json.FastJSONResponse:
+    """
+    Overlay the user's predictions on the shared, already serialized match
+    list. Only the predictions are read from the database (and the matches
+    when a write invalidated the cache).
+    """
+    entries = match_cache.get(db)
+    predictions = crud.get_user_predictions_by_match(db, user_id)
+    now = datetime.utcnow()
+    next_deadline = None
+
+    body = []
+    for entry in entries:
+        if status and entry.status != status:
+            continue
+        editable = entry.deadline is not None and now < entry.deadline
+        if editable:
+            next_deadline = min(next_deadline or entry.deadline, entry.deadline)
+        body.append(
+            {
+                **entry.data,
+                "editable": editable,
+                "userPrediction": _prediction_response(predictions.get(entry.id)),
+            }
+        )
+
+    versioning.expire_at("matches", next_deadline)
+    # The body is already JSON-ready: skip response_model validation, but keep
+    # the ETag headers conditional_get set on the injected response
+    return fast_json.FastJSONResponse(body, headers=dict(response.headers))
+
 
 @router.get("/matches", response_model=List[Match])
 def list_matches(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    stage: Optional[str] = None,
+    group: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    matches = crud.get_matches(db, status=status)
+    """
+    List matches ordered by date, each with the caller's prediction.
 
-    # Enrich each match with user's prediction if exists
-    enriched_matches = []
-    for match in matches:
-        prediction = crud.get_prediction(db, match.id, current_user.id)
+    Window (all optional):
+    - from / to: Kick-off time range, to is exclusive
+    - stage, group: Only matches of that stage or group
+    - limit: Page size; X-Next-Cursor carries the cursor for the next page
+    - cursor: Cursor from the X-Next-Cursor header of the previous page
+    """
+    if cursor and not limit:
+        raise HTTPException(status_code=400, detail="cursor requires limit")
+
+    not_modified = versioning.conditional_get(
+        request, response, "matches", "predictions", user_id=current_user.id
+    )
+    if not_modified:
+        return not_modified
+
+    windowed = any(v is not None for v in (date_from, date_to, stage, group, limit))
+    if match_cache.enabled and not windowed:
+        return _cached_matches_response(db, response, current_user.id, status)
+
+    try:
+        rows = crud.get_matches_with_predictions(
+            db,
+            current_user.id,
+            status=status,
+            date_from=_as_utc(date_from),
+            date_to=_as_utc(date_to),
+            stage=stage,
+            group=group,
+            limit=limit,
+            after=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    if limit and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = crud.encode_match_cursor(rows[-1][0])
+    next_deadline = None
+
+    enriched_matches = []
+    for match, prediction in rows:
         # Calculate editable field based on deadline and status
         editable = is_prediction_editable(match)
+        if editable:
+            deadline = match.date - timedelta(hours=1)
+            next_deadline = min(next_deadline or deadline, deadline)
+
+        enriched_matches.append(_match_response(match, prediction, editable))
+
+    # "editable" flips at the next deadline without any write
+    versioning.expire_at("matches", next_deadline)
+    return (
+        fast_json.list_response(enriched_matches, Match, response) or enriched_matches
+    )
 
-        # Build complete dict with ALL fields including new ones
-        match_dict = {
-            "id": match.id,
-            "homeTeam": match.homeTeam,
-            "awayTeam": match.awayTeam,
-            "homeFlag": match.homeFlag,
-            "awayFlag": match.awayFlag,
-            "date": match.date,
-            "time": match.time,
-            "status": match.status,
-            "homeScore": match.homeScore,
-            "awayScore": match.awayScore,
-            "matchNumber": match.matchNumber,
-            "stage": match.stage,
-            "group": match.group,
-            "stadium": match.stadium,
-            "city": match.city,
-            "fifaMatchId": match.fifaMatchId,
-            "manualOverride": match.manualOverride,
-            "updatedAt": match.updatedAt,
-            "editable": editable,
-        }
-
-        if prediction:
-            match_dict["userPrediction"] = prediction
-
-        enriched_matches.append(Match(**match_dict))
-
-    return enriched_matches
+
+def _parse_since(since: str):
+    """A change log sequence (digits) or an ISO timestamp; ValueError otherwise."""
+    if since.isdigit():
+        return int(since), None
+    return None, _as_utc(datetime.fromisoformat(since))
+
+
+@router.get("/sync", response_model=SyncResponse)
+def sync(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Delta sync: the matches and caller's predictions changed since a
+    watermark, plus deleted ones, and the watermark for the next call.
+
+    - since: The watermark returned by the previous sync (a sequence number),
+      or an ISO timestamp for a first sync. Without it everything is returned.
+
+    Changes may be delivered more than once across syncs (the watermark stops
+    before transactions that may still commit); apply them by id.
+    """
+    not_modified = versioning.conditional_get(
+        request, response, "matches", "predictions", user_id=current_user.id
+    )
+    if not_modified:
+        return not_modified
+
+    # Taken before reading changes: anything newer is simply sent again
+    watermark = changelog.watermark(db)
+
+    if since is None:
+        rows = crud.get_matches_with_predictions(db, current_user.id)
+        predictions = [prediction for _, prediction in rows if prediction]
+        deleted = []
+    else:
+        try:
+            since_seq, since_time = _parse_since(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid since: {since}")
+        if since_time is not None:
+            since_time -= changelog.COMMIT_GRACE
+        match_ids, prediction_ids, deleted = crud.get_changes_since(
+            db, current_user.id, since_seq=since_seq, since_time=since_time
+        )
+        rows = (
+            crud.get_matches_with_predictions(db, current_user.id, match_ids=match_ids)
+            if match_ids
+            else []
+        )
+        predictions = (
+            crud.get_user_predictions(db, current_user.id, prediction_ids)
+            if prediction_ids
+            else []
+        )
+
+    return {
+        "matches": [
+            _match_response(match, prediction, is_prediction_editable(match))
+            for match, prediction in rows
+        ],
+        "predictions": [_prediction_response(p) for p in predictions],
+        "deleted": [{"entity": entity, "id": id_} for entity, id_ in deleted],
+        "watermark": watermark,
+    }
+
+
+@router.get("/matches/{id}/crowd", response_model=CrowdStats)
+def get_match_crowd(
+    id: str,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    How everyone predicted the match: home/draw/away percentages, average
+    predicted goals and the `limit` most picked scorelines. Read from the
+    match_scorelines histogram, built when predictions close, so it cannot
+    sway anyone's pick.
+    """
+    match = crud.get_match(db, id)
+    if not match:
+        raise HTTPException(status_code=404, detail="Match not found")
+    if is_prediction_editable(match):
+        raise HTTPException(
+            status_code=403,
+            detail="Crowd predictions are shown after the prediction deadline",
+        )
+    if not match.locked:
+        # The lock job is late: lock now, which builds the histogram
+        lock_due_matches(db)
+
+    stats = crowd_summary(match.id, crud.get_match_scorelines(db, match.id))
+    stats["scorelines"] = stats["scorelines"][:limit]
+    return stats
 
 
 @router.post("/matches", response_model=Match, status_code=201)
@@ -86,6 +284,9 @@ def create_match(
     # The models.Match is Pydantic, crud expects models.Match (Pydantic)
     # and converts to sql_models.Match.
     created_match = crud.create_match(db, new_match_data)
+
+    # Arm the lock at the new match's deadline, or lock it now if already due
+    rearm_deadline_lock(db, created_match)
     return created_match
 
 
@@ -101,4 +302,6 @@ def update_match(
     updated_match = crud.update_match(db, id, **request.model_dump(exclude_unset=True))
     if not updated_match:
         raise HTTPException(status_code=404, detail="Match not found")
+    # The deadline follows the match's date and status
+    rearm_deadline_lock(db, updated_match)
     return updated_match
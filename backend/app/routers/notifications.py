@@ -0,0 +1,119 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from datetime import timedelta
+from sqlalchemy.orm import Session
+from ..models import Prediction, StreamToken, User
+from ..database import get_db
+from ..utils import create_access_token
+from .. import crud, fast_json
+from .auth import get_current_user, user_from_token
+from ..services.notification_broker import notification_broker
+
+router = APIRouter()
+optional_bearer = HTTPBearer(auto_error=False)
+
+# Comment sent on an idle stream so proxies do not close it, in seconds
+KEEPALIVE_SECONDS = 15
+# Reconnect delay suggested to EventSource, in milliseconds
+RETRY_MS = 5000
+# Lifetime of a stream token: only needs to outlive opening the stream
+STREAM_TOKEN_SECONDS = 60
+STREAM_SCOPE = "stream"
+
+
+def get_stream_user(
+    token: Optional[str] = Query(None, description="Stream token (EventSource)"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+    db: Session = Depends(get_db),
+):
+    """
+    Like get_current_user, but EventSource cannot send headers: also ?token=,
+    which only takes a short-lived token from POST /notifications/stream-token
+    so the access token never ends up in URLs and access logs.
+    """
+    if credentials is not None:
+        return user_from_token(credentials.credentials, db)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return user_from_token(token, db, scope=STREAM_SCOPE)
+
+
+@router.post("/notifications/stream-token", response_model=StreamToken)
+def create_stream_token(current_user: User = Depends(get_current_user)):
+    """
+    Issue a token that can only open /notifications/stream, and only for
+    STREAM_TOKEN_SECONDS. An open stream outlives it; reconnecting needs a new one.
+    """
+    token = create_access_token(
+        data={"sub": current_user.email, "scope": STREAM_SCOPE},
+        expires_delta=timedelta(seconds=STREAM_TOKEN_SECONDS),
+    )
+    return {"token": token, "expiresIn": STREAM_TOKEN_SECONDS}
+
+
+def _points_events(db: Session, user_id: str, after: Optional[str]) -> str:
+    return "".join(
+        f"id: {crud.encode_notification_id(row['updatedAt'], row['id'])}\n"
+        "event: points\n"
+        f"data: {fast_json.dumps(fast_json.project(row, Prediction)).decode()}\n\n"
+        for row in crud.take_points_notifications(db, user_id, after)
+    )
+
+
+async def points_event_stream(
+    db: Session,
+    user_id: str,
+    last_event_id: Optional[str] = None,
+    keepalive: float = KEEPALIVE_SECONDS,
+):
+    """
+    Server-sent events for the user's scored predictions: first what is
+    pending (or everything after last_event_id on a reconnect), then whatever
+    the points pipeline scores while the stream is open.
+    """
+    # Subscribe before reading, so points scored in between still wake us
+    subscription = notification_broker.subscribe(user_id)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        after = last_event_id
+        while True:
+            # Each read commits, so an idle stream holds no DB connection
+            events = await run_in_threadpool(_points_events, db, user_id, after)
+            after = None
+            if events:
+                yield events
+            while not await subscription.wait(keepalive):
+                yield ": keep-alive\n\n"
+    finally:
+        notification_broker.unsubscribe(subscription)
+
+
+@router.get(
+    "/notifications/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_notifications(
+    last_event_id: Optional[str] = Header(None),
+    current_user=Depends(get_stream_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Push points notifications as server-sent events (event "points", data a
+    Prediction). Sent predictions are marked as notified. EventSource resends
+    the last event id when it reconnects, and the stream replays from there.
+    """
+    if last_event_id:
+        try:
+            crud.decode_notification_id(last_event_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        points_event_stream(db, current_user.id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
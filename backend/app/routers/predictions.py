@@ -1,16 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from ..models import (
     Prediction,
     CreatePredictionRequest,
+    BulkPredictionRequest,
+    BulkPredictionResponse,
     User,
     UserRanking,
+    RankingAroundMe,
+    RankingSnapshot,
+    SnapshotRanking,
+    RankingHistoryEntry,
+    StageScore,
     PredictionWithMatch,
 )
 from ..database import get_db
-from .. import crud, sql_models
+from .. import crud, fast_json, sql_models, versioning
 from .auth import get_current_user
+from ..services.leaderboard import leaderboard
+from ..services.deadline_locker import prediction_deadline
+from ..services.prediction_buffer import prediction_buffer
 import uuid
 from datetime import datetime, timedelta
 
@@ -22,8 +32,11 @@ def is_prediction_editable(match: sql_models.Match) -> bool:
     Check if predictions can still be made/edited for a match.
 
     Rules:
+    - Match must not be locked (services.deadline_locker sets the flag at
+      the deadline)
     - Match must be 'upcoming' status
-    - Match date must be more than 1 hour away
+    - Match date must be more than 1 hour away (kept as a safety net in
+      case the lock job runs late)
 
     Args:
         match: Match object from database
@@ -31,6 +44,9 @@ def is_prediction_editable(match: sql_models.Match) -> bool:
     Returns:
         True if prediction can be made/edited, False otherwise
     """
+    if match.locked:
+        return False
+
     # Match must be upcoming
     if match.status != "upcoming":
         return False
@@ -42,49 +58,175 @@ def is_prediction_editable(match: sql_models.Match) -> bool:
     return now < deadline
 
 
+def prediction_closed_reason(match: sql_models.Match) -> Optional[str]:
+    """Why predictions can no longer be made for match, or None if they can."""
+    if is_prediction_editable(match):
+        return None
+
+    # Calculate time until/since deadline for better error message
+    now = datetime.utcnow()
+    deadline = match.date - timedelta(hours=1)
+
+    if match.status != "upcoming":
+        return f"Cannot predict {match.status} matches. Match status: {match.status}"
+    if now < deadline:
+        return "Predictions are locked for this match"
+
+    # Deadline passed
+    time_diff = now - deadline
+    hours_passed = int(time_diff.total_seconds() / 3600)
+    minutes_passed = int((time_diff.total_seconds() % 3600) / 60)
+    return f"Prediction deadline has passed. Deadline was {hours_passed}h {minutes_passed}m ago"
+
+
 @router.get("/ranking", response_model=List[UserRanking])
-def get_global_ranking(db: Session = Depends(get_db)):
+def get_global_ranking(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    after: Optional[str] = Query(None),
+    stage: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
     """
     Get global ranking of all players ordered by points.
-    Currently using mock points since calculation is not implemented yet.
+
+    Positions come from a RANK() over the user_scores totals, so tied users
+    (same points, exact results and correct predictions) share a position.
+    Served from the in-memory leaderboard when it is loaded, else from SQL.
+
+    Pagination (keyset):
+    - limit: Page size. Without it the whole ranking is returned.
+    - after: Cursor from the X-Next-Cursor header of the previous page
+
+    With stage, ranks only the points earned in that stage (from the
+    user_stage_scores rollup); limit returns the top N, after is not supported.
     """
-    # Get all users
-    users = db.query(sql_models.User).all()
-
-    # Get prediction counts and mock points for each user
-    ranking = []
-    for user in users:
-        predictions = (
-            db.query(sql_models.Prediction)
-            .filter(sql_models.Prediction.userId == user.id)
-            .all()
+    if stage:
+        if after:
+            raise HTTPException(
+                status_code=400, detail="after is not supported with stage"
+            )
+        not_modified = versioning.conditional_get(
+            request, response, "user_stage_scores", "users"
         )
+        if not_modified:
+            return not_modified
+        rows = crud.get_stage_ranking(db, stage, limit=limit)
+        return fast_json.list_response(rows, UserRanking, response) or rows
+
+    not_modified = versioning.conditional_get(request, response, "user_scores", "users")
+    if not_modified:
+        return not_modified
+
+    if limit is None:
+        if after:
+            raise HTTPException(status_code=400, detail="after requires limit")
+        rows = leaderboard.all() if leaderboard.loaded else crud.get_ranking(db)
+        return fast_json.list_response(rows, UserRanking, response) or rows
+
+    try:
+        if leaderboard.loaded:
+            key = crud.decode_ranking_cursor(after) if after else None
+            page = leaderboard.page_after(key, limit)
+        else:
+            page = crud.get_ranking_page(db, limit=limit, after=after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(page) == limit:
+        response.headers["X-Next-Cursor"] = crud.encode_ranking_cursor(page[-1])
+    return fast_json.list_response(page, UserRanking, response) or page
+
+
+@router.get("/ranking/me", response_model=RankingAroundMe)
+def get_my_ranking(
+    request: Request,
+    response: Response,
+    radius: int = Query(2, ge=0, le=50),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the current user's position plus the `radius` players directly
+    above and below, without loading the rest of the ranking.
+    """
+    not_modified = versioning.conditional_get(
+        request, response, "user_scores", "users", user_id=current_user.id
+    )
+    if not_modified:
+        return not_modified
 
-        # Count correct predictions (where points > 0)
-        correct_count = sum(1 for p in predictions if p.points and p.points > 0)
+    if leaderboard.loaded:
+        window = leaderboard.around(current_user.id, radius)
+    else:
+        window = crud.get_ranking_around(db, current_user.id, radius)
+    if window is None:
+        raise HTTPException(status_code=404, detail="User has no ranking entry")
+
+    above, me, below = window
+    return {"me": me, "above": above, "below": below}
 
-        # Sum total points (mock: use random or 0)
-        total_points = sum(p.points or 0 for p in predictions)
 
-        ranking.append(
+@router.get("/ranking/me/stages", response_model=List[StageScore])
+def get_my_stage_scores(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Get the current user's points and position in each stage."""
+    not_modified = versioning.conditional_get(
+        request, response, "user_stage_scores", user_id=current_user.id
+    )
+    if not_modified:
+        return not_modified
+    return crud.get_user_stage_scores(db, current_user.id)
+
+
+@router.get("/ranking/me/history", response_model=List[RankingHistoryEntry])
+def get_my_ranking_history(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the current user's points and position after each scored (or
+    recalculated) match, with the places gained (positive) or lost since the previous one.
+    """
+    history = []
+    previous = None
+    for entry in crud.get_user_ranking_history(db, current_user.id):
+        history.append(
             {
-                "userId": user.id,
-                "name": user.name,
-                "avatar": user.avatar,
-                "points": total_points,
-                "correctPredictions": correct_count,
-                "position": 0,  # Will be assigned after sorting
+                **entry,
+                "positionChange": (
+                    previous["position"] - entry["position"] if previous else None
+                ),
             }
         )
+        previous = entry
+    return history
 
-    # Sort by points descending
-    ranking.sort(key=lambda x: x["points"], reverse=True)
 
-    # Assign positions
-    for i, entry in enumerate(ranking):
-        entry["position"] = i + 1
+@router.get("/ranking/snapshots", response_model=List[RankingSnapshot])
+def list_ranking_snapshots(
+    limit: int = Query(20, ge=1, le=200), db: Session = Depends(get_db)
+):
+    """List ranking snapshots, most recent first."""
+    return crud.get_ranking_snapshots(db, limit=limit)
 
-    return ranking
+
+@router.get("/ranking/snapshots/{sequence}", response_model=List[SnapshotRanking])
+def get_ranking_snapshot(
+    sequence: int,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """Get the ranking as it was when snapshot `sequence` was taken."""
+    rows = crud.get_snapshot_ranking(db, sequence, limit=limit)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return rows
 
 
 @router.get("/predictions", response_model=List[Prediction])
@@ -114,6 +256,8 @@ def get_predictions(
 
 @router.get("/predictions/detailed", response_model=List[PredictionWithMatch])
 def get_predictions_detailed(
+    request: Request,
+    response: Response,
     userId: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     current_user: User = Depends(get_current_user),
@@ -129,11 +273,6 @@ def get_predictions_detailed(
     Security: Users can only see their own predictions unless admin.
     """
 
-    # Build query with JOIN
-    query = db.query(sql_models.Prediction).join(
-        sql_models.Match, sql_models.Prediction.matchId == sql_models.Match.id
-    )
-
     # Security check: only own predictions unless admin
     if userId:
         if (
@@ -141,10 +280,23 @@ def get_predictions_detailed(
             and userId != current_user.id
         ):
             raise HTTPException(status_code=403, detail="Can only view own predictions")
-        query = query.filter(sql_models.Prediction.userId == userId)
     else:
         # Default: only current user's predictions
-        query = query.filter(sql_models.Prediction.userId == current_user.id)
+        userId = current_user.id
+
+    not_modified = versioning.conditional_get(
+        request, response, "predictions", "matches", user_id=userId
+    )
+    if not_modified:
+        return not_modified
+
+    # Build query with JOIN; the joined match columns populate Prediction.match
+    query = (
+        db.query(sql_models.Prediction)
+        .join(sql_models.Prediction.match)
+        .options(contains_eager(sql_models.Prediction.match))
+    )
+    query = query.filter(sql_models.Prediction.userId == userId)
 
     # Filter by match status if provided
     if status:
@@ -155,29 +307,10 @@ def get_predictions_detailed(
 
     predictions = query.all()
 
-    # Build response with match data
-    result = []
-    for pred in predictions:
-        match = (
-            db.query(sql_models.Match)
-            .filter(sql_models.Match.id == pred.matchId)
-            .first()
-        )
-        result.append(
-            PredictionWithMatch(
-                id=pred.id,
-                matchId=pred.matchId,
-                userId=pred.userId,
-                homeScore=pred.homeScore,
-                awayScore=pred.awayScore,
-                points=pred.points,
-                pointsBreakdown=pred.pointsBreakdown,
-                notified=pred.notified,
-                match=match,
-            )
-        )
-
-    return result
+    return (
+        fast_json.list_response(predictions, PredictionWithMatch, response)
+        or predictions
+    )
 
 
 @router.post("/predictions", response_model=Prediction)
@@ -199,26 +332,25 @@ def create_prediction(
         raise HTTPException(status_code=404, detail="Match not found")
 
     # Check if prediction is still editable
-    if not is_prediction_editable(match):
-        # Calculate time until/since deadline for better error message
-        now = datetime.utcnow()
-        deadline = match.date - timedelta(hours=1)
-
-        if match.status != "upcoming":
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot predict {match.status} matches. Match status: {match.status}",
-            )
-        else:
-            # Deadline passed
-            time_diff = now - deadline
-            hours_passed = int(time_diff.total_seconds() / 3600)
-            minutes_passed = int((time_diff.total_seconds() % 3600) / 60)
-
-            raise HTTPException(
-                status_code=400,
-                detail=f"Prediction deadline has passed. Deadline was {hours_passed}h {minutes_passed}m ago",
+    closed_reason = prediction_closed_reason(match)
+    if closed_reason:
+        raise HTTPException(status_code=400, detail=closed_reason)
+
+    if prediction_buffer.enabled:
+        # Write-behind: acknowledged once journaled, saved by the next flush
+        existing = crud.get_user_prediction_ids(db, current_user.id, [match.id])
+        try:
+            prediction, _ = prediction_buffer.submit(
+                current_user.id,
+                request.matchId,
+                request.homeScore,
+                request.awayScore,
+                prediction_deadline(match),
+                existing_id=existing.get(match.id),
             )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return prediction
 
     prediction_id = str(uuid.uuid4())
 
@@ -237,35 +369,104 @@ def create_prediction(
     return saved
 
 
-@router.get("/predictions/unnotified", response_model=List[Prediction])
-def get_unnotified_predictions(
+@router.post("/predictions/bulk", response_model=BulkPredictionResponse)
+def create_predictions_bulk(
+    request: BulkPredictionRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Get predictions with points that user hasn't been notified about.
-    After fetching, marks them as notified.
+    Create or update up to 100 predictions at once (e.g. a whole matchday).
 
-    This is used for showing notifications in the frontend.
+    Each item is validated like POST /predictions against one preloaded set
+    of matches. Valid items are saved together in a single transaction (or
+    one journal write with write-behind on); invalid ones are reported per
+    item and do not block the rest. When a
+    matchId appears more than once, the last item wins.
     """
-    # Get predictions with points that haven't been notified
-    predictions = (
-        db.query(sql_models.Prediction)
-        .filter(
-            sql_models.Prediction.userId == current_user.id,
-            sql_models.Prediction.points.isnot(None),
-            sql_models.Prediction.notified == False,
+    items = request.predictions
+    matches = crud.get_matches_by_ids(db, {item.matchId for item in items})
+
+    errors = {}
+    scores = {}
+    for index, item in enumerate(items):
+        match = matches.get(item.matchId)
+        reason = "Match not found" if match is None else prediction_closed_reason(match)
+        if reason:
+            errors[index] = reason
+        else:
+            scores.pop(item.matchId, None)  # Keep request order of the last one
+            scores[item.matchId] = (item.homeScore, item.awayScore)
+
+    last_index = {item.matchId: index for index, item in enumerate(items)}
+    saved = {}
+    if scores and prediction_buffer.enabled:
+        # Through the buffer too, so an older buffered edit of the same
+        # prediction cannot flush after (and over) this one
+        existing = crud.get_user_prediction_ids(db, current_user.id, scores)
+        accepted = prediction_buffer.submit_many(
+            current_user.id,
+            [
+                (
+                    match_id,
+                    home,
+                    away,
+                    prediction_deadline(matches[match_id]),
+                    existing.get(match_id),
+                )
+                for match_id, (home, away) in scores.items()
+            ],
         )
-        .all()
-    )
+        for match_id, result in zip(list(scores), accepted):
+            if result is None:
+                errors[last_index[match_id]] = "Prediction deadline has passed"
+            else:
+                saved[match_id] = result
+    elif scores:
+        for prediction, created in crud.upsert_predictions(db, current_user.id, scores):
+            saved[prediction.matchId] = (prediction, created)
+
+    results = []
+    for index, item in enumerate(items):
+        if index in errors:
+            results.append(
+                {"matchId": item.matchId, "status": "rejected", "error": errors[index]}
+            )
+        elif last_index[item.matchId] != index:
+            results.append(
+                {
+                    "matchId": item.matchId,
+                    "status": "rejected",
+                    "error": "Superseded by a later item for the same match",
+                }
+            )
+        else:
+            prediction, created = saved[item.matchId]
+            results.append(
+                {
+                    "matchId": item.matchId,
+                    "status": "created" if created else "updated",
+                    "prediction": prediction,
+                }
+            )
 
-    if not predictions:
-        return []
+    return {
+        "saved": len(saved),
+        "rejected": len(results) - len(saved),
+        "results": results,
+    }
 
-    # Mark as notified
-    for pred in predictions:
-        pred.notified = True
 
-    db.commit()
+@router.get("/predictions/unnotified", response_model=List[Prediction])
+def get_unnotified_predictions(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get predictions with points that user hasn't been notified about.
+    They are marked as notified in the same statement, so each one is
+    returned once even with several tabs polling.
 
-    return predictions
+    This is used for showing notifications in the frontend.
+    """
+    return crud.acknowledge_unnotified_predictions(db, current_user.id)
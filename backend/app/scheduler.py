@@ -1,21 +1,32 @@
 """
 Scheduler Module
 
-Configura APScheduler para ejecutar el scraper automáticamente cada 2 horas.
+Configura APScheduler para ejecutar el scraper automáticamente cada 2 horas
+y para cerrar las predicciones de cada partido en su deadline.
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
 
+from sqlalchemy.orm import Session
+
 from app.database import SessionLocal
+from app.services.deadline_locker import (
+    lock_due_matches,
+    prediction_deadline,
+    reopen_rescheduled_match,
+    upcoming_deadlines,
+)
 from app.services.match_updater import scrape_and_update_matches
 
 logger = logging.getLogger(__name__)
 
-# Global scheduler instance
-scheduler = BackgroundScheduler()
+# Global scheduler instance. Las fechas de la DB son UTC naive: el scheduler
+# y sus triggers las leen en UTC, no en la zona horaria del servidor
+scheduler = BackgroundScheduler(timezone=timezone.utc)
 
 
 def scraper_job():
@@ -35,9 +46,78 @@ def scraper_job():
         db.close()
 
 
+def lock_deadlines_job():
+    """
+    Job de un disparo en el deadline de un partido. Cierra todos los
+    partidos vencidos (no solo el suyo), así un job demorado o perdido se
+    recupera en el siguiente.
+    """
+    db = SessionLocal()
+
+    try:
+        lock_due_matches(db)
+    except Exception as e:
+        logger.error(f"❌ Scheduler: Deadline lock job failed - {e}")
+    finally:
+        db.close()
+
+
+def schedule_deadline_lock(match_id: str, deadline: datetime):
+    """
+    Programa (o reprograma) el cierre de un partido en su deadline.
+    Sin efecto si el scheduler no está corriendo.
+    """
+    if not scheduler.running:
+        return
+
+    scheduler.add_job(
+        func=lock_deadlines_job,
+        trigger=DateTrigger(run_date=deadline, timezone=timezone.utc),
+        id=f"lock_{match_id}",
+        name=f"Lock predictions {match_id}",
+        replace_existing=True,
+        misfire_grace_time=None,  # Correr aunque se despierte tarde
+        coalesce=True,
+    )
+
+
+def rearm_deadline_lock(db: Session, match) -> None:
+    """
+    Programa el cierre de un partido recién creado o cuya fecha cambió, en
+    su deadline nuevo. Si ese deadline ya pasó, lo cierra en el momento; si
+    el partido estaba cerrado y se postergó, primero lo vuelve a abrir.
+    """
+    now = datetime.utcnow()
+    reopen_rescheduled_match(db, match, now)
+    deadline = prediction_deadline(match)
+    if deadline is not None and deadline > now:
+        schedule_deadline_lock(match.id, deadline)
+    else:
+        lock_due_matches(db)
+
+
+def arm_deadline_locks():
+    """
+    Cierra los partidos que vencieron mientras la app estaba detenida y
+    programa un job por cada deadline futuro.
+    """
+    db = SessionLocal()
+
+    try:
+        lock_due_matches(db)
+        deadlines = upcoming_deadlines(db)
+    finally:
+        db.close()
+
+    for match_id, deadline in deadlines:
+        schedule_deadline_lock(match_id, deadline)
+    logger.info(f"🔒 Scheduler: Armed {len(deadlines)} deadline locks")
+
+
 def start_scheduler():
     """
-    Inicia el scheduler con un job que corre cada 2 horas.
+    Inicia el scheduler con un job que corre cada 2 horas y los jobs de
+    cierre de cada deadline.
     """
     if scheduler.running:
         logger.warning("⚠️ Scheduler is already running")
@@ -55,6 +135,8 @@ def start_scheduler():
     scheduler.start()
     logger.info("🚀 Scheduler started - Scraper will run every 2 hours")
 
+    arm_deadline_locks()
+
     # Log next run time
     job = scheduler.get_job("scraper_job")
     if job and job.next_run_time:
@@ -0,0 +1,89 @@
+"""
+Crowd Stats Service
+
+Mantiene match_scorelines, el histograma de marcadores predichos por partido,
+del que salen los porcentajes local/empate/visitante y el promedio de goles
+de /matches/{id}/crowd sin agrupar la tabla de predicciones en cada vista.
+
+El histograma solo se muestra después del deadline, cuando las predicciones
+ya no cambian, así que se arma una sola vez: deadline_locker lo construye con
+un GROUP BY al cerrar el partido. Guardar una predicción no lo toca.
+"""
+
+import logging
+from typing import Iterable, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import sql_models
+
+logger = logging.getLogger(__name__)
+
+Scoreline = Tuple[int, int]
+
+
+def rebuild_crowd_stats(db: Session, match_ids: Iterable[str] = None) -> int:
+    """
+    Recalcula el histograma de los partidos dados (o de todos) agrupando sus
+    predicciones. No hace commit.
+
+    Returns:
+        Número de filas del histograma escritas
+    """
+    table = sql_models.MatchScoreline.__table__
+    predictions = sql_models.Prediction.__table__
+    query = select(
+        predictions.c.matchId,
+        predictions.c.homeScore,
+        predictions.c.awayScore,
+        func.count().label("count"),
+    ).group_by(predictions.c.matchId, predictions.c.homeScore, predictions.c.awayScore)
+    delete = table.delete()
+    if match_ids is not None:
+        match_ids = list(match_ids)
+        query = query.where(predictions.c.matchId.in_(match_ids))
+        delete = delete.where(table.c.matchId.in_(match_ids))
+
+    rows = [dict(row._mapping) for row in db.execute(query)]
+    db.execute(delete)
+    if rows:
+        db.execute(table.insert(), rows)
+    logger.debug(f"Rebuilt {len(rows)} crowd scorelines")
+    return len(rows)
+
+
+def crowd_summary(match_id: str, scorelines: Iterable[Scoreline]) -> dict:
+    """
+    Resumen de /matches/{id}/crowd a partir de (homeScore, awayScore, count),
+    ordenado por count descendente.
+    """
+    scorelines = [row for row in scorelines if row[2] > 0]
+    total = sum(count for _, _, count in scorelines)
+
+    def share(n: int) -> float:
+        return round(100 * n / total, 1) if total else 0.0
+
+    home_wins = sum(count for home, away, count in scorelines if home > away)
+    draws = sum(count for home, away, count in scorelines if home == away)
+    return {
+        "matchId": match_id,
+        "totalPredictions": total,
+        "homeWinPct": share(home_wins),
+        "drawPct": share(draws),
+        "awayWinPct": share(total - home_wins - draws),
+        "avgHomeGoals": (
+            round(sum(home * count for home, _, count in scorelines) / total, 2)
+            if total
+            else 0.0
+        ),
+        "avgAwayGoals": (
+            round(sum(away * count for _, away, count in scorelines) / total, 2)
+            if total
+            else 0.0
+        ),
+        "scorelines": [
+            {"homeScore": home, "awayScore": away, "count": count, "pct": share(count)}
+            for home, away, count in scorelines
+        ],
+    }
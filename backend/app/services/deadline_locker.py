@@ -0,0 +1,137 @@
+"""
+Deadline Locker Service
+
+Cierra las predicciones de cada partido en su deadline (1 hora antes del
+inicio) marcando matches.locked en la DB. Los caminos de lectura confían en
+ese flag en lugar de recalcular el deadline en cada pedido.
+
+El cierre es un UPDATE atómico: solo toca partidos todavía abiertos, así que
+correrlo de más (varios workers, reintentos) no tiene efecto. Si el inicio de
+un partido cerrado se posterga, reopen_rescheduled_match lo vuelve a abrir. Cada partido
+cerrado queda en el change log (para /sync) y el commit sube la versión de
+"matches", lo que invalida la caché de partidos y los ETags.
+
+Antes de cerrar se bajan a la DB las predicciones del write-behind
+(prediction_buffer), todas aceptadas antes del deadline. Al cerrar se
+arma el histograma de la multitud (crowd_stats) de esos partidos, que ya no
+va a cambiar.
+
+Los jobs que lo disparan en cada deadline viven en app.scheduler.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import changelog, sql_models
+from app.services.crowd_stats import rebuild_crowd_stats
+from app.services.prediction_buffer import prediction_buffer
+
+logger = logging.getLogger(__name__)
+
+# Las predicciones se cierran 1 hora antes del partido
+PREDICTION_DEADLINE = timedelta(hours=1)
+
+
+def prediction_deadline(match) -> Optional[datetime]:
+    """Hasta cuándo se puede predecir el partido, o None si ya no se puede."""
+    if match.locked or match.status != "upcoming":
+        return None
+    return match.date - PREDICTION_DEADLINE
+
+
+def _due(now: datetime):
+    matches = sql_models.Match.__table__
+    return matches.c.locked.is_(False) & or_(
+        matches.c.status != "upcoming",
+        matches.c.date <= now + PREDICTION_DEADLINE,
+    )
+
+
+def lock_due_matches(db: Session, now: datetime = None) -> List[str]:
+    """
+    Marca como locked todos los partidos cuyo deadline ya pasó (o que ya no
+    están 'upcoming') y confirma.
+
+    Returns:
+        IDs de los partidos cerrados en esta llamada
+    """
+    now = now or datetime.utcnow()
+    matches = sql_models.Match.__table__
+
+    # Lo aceptado antes del deadline tiene que estar en la DB antes del cierre.
+    # Si la DB no responde, el cierre igual se intenta: lo pendiente queda en
+    # el buffer y se baja en el próximo flush
+    try:
+        prediction_buffer.flush()
+    except Exception as e:
+        logger.error(f"Prediction buffer flush before locking failed: {e}")
+
+    due_ids = [row.id for row in db.execute(select(matches.c.id).where(_due(now)))]
+    if not due_ids:
+        return []
+
+    # El filtro se repite en el UPDATE: si otro worker ya los cerró, no se
+    # vuelven a tocar
+    db.execute(
+        matches.update()
+        .where(matches.c.id.in_(due_ids), _due(now))
+        .values(locked=True, updatedAt=now)
+    )
+    changelog.record(db, "match", due_ids)
+    rebuild_crowd_stats(db, due_ids)
+    db.commit()
+
+    logger.info(f"🔒 Locked predictions for {len(due_ids)} matches")
+    return due_ids
+
+
+def reopen_rescheduled_match(
+    db: Session, match: sql_models.Match, now: datetime = None
+) -> bool:
+    """
+    Vuelve a abrir las predicciones de un partido cerrado cuyo inicio se
+    postergó: si sigue 'upcoming' y su deadline nuevo es futuro, saca locked,
+    lo anota en el change log y descarta el histograma de la multitud, que se
+    arma de nuevo al cerrar. Confirma.
+
+    Returns:
+        True si el partido se reabrió
+    """
+    now = now or datetime.utcnow()
+    if not match.locked or match.status != "upcoming":
+        return False
+    if match.date - PREDICTION_DEADLINE <= now:
+        return False
+
+    matches = sql_models.Match.__table__
+    scorelines = sql_models.MatchScoreline.__table__
+    db.execute(
+        matches.update()
+        .where(matches.c.id == match.id, matches.c.locked.is_(True))
+        .values(locked=False, updatedAt=now)
+    )
+    db.execute(scorelines.delete().where(scorelines.c.matchId == match.id))
+    changelog.record(db, "match", [match.id])
+    db.commit()
+    db.refresh(match)
+
+    logger.info(f"🔓 Reopened predictions for rescheduled match {match.id}")
+    return True
+
+
+def upcoming_deadlines(db: Session, now: datetime = None) -> List[tuple]:
+    """(matchId, deadline) de los partidos abiertos con deadline futuro."""
+    now = now or datetime.utcnow()
+    matches = sql_models.Match.__table__
+    rows = db.execute(
+        select(matches.c.id, matches.c.date).where(
+            matches.c.locked.is_(False),
+            matches.c.status == "upcoming",
+            matches.c.date > now + PREDICTION_DEADLINE,
+        )
+    )
+    return [(row.id, row.date - PREDICTION_DEADLINE) for row in rows]
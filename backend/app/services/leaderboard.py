@@ -0,0 +1,289 @@
+"""
+Leaderboard Service
+
+Leaderboard en memoria del proceso para responder el ranking sin tocar la DB.
+
+Se carga una vez desde user_scores al iniciar la app (crud.get_ranking) y
+después se actualiza en el lugar cada vez que el pipeline de puntos confirma
+cambios (ver score_tracker.ScoreDeltas.apply). Responde "top N", "posición del usuario X"
+y "usuarios entre las posiciones a..b" en tiempo logarítmico.
+
+Estructura: un Fenwick tree indexado por puntos cuenta cuántos usuarios hay
+con cada puntaje, y cada puntaje tiene un bucket ordenado por
+(-exactos, -aciertos, userId). El orden y las posiciones (RANK) son los
+mismos que crud.ranking_query.
+
+Es estado local del proceso: con varios workers cada uno mantiene su copia.
+"""
+
+import bisect
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FenwickTree:
+    """Conteos por puntaje con sumas de prefijo en O(log n). Crece según haga falta."""
+
+    def __init__(self, size: int = 64):
+        self._size = size
+        self._tree = [0] * (size + 1)
+
+    def _grow(self, index: int) -> None:
+        counts = [self.prefix(i) - self.prefix(i - 1) for i in range(self._size)]
+        while self._size <= index:
+            self._size *= 2
+        self._tree = [0] * (self._size + 1)
+        for i, count in enumerate(counts):
+            if count:
+                self.add(i, count)
+
+    def add(self, index: int, delta: int) -> None:
+        if index >= self._size:
+            self._grow(index)
+        i = index + 1
+        while i <= self._size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Suma de los conteos en [0, index]."""
+        if index < 0:
+            return 0
+        i = min(index, self._size - 1) + 1
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def lower_bound(self, target: int) -> int:
+        """Menor índice cuyo prefijo acumulado supera target (target es 0-based)."""
+        pos = 0
+        remaining = target
+        step = 1 << self._size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self._size and self._tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+
+class Leaderboard:
+    """Ranking ordenado por (puntos, exactos, aciertos) desc y userId asc."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.loaded = False
+        self._users: Dict[str, dict] = {}
+        self._buckets: Dict[int, List[Tuple[int, int, str]]] = {}
+        self._tree = FenwickTree()
+        self._total = 0
+
+    # ----- Carga y actualización -----
+
+    def load(self, rows) -> int:
+        """
+        Carga (o recarga) el leaderboard completo a partir de las filas de
+        crud.get_ranking.
+        """
+        with self._lock:
+            self._clear()
+            for row in rows:
+                self._insert(dict(row))
+            self.loaded = True
+        logger.info(f"🏆 Leaderboard loaded with {len(rows)} users")
+        return len(rows)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+    @staticmethod
+    def _bucket_key(entry: dict) -> Tuple[int, int, str]:
+        return (
+            -entry["exactPredictions"],
+            -entry["correctPredictions"],
+            entry["userId"],
+        )
+
+    def _insert(self, entry: dict) -> None:
+        entry.pop("position", None)
+        self._users[entry["userId"]] = entry
+        bisect.insort(
+            self._buckets.setdefault(entry["points"], []), self._bucket_key(entry)
+        )
+        self._tree.add(entry["points"], 1)
+        self._total += 1
+
+    def _remove(self, user_id: str) -> Optional[dict]:
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return None
+        bucket = self._buckets[entry["points"]]
+        del bucket[bisect.bisect_left(bucket, self._bucket_key(entry))]
+        if not bucket:
+            del self._buckets[entry["points"]]
+        self._tree.add(entry["points"], -1)
+        self._total -= 1
+        return entry
+
+    def add_user(self, user_id: str, name: str, avatar: Optional[str]) -> None:
+        """Agrega un usuario nuevo con totales en cero."""
+        with self._lock:
+            if not self.loaded or user_id in self._users:
+                return
+            self._insert(
+                {
+                    "userId": user_id,
+                    "name": name,
+                    "avatar": avatar,
+                    "points": 0,
+                    "correctPredictions": 0,
+                    "exactPredictions": 0,
+                }
+            )
+
+    def update_profile(self, user_id: str, name: str, avatar: Optional[str]) -> None:
+        """Actualiza el nombre y el avatar ya confirmados de un usuario."""
+        with self._lock:
+            entry = self._users.get(user_id) if self.loaded else None
+            if entry is not None:
+                # No forman parte del orden: se cambian en el lugar
+                entry["name"] = name
+                entry["avatar"] = avatar
+
+    def apply_deltas(self, deltas: List[Tuple[str, Tuple[int, int, int]]]) -> None:
+        """
+        Aplica deltas (userId, (puntos, aciertos, exactos)) ya confirmados
+        en la DB, como los produce ScoreDeltas.items().
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            for user_id, (points, correct, exact) in deltas:
+                entry = self._remove(user_id)
+                if entry is None:
+                    logger.warning(f"Leaderboard has no entry for user {user_id}")
+                    continue
+                entry["points"] += points
+                entry["correctPredictions"] += correct
+                entry["exactPredictions"] += exact
+                self._insert(entry)
+
+    def apply_totals(self, totals: List[Tuple[str, Tuple[int, int, int]]]) -> None:
+        """
+        Reemplaza los totales (userId, (puntos, aciertos, exactos)) de esos
+        usuarios con los ya confirmados en la DB.
+        """
+        with self._lock:
+            if not self.loaded:
+                return
+            for user_id, (points, correct, exact) in totals:
+                entry = self._remove(user_id)
+                if entry is None:
+                    logger.warning(f"Leaderboard has no entry for user {user_id}")
+                    continue
+                entry["points"] = points
+                entry["correctPredictions"] = correct
+                entry["exactPredictions"] = exact
+                self._insert(entry)
+
+    # ----- Consultas -----
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _count_above(self, points: int) -> int:
+        """Usuarios con más puntos que points."""
+        return self._total - self._tree.prefix(points)
+
+    def _position(self, entry: dict) -> int:
+        bucket = self._buckets[entry["points"]]
+        tied_or_better = (-entry["exactPredictions"], -entry["correctPredictions"], "")
+        return (
+            self._count_above(entry["points"])
+            + bisect.bisect_left(bucket, tied_or_better)
+            + 1
+        )
+
+    def _row(self, user_id: str) -> dict:
+        entry = self._users[user_id]
+        return {**entry, "position": self._position(entry)}
+
+    def _slice(self, start: int, stop: int) -> List[dict]:
+        """Filas en orden de ranking con índice 0-based en [start, stop)."""
+        rows = []
+        index = max(start, 0)
+        stop = min(stop, self._total)
+        while index < stop:
+            # Fenwick cuenta desde los puntajes bajos; el ranking va de arriba abajo
+            points = self._tree.lower_bound(self._total - 1 - index)
+            bucket = self._buckets[points]
+            offset = index - self._count_above(points)
+            for _, _, user_id in bucket[offset : offset + (stop - index)]:
+                rows.append(self._row(user_id))
+                index += 1
+        return rows
+
+    def top(self, n: int) -> List[dict]:
+        with self._lock:
+            return self._slice(0, n)
+
+    def between(self, first: int, last: int) -> List[dict]:
+        """Filas desde la fila número first hasta la last (1-based, inclusivas)."""
+        with self._lock:
+            return self._slice(first - 1, last)
+
+    def all(self) -> List[dict]:
+        with self._lock:
+            return self._slice(0, self._total)
+
+    def _order_index(self, user_id: str) -> int:
+        entry = self._users[user_id]
+        bucket = self._buckets[entry["points"]]
+        return self._count_above(entry["points"]) + bisect.bisect_left(
+            bucket, self._bucket_key(entry)
+        )
+
+    def rank_of(self, user_id: str) -> Optional[int]:
+        """Posición del usuario (empatados comparten posición), o None."""
+        with self._lock:
+            entry = self._users.get(user_id)
+            return self._position(entry) if entry else None
+
+    def page_after(self, key: Optional[tuple], limit: int) -> List[dict]:
+        """
+        Página de keyset: las filas que siguen a key, que es
+        (puntos, exactos, aciertos, userId) como en los cursores de crud.
+        """
+        with self._lock:
+            if key is None:
+                return self._slice(0, limit)
+            points, exact, correct, user_id = key
+            bucket = self._buckets.get(points, [])
+            start = self._count_above(points) + bisect.bisect_right(
+                bucket, (-exact, -correct, user_id)
+            )
+            return self._slice(start, start + limit)
+
+    def around(self, user_id: str, radius: int):
+        """(above, me, below) como crud.get_ranking_around, o None."""
+        with self._lock:
+            if user_id not in self._users:
+                return None
+            index = self._order_index(user_id)
+            above = self._slice(index - radius, index)
+            below = self._slice(index + 1, index + 1 + radius)
+            return above, self._row(user_id), below
+
+
+# Instancia global del proceso
+leaderboard = Leaderboard()
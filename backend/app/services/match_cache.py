@@ -0,0 +1,93 @@
+"""
+Match Cache Service
+
+Caché del proceso con la lista de partidos ya serializada (JSON-ready), que
+es idéntica para todos los usuarios. /matches solo consulta las predicciones
+del usuario y las superpone sobre esta lista.
+
+La caché se identifica con la versión "matches" de app.versioning, que sube
+con cada commit que escribe la tabla matches (scraper, crud.update_match,
+set-result del admin, ...). Si la versión cambió, el próximo pedido recarga.
+
+El campo editable no se guarda: sale del flag locked que pone el
+deadline_locker, y cada entrada trae además su deadline precalculado por si
+el job de cierre se demora.
+
+Se habilita al iniciar la app (como el leaderboard); deshabilitada, /matches
+lee la DB en cada pedido.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app import crud, versioning
+from app.models import Match
+from app.services.deadline_locker import prediction_deadline
+
+logger = logging.getLogger(__name__)
+
+# Campos que dependen del usuario o de la hora, no se cachean
+PER_REQUEST_FIELDS = ("userPrediction", "editable")
+
+
+@dataclass(frozen=True)
+class CachedMatch:
+    id: str
+    status: str
+    deadline: Optional[datetime]
+    data: dict  # Campos del partido ya serializados
+
+
+class MatchCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._version: Optional[int] = None
+        self._entries: List[CachedMatch] = []
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        with self._lock:
+            self.enabled = False
+            self._version = None
+            self._entries = []
+
+    def get(self, db: Session) -> List[CachedMatch]:
+        """Lista de partidos, recargada desde la DB solo si cambió la versión."""
+        # Se lee la versión antes de consultar: si entra una escritura en el
+        # medio, la entrada queda con la versión vieja y se recarga después.
+        version = versioning.version("matches")
+        with self._lock:
+            if self._version == version:
+                return self._entries
+
+        entries = [self._serialize(match) for match in crud.get_matches(db)]
+        with self._lock:
+            self._version = version
+            self._entries = entries
+        logger.debug(f"Match cache reloaded with {len(entries)} matches")
+        return entries
+
+    @staticmethod
+    def _serialize(match) -> CachedMatch:
+        data = jsonable_encoder(
+            Match.model_validate(match), exclude=set(PER_REQUEST_FIELDS)
+        )
+        return CachedMatch(
+            id=match.id,
+            status=match.status,
+            deadline=prediction_deadline(match),
+            data=data,
+        )
+
+
+# Instancia global del proceso
+match_cache = MatchCache()
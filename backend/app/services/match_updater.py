@@ -5,17 +5,28 @@ Servicio que actualiza los matches desde la API de FIFA y calcula puntos.
 Incluye reintentos, logging y notificaciones.
 """
 
+import os
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import numpy as np
+from sqlalchemy import bindparam, case, func, select
 from sqlalchemy.orm import Session
 import requests
 import uuid
 
-from app import sql_models
+from app import changelog, sql_models
+from app.database import run_after_commit
 from app.scrapers.fifa_fixture import scrape_fifa_fixture_dict, map_fifa_status
-from app.services.points_calculator import calculate_points
+from app.services.notification_broker import notification_broker
+from app.services.points_calculator import (
+    BREAKDOWNS,
+    calculate_points_batch,
+    points_case,
+)
+from app.services.score_tracker import ScoreDeltas, apply_delta_query
+from app.services.ranking_snapshots import take_ranking_snapshot
 from app.utils import get_team_flag
 
 logger = logging.getLogger(__name__)
@@ -73,6 +84,7 @@ def update_matches_from_scrape(db: Session, scraped_matches: List[Dict]) -> Dict
         }
     """
     stats = {"checked": 0, "updated": 0, "newly_finished": 0, "newly_finished_ids": []}
+    rescheduled = []
 
     for scraped in scraped_matches:
         stats["checked"] += 1
@@ -121,6 +133,7 @@ def update_matches_from_scrape(db: Session, scraped_matches: List[Dict]) -> Dict
         kickoff = scraped.get("kickoff_parsed")
         if kickoff and db_match.date != kickoff:
             db_match.date = kickoff
+            rescheduled.append(db_match)
             changed = True
 
         stadium = scraped.get("stadium")
@@ -170,12 +183,176 @@ def update_matches_from_scrape(db: Session, scraped_matches: List[Dict]) -> Dict
             )
 
     db.commit()
+
+    # El cierre de las predicciones sigue a la nueva fecha de inicio
+    from app.scheduler import rearm_deadline_lock
+
+    for db_match in rescheduled:
+        rearm_deadline_lock(db, db_match)
     return stats
 
 
+# Para traducir los códigos de calculate_points_batch de una sola vez
+BREAKDOWN_NAMES = np.array(BREAKDOWNS, dtype=object)
+
+# "sql": un UPDATE ... CASE calcula los puntos en la DB (points_case)
+# "numpy": se leen las predicciones y se calculan con calculate_points_batch
+SCORING_ENGINE = os.getenv("SCORING_ENGINE", "sql")
+
+
+def score_match_predictions(
+    db: Session, match: sql_models.Match, deltas: ScoreDeltas
+) -> int:
+    """
+    Calcula puntos para todas las predictions de un match ya finalizado y
+    actualiza los totales de cada usuario. No hace commit; cuando el llamador
+    confirma, se avisa a los streams de notificaciones de los usuarios.
+
+    Args:
+        db: Database session
+        match: Match con resultado cargado
+        deltas: Acumulador de cambios para user_scores y user_stage_scores
+            (el motor "sql" aplica los suyos directamente en la DB)
+
+    Returns:
+        Número de predictions actualizadas
+    """
+    if SCORING_ENGINE == "numpy":
+        scored, user_ids = _score_with_numpy(db, match, deltas)
+    else:
+        scored, user_ids = _score_in_database(db, match)
+
+    if scored:
+        run_after_commit(db, lambda: notification_broker.publish(user_ids))
+    return scored
+
+
+def _score_in_database(db: Session, match: sql_models.Match) -> Tuple[int, List[str]]:
+    """
+    Puntúa el partido sin traer predicciones a Python. Con las reglas de
+    points_case, la DB calcula el delta de cada usuario y lo aplica a sus
+    totales (score_tracker.apply_delta_query). Después un único UPDATE ... CASE
+    puntúa las predicciones, y un INSERT ... SELECT las anota en el change log.
+    Solo vuelven los totales nuevos de cada usuario, para el leaderboard, las
+    ETags y las notificaciones.
+
+    Returns:
+        (predicciones puntuadas, IDs de sus usuarios)
+    """
+    predictions = sql_models.Prediction.__table__
+    in_match = predictions.c.matchId == match.id
+
+    points, breakdown = points_case(
+        predictions.c.homeScore,
+        predictions.c.awayScore,
+        match.homeScore,
+        match.awayScore,
+    )
+    # Aporte nuevo menos el anterior (que solo existe al recalcular), con las
+    # mismas reglas que score_tracker.score_contribution
+    old_points = func.coalesce(predictions.c.points, 0)
+    old_breakdown = predictions.c.pointsBreakdown
+    deltas = select(
+        predictions.c.userId,
+        (points - old_points).label("d_points"),
+        (case((points > 0, 1), else_=0) - case((old_points > 0, 1), else_=0)).label(
+            "d_correct"
+        ),
+        (
+            case((breakdown == "exact_result", 1), else_=0)
+            - case((old_breakdown == "exact_result", 1), else_=0)
+        ).label("d_exact"),
+    ).where(in_match)
+    # Antes del UPDATE de predicciones: los deltas leen los puntos anteriores
+    user_ids = apply_delta_query(db, deltas, stage=match.stage)
+
+    statement = (
+        predictions.update()
+        .where(in_match)
+        .values(
+            points=points,
+            pointsBreakdown=breakdown,
+            notified=False,  # Marca para notificar al usuario
+            updatedAt=datetime.utcnow(),
+        )
+    )
+    if user_ids:
+        statement = statement.execution_options(versioning_user_ids=set(user_ids))
+    scored = db.execute(statement).rowcount
+    if scored:
+        # Los UPDATE de Core no pasan por el hook que alimenta /sync
+        changelog.record_query(
+            db,
+            "prediction",
+            select(predictions.c.id, predictions.c.userId).where(in_match),
+        )
+    return scored, user_ids
+
+
+def _score_with_numpy(
+    db: Session, match: sql_models.Match, deltas: ScoreDeltas
+) -> Tuple[int, List[str]]:
+    """
+    Lee las predicciones del partido, las puntúa con calculate_points_batch y
+    las escribe con un UPDATE por lotes. Los cambios de cada usuario quedan
+    en deltas.
+
+    Returns:
+        (predicciones puntuadas, IDs de sus usuarios)
+    """
+    predictions = sql_models.Prediction.__table__
+    rows = db.execute(
+        select(
+            predictions.c.id,
+            predictions.c.userId,
+            predictions.c.homeScore,
+            predictions.c.awayScore,
+            predictions.c.points,
+            predictions.c.pointsBreakdown,
+        ).where(predictions.c.matchId == match.id)
+    ).all()
+    if not rows:
+        return 0, []
+
+    # Columnas en arrays: un solo cálculo vectorizado para todo el partido
+    ids, user_ids, pred_home, pred_away, old_points, old_breakdowns = zip(*rows)
+    points, codes = calculate_points_batch(
+        np.array(pred_home), np.array(pred_away), match.homeScore, match.awayScore
+    )
+    points = points.tolist()
+    breakdowns = BREAKDOWN_NAMES[codes].tolist()
+
+    for user_id, old_p, old_b, new_p, new_b in zip(
+        user_ids, old_points, old_breakdowns, points, breakdowns
+    ):
+        deltas.record(user_id, old_p, old_b, new_p, new_b, stage=match.stage)
+
+    db.execute(
+        predictions.update()
+        .where(predictions.c.id == bindparam("prediction_id"))
+        .values(
+            points=bindparam("new_points"),
+            pointsBreakdown=bindparam("new_breakdown"),
+            notified=False,  # Marca para notificar al usuario
+            updatedAt=datetime.utcnow(),
+        )
+        .execution_options(versioning_user_ids=set(user_ids)),
+        [
+            {"prediction_id": id_, "new_points": p, "new_breakdown": b}
+            for id_, p, b in zip(ids, points, breakdowns)
+        ],
+    )
+    # Los UPDATE de Core no pasan por el hook que alimenta /sync
+    changelog.record_owned(db, "prediction", dict(zip(ids, user_ids)))
+    return len(rows), list(user_ids)
+
+
 def calculate_points_for_matches(db: Session, match_ids: List[str]) -> int:
     """
-    Calcula puntos para todas las predictions de los matches dados.
+    Calcula puntos para todas las predictions de los matches dados, uno por
+    uno en orden de juego. Cada match se confirma por separado y deja su foto
+    del ranking, así el historial tiene un punto por partido aunque varios
+    terminen en el mismo scrape.
 
     Args:
         db: Database session
@@ -185,40 +362,33 @@ def calculate_points_for_matches(db: Session, match_ids: List[str]) -> int:
         Número de predictions actualizadas
     """
     total_updated = 0
-
-    for match_id in match_ids:
-        match = (
-            db.query(sql_models.Match).filter(sql_models.Match.id == match_id).first()
+    matches = (
+        db.query(sql_models.Match)
+        .filter(sql_models.Match.id.in_(match_ids))
+        .order_by(
+            sql_models.Match.date, sql_models.Match.matchNumber, sql_models.Match.id
         )
+        .all()
+    )
 
-        if not match or match.homeScore is None or match.awayScore is None:
+    for match in matches:
+        if match.homeScore is None or match.awayScore is None:
             logger.warning(
-                f"Match {match_id} has no scores, skipping points calculation"
+                f"Match {match.id} has no scores, skipping points calculation"
             )
             continue
 
-        predictions = (
-            db.query(sql_models.Prediction)
-            .filter(sql_models.Prediction.matchId == match_id)
-            .all()
-        )
-
-        for pred in predictions:
-            points, breakdown = calculate_points(
-                pred.homeScore, pred.awayScore, match.homeScore, match.awayScore
-            )
-
-            pred.points = points
-            pred.pointsBreakdown = breakdown
-            pred.notified = False  # Marca para notificar al usuario
-            pred.updatedAt = datetime.utcnow()
-            total_updated += 1
+        deltas = ScoreDeltas()
+        updated = score_match_predictions(db, match, deltas)
+        deltas.apply(db)
+        db.commit()
+        take_ranking_snapshot(db, match.id)
+        total_updated += updated
 
         logger.info(
-            f"✅ Calculated points for {len(predictions)} predictions of match {match_id}"
+            f"✅ Calculated points for {updated} predictions of match {match.id}"
         )
 
-    db.commit()
     return total_updated
 
 
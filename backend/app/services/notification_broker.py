@@ -0,0 +1,90 @@
+"""
+Notification Broker Service
+
+Pub/sub en memoria del proceso que despierta los streams SSE de
+/notifications/stream cuando un usuario recibe puntos.
+
+Los mensajes no llevan datos: la DB es la fuente de verdad. El pipeline de
+puntos publica los IDs de usuario afectados después del commit (ver
+match_updater.score_match_predictions) y cada stream despertado lee de la DB
+lo que le falta enviar. Varios avisos seguidos se juntan en uno solo.
+
+Es estado local del proceso: con varios workers, un stream solo se despierta
+con los puntos calculados en su propio worker. Los demás igual llegan al
+reconectar, porque el stream arranca leyendo la DB.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Un stream abierto: un asyncio.Event que se despierta desde cualquier hilo."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass  # El loop ya se cerró: el stream terminó
+
+    async def wait(self, timeout: float) -> bool:
+        """True si hubo aviso, False si venció el timeout."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+class NotificationBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Registra un stream; debe llamarse desde el event loop que lo atiende."""
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            streams = self._subscriptions.get(subscription.user_id)
+            if streams is not None:
+                streams.discard(subscription)
+                if not streams:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids: Iterable[str]) -> int:
+        """
+        Despierta los streams de estos usuarios. Thread-safe.
+
+        Returns:
+            Cantidad de streams despertados
+        """
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in targets:
+            subscription.notify()
+        if targets:
+            logger.debug(f"🔔 Woke {len(targets)} notification streams")
+        return len(targets)
+
+
+# Instancia global del proceso
+notification_broker = NotificationBroker()
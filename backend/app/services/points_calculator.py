@@ -9,7 +9,10 @@ Calcula puntos para predicciones según el sistema de diferencia de goles:
 - 0 puntos: No acierta nada
 """
 
-from typing import Tuple
+from typing import Callable, List, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, case, func, literal
 
 
 def calculate_points(
@@ -86,6 +89,95 @@ def calculate_points(
     return (0, "no_match")
 
 
+# Códigos de breakdown de calculate_points_batch, de menor a mayor puntaje
+BREAKDOWNS = (
+    "no_match",
+    "one_score_match",
+    "winner_only",
+    "winner_and_goal_diff",
+    "exact_result",
+)
+POINTS_BY_CODE = np.array([0, 1, 3, 4, 5])
+
+
+def calculate_points_batch(
+    pred_home, pred_away, real_home, real_away
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Versión vectorizada de calculate_points para muchas predicciones a la vez.
+
+    Args:
+        pred_home, pred_away: Arrays con los goles predichos
+        real_home, real_away: Goles reales (escalares o arrays del mismo largo)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (puntos, códigos)
+        - códigos: Índices en BREAKDOWNS (BREAKDOWNS[código] es el breakdown
+          que devolvería calculate_points)
+
+    Ejemplos:
+        >>> points, codes = calculate_points_batch([2, 2, 2, 0], [1, 0, 2, 1], 2, 1)
+        >>> points.tolist()
+        [5, 3, 1, 1]
+        >>> [BREAKDOWNS[code] for code in codes]
+        ['exact_result', 'winner_only', 'one_score_match', 'one_score_match']
+    """
+    rules = _breakdown_rules(
+        np.asarray(pred_home),
+        np.asarray(pred_away),
+        np.asarray(real_home),
+        np.asarray(real_away),
+        sign=np.sign,
+        absolute=np.abs,
+    )
+    # np.select toma la primera condición que se cumple, como los if de arriba
+    codes = np.select([rule for rule, _ in rules], [code for _, code in rules], 0)
+    return POINTS_BY_CODE[codes], codes
+
+
+def points_case(pred_home, pred_away, real_home: int, real_away: int):
+    """
+    Las mismas reglas como expresiones SQL, para puntuar un partido entero con
+    un solo UPDATE (SQLite y PostgreSQL).
+
+    Args:
+        pred_home, pred_away: Columnas con los goles predichos
+        real_home, real_away: Goles reales
+
+    Returns:
+        (puntos, breakdown): Expresiones CASE con el resultado de cada fila
+    """
+    rules = _breakdown_rules(
+        pred_home,
+        pred_away,
+        literal(real_home, Integer),
+        literal(real_away, Integer),
+        sign=lambda x: case((x > 0, 1), (x < 0, -1), else_=0),
+        absolute=func.abs,
+    )
+    points = case(*[(rule, int(POINTS_BY_CODE[code])) for rule, code in rules], else_=0)
+    breakdown = case(
+        *[(rule, BREAKDOWNS[code]) for rule, code in rules], else_=BREAKDOWNS[0]
+    )
+    return points, breakdown
+
+
+def _breakdown_rules(
+    pred_home, pred_away, real_home, real_away, sign: Callable, absolute: Callable
+) -> List[Tuple[object, int]]:
+    """
+    Reglas de calculate_points como (condición, código), en el orden en que se
+    evalúan: gana la primera que se cumple, y si no se cumple ninguna el código
+    es 0. Sirven para arrays de numpy y para columnas de SQLAlchemy.
+    """
+    exact = (pred_home == real_home) & (pred_away == real_away)
+    # Mismo ganador: el signo de la diferencia (1 local, 0 empate, -1 visitante)
+    same_winner = sign(pred_home - pred_away) == sign(real_home - real_away)
+    same_diff = absolute(pred_home - pred_away) == absolute(real_home - real_away)
+    one_score = (pred_home == real_home) | (pred_away == real_away)
+    return [(exact, 4), (same_winner & same_diff, 3), (same_winner, 2), (one_score, 1)]
+
+
 def get_points_message(points: int, breakdown: str) -> str:
     """
     Retorna un mensaje amigable para mostrar al usuario.
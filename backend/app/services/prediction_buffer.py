@@ -0,0 +1,436 @@
+"""
+Prediction Buffer Service
+
+Write-behind opcional para guardar predicciones (PREDICTION_WRITE_BEHIND=true),
+pensado para la última hora antes de un partido grande, cuando miles de
+usuarios guardan y vuelven a guardar.
+
+POST /predictions valida como siempre y, en lugar de abrir una transacción
+por pedido, agrega la predicción al buffer: la escribe en un journal local y
+confirma cuando un fsync la cubre. Los fsync se agrupan (group commit):
+mientras uno está en curso los pedidos que llegan solo escriben, y el
+siguiente fsync los confirma a todos juntos. Un hilo la baja a la DB cada
+FLUSH_INTERVAL o cuando se juntan FLUSH_ROWS filas, en un único upsert por
+lote (crud.save_buffered_predictions). Las ediciones repetidas del mismo
+usuario al mismo partido se colapsan en la última.
+
+Garantías:
+- Nada se acepta después del deadline: submit() vuelve a verificarlo bajo el
+  mismo lock con el que flush() toma el lote, y deadline_locker.lock_due_matches
+  hace flush antes de cerrar los partidos. Todo lo aceptado llega a la DB
+  antes del cierre.
+- Lo confirmado no se pierde si el proceso se cae: el journal se borra recién
+  después del commit del lote, y al habilitar el buffer se reaplica lo que
+  haya quedado. El directorio del journal tiene que estar en disco
+  persistente.
+- Varios workers pueden compartir el directorio: cada proceso escribe sus
+  propios segmentos ({dueño}.{n}.jsonl) y mantiene un flock sobre
+  {dueño}.lock mientras vive. Al arrancar, un worker solo reaplica los
+  segmentos de dueños cuyo lock ya nadie tiene (procesos muertos), con el
+  directorio bloqueado para que dos workers no reapliquen lo mismo.
+- Una fila que la DB rechaza (p. ej. una FK rota) no traba al resto: flush()
+  la aparta en el dead letter del directorio del journal y sigue.
+
+Mientras una predicción está en el buffer (unos milisegundos), las lecturas
+todavía devuelven la versión anterior. El router pasa el id de la fila que ya
+existía, así que la respuesta trae el mismo id que sin buffer.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import crud
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("PREDICTION_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+JOURNAL_DIR = os.getenv("PREDICTION_JOURNAL_DIR", "prediction-journal")
+FLUSH_INTERVAL = int(os.getenv("PREDICTION_FLUSH_MS", "50")) / 1000
+FLUSH_ROWS = int(os.getenv("PREDICTION_FLUSH_ROWS", "500"))
+
+JOURNAL_FIELDS = ("id", "userId", "matchId", "homeScore", "awayScore")
+# Filas que la DB rechazó al bajarlas (ver flush), en el directorio del journal
+DEAD_LETTER_FILE = "dead-letter.log"
+SEGMENT_SUFFIX = ".jsonl"
+LOCK_SUFFIX = ".lock"
+
+
+class PredictionBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Un flush a la vez: los segmentos del journal se borran en orden
+        self._flush_lock = threading.Lock()
+        self.enabled = False
+        self._pending: Dict[Tuple[str, str], dict] = {}
+        self._session_factory: Optional[Callable] = None
+        self._journal_dir = JOURNAL_DIR
+        self._journal = None
+        # Identifica los segmentos de este proceso (el uuid cubre pids reusados)
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._owner_lock = None
+        self._segment = 0
+        self._sealed: List[str] = []
+        # Group commit: escrituras al journal numeradas y hasta cuál hay fsync
+        self._synced_cond = threading.Condition(self._lock)
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        self._flush_interval = FLUSH_INTERVAL
+        self._flush_rows = FLUSH_ROWS
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def enable(
+        self,
+        session_factory: Callable,
+        journal_dir: str = JOURNAL_DIR,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_rows: int = FLUSH_ROWS,
+    ) -> None:
+        """
+        Reaplica el journal que hayan dejado procesos caídos y arranca el hilo
+        de flush.
+        """
+        self._session_factory = session_factory
+        self._journal_dir = journal_dir
+        self._flush_interval = flush_interval
+        self._flush_rows = flush_rows
+        os.makedirs(journal_dir, exist_ok=True)
+
+        # Con el directorio bloqueado: tomar el lock propio y adoptar lo que
+        # dejaron otros no se cruza con el arranque de otro worker
+        directory = os.open(journal_dir, os.O_RDONLY)
+        try:
+            fcntl.flock(directory, fcntl.LOCK_EX)
+            self._owner_lock = open(self._owner_path(LOCK_SUFFIX), "w")
+            fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self._recover_orphans()
+        finally:
+            os.close(directory)
+
+        with self._lock:
+            self._open_segment()
+            self._stopping = False
+            self.enabled = True
+        self._thread = threading.Thread(
+            target=self._run, name="prediction-buffer", daemon=True
+        )
+        self._thread.start()
+
+    def disable(self) -> None:
+        """Detiene el hilo y baja lo pendiente a la DB."""
+        with self._lock:
+            if not self.enabled:
+                return
+            self.enabled = False
+            self._stopping = True
+            self._wakeup.notify()
+        self._thread.join()
+        self.flush()
+        with self._lock:
+            self._journal.close()
+            self._journal = None
+            if not self._pending:
+                os.remove(self._journal_path(self._segment))
+                os.remove(self._owner_path(LOCK_SUFFIX))
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    def submit(
+        self,
+        user_id: str,
+        match_id: str,
+        home_score: int,
+        away_score: int,
+        deadline: Optional[datetime],
+        existing_id: Optional[str] = None,
+    ) -> Tuple[dict, bool]:
+        """
+        Acepta la predicción si el deadline no pasó: queda en el journal (en
+        disco) y en el lote del próximo flush.
+
+        Args:
+            existing_id: Id de la predicción ya guardada en la DB, si la hay
+
+        Returns:
+            (predicción como la devuelve POST /predictions, creada)
+
+        Raises:
+            ValueError: Si ya no se puede predecir el partido
+        """
+        [accepted] = self.submit_many(
+            user_id, [(match_id, home_score, away_score, deadline, existing_id)]
+        )
+        if accepted is None:
+            raise ValueError("Prediction deadline has passed")
+        return accepted
+
+    def submit_many(
+        self, user_id: str, items: List[tuple]
+    ) -> List[Optional[Tuple[dict, bool]]]:
+        """
+        Como submit() para varias predicciones del usuario, con una sola
+        escritura del journal (POST /predictions/bulk). Vuelve cuando un fsync
+        cubre esa escritura.
+
+        Args:
+            items: (matchId, homeScore, awayScore, deadline, existingId)
+
+        Returns:
+            (predicción, creada) por item, o None si su deadline ya pasó
+        """
+        results = []
+        with self._lock:
+            if not self.enabled:
+                raise RuntimeError("Prediction buffer is not enabled")
+            now = datetime.utcnow()
+            lines = []
+            for match_id, home_score, away_score, deadline, existing_id in items:
+                # Se verifica bajo el lock que usa flush() para tomar el lote
+                if deadline is None or now >= deadline:
+                    results.append(None)
+                    continue
+
+                key = (user_id, match_id)
+                previous = self._pending.get(key)
+                # Una fila existente conserva su id en el upsert
+                if existing_id is None and previous is not None:
+                    existing_id = previous["id"]
+                row = {
+                    "id": existing_id or str(uuid.uuid4()),
+                    "userId": user_id,
+                    "matchId": match_id,
+                    "homeScore": home_score,
+                    "awayScore": away_score,
+                }
+                lines.append(json.dumps(row) + "\n")
+                self._pending[key] = row
+                results.append(
+                    (
+                        {
+                            **row,
+                            "points": None,
+                            "pointsBreakdown": None,
+                            "notified": False,
+                        },
+                        existing_id is None,
+                    )
+                )
+
+            ticket = None
+            if lines:
+                self._journal.write("".join(lines))
+                self._written += 1
+                ticket = self._written
+            if len(self._pending) >= self._flush_rows:
+                self._wakeup.notify()
+
+            if ticket is not None:
+                self._wait_for_sync(ticket)
+        return results
+
+    def _wait_for_sync(self, ticket: int) -> None:
+        """
+        Espera (con self._lock tomado) a que un fsync cubra la escritura
+        ticket. Si no hay uno en curso, este hilo lo hace por todas las
+        escrituras hasta ahora, sin el lock para que las demás sigan entrando.
+        """
+        while self._synced < ticket:
+            if self._syncing:
+                self._synced_cond.wait()
+                continue
+            self._syncing = True
+            target = self._written
+            self._journal.flush()
+            # Copia del descriptor: flush() puede rotar el segmento mientras tanto
+            fd = os.dup(self._journal.fileno())
+            self._lock.release()
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+                self._lock.acquire()
+                self._syncing = False
+                self._synced_cond.notify_all()
+            self._synced = max(self._synced, target)
+
+    def _sync_journal(self) -> None:
+        """fsync de lo escrito en el segmento abierto (con self._lock tomado)."""
+        if self._synced < self._written:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._synced = self._written
+            self._synced_cond.notify_all()
+
+    def flush(self) -> int:
+        """
+        Baja el lote pendiente a la DB en un solo upsert y borra su journal.
+
+        Si el upsert falla, reintenta fila por fila: las que la DB rechaza
+        (IntegrityError, DataError) van al dead letter (DEAD_LETTER_FILE en el
+        directorio del journal) para no trabar a las demás. Ante cualquier
+        otro error el lote vuelve al buffer (sin pisar ediciones más
+        nuevas) y se relanza.
+
+        Returns:
+            Número de predicciones escritas
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                if self._journal is not None:
+                    # Lo que todavía espera su fsync queda cubierto antes de rotar
+                    self._sync_journal()
+                    self._journal.close()
+                    self._sealed.append(self._journal_path(self._segment))
+                    self._open_segment()
+                sealed = list(self._sealed)
+
+            rows = list(batch.values())
+            db = self._session_factory()
+            try:
+                try:
+                    written = crud.save_buffered_predictions(db, rows)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Batch flush failed, retrying row by row: {e}")
+                    written = self._flush_rows_one_by_one(db, rows)
+            except Exception:
+                with self._lock:
+                    for key, row in batch.items():
+                        self._pending.setdefault(key, row)
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                for path in sealed:
+                    os.remove(path)
+                    self._sealed.remove(path)
+        logger.debug(f"Flushed {written} buffered predictions")
+        return written
+
+    def _flush_rows_one_by_one(self, db, rows: List[dict]) -> int:
+        written = 0
+        rejected = []
+        for row in rows:
+            try:
+                written += crud.save_buffered_predictions(db, [row])
+            except (IntegrityError, DataError) as e:
+                db.rollback()
+                logger.error(f"Dead-lettering buffered prediction {row['id']}: {e}")
+                rejected.append(row)
+        if rejected:
+            path = os.path.join(self._journal_dir, DEAD_LETTER_FILE)
+            with open(path, "a") as dead_letter:
+                dead_letter.writelines(json.dumps(row) + "\n" for row in rejected)
+                dead_letter.flush()
+                os.fsync(dead_letter.fileno())
+        return written
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                self._wakeup.wait_for(
+                    lambda: self._stopping or len(self._pending) >= self._flush_rows,
+                    timeout=self._flush_interval,
+                )
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Prediction buffer flush failed, will retry: {e}")
+
+    # ----- Recuperación (con el directorio del journal bloqueado) -----
+
+    def _recover_orphans(self) -> None:
+        """
+        Reaplica los segmentos sin dueño vivo (los de procesos cuyo lock se
+        puede tomar, y los que no tienen lock, de versiones previas) y borra
+        los locks de esos procesos.
+        """
+        segments: Dict[str, List[str]] = {}
+        for name in os.listdir(self._journal_dir):
+            if name.endswith(SEGMENT_SUFFIX):
+                owner = name.rsplit(".", 2)[0] if name.count(".") == 2 else ""
+                segments.setdefault(owner, []).append(name)
+            elif name.endswith(LOCK_SUFFIX) and name != self._owner + LOCK_SUFFIX:
+                # Un proceso muerto sin segmentos solo deja su lock
+                segments.setdefault(name[: -len(LOCK_SUFFIX)], [])
+
+        orphans, dead_locks = [], []
+        for owner, names in segments.items():
+            lock_path = os.path.join(self._journal_dir, owner + LOCK_SUFFIX)
+            if owner and os.path.exists(lock_path):
+                lock = open(lock_path, "a")
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()  # Su proceso sigue vivo
+                    continue
+                dead_locks.append((lock, lock_path))
+            orphans += [os.path.join(self._journal_dir, name) for name in names]
+
+        # Para la misma predicción gana la edición escrita más tarde
+        orphans.sort(key=lambda path: (os.path.getmtime(path), path))
+        try:
+            with self._lock:
+                for path in orphans:
+                    self._load_segment(path)
+                self._sealed = list(orphans)
+            replayed = self.flush()
+            # Sin nada que bajar flush() no llega a borrarlos
+            for path in self._sealed:
+                os.remove(path)
+            self._sealed = []
+            for _, lock_path in dead_locks:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(lock_path)
+        finally:
+            for lock, _ in dead_locks:
+                lock.close()
+        if orphans:
+            logger.info(f"📒 Replayed {replayed} buffered predictions from journal")
+
+    # ----- Journal (llamar con self._lock tomado) -----
+
+    def _owner_path(self, suffix: str) -> str:
+        return os.path.join(self._journal_dir, self._owner + suffix)
+
+    def _journal_path(self, segment: int) -> str:
+        return self._owner_path(f".{segment:012d}{SEGMENT_SUFFIX}")
+
+    def _open_segment(self) -> None:
+        self._segment += 1
+        self._journal = open(self._journal_path(self._segment), "a")
+
+    def _load_segment(self, path: str) -> None:
+        with open(path) as journal:
+            for line in journal:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue  # Última línea a medio escribir al caerse
+                row = {field: row[field] for field in JOURNAL_FIELDS}
+                self._pending[(row["userId"], row["matchId"])] = row
+
+
+# Instancia global del proceso
+prediction_buffer = PredictionBuffer()
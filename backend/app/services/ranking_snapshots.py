@@ -0,0 +1,57 @@
+"""
+Ranking Snapshots Service
+
+Guarda una foto del ranking (puntos acumulados y posición de cada usuario)
+después de puntuar cada match finalizado, en orden, y después de cada
+recálculo. Con las fotos, "cuántos puestos subí desde el último partido" o
+"el ranking después del partido N" son lecturas indexadas en lugar de
+reprocesar todas las predicciones con calculate_points.
+"""
+
+import logging
+from datetime import datetime
+
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import crud, sql_models
+
+logger = logging.getLogger(__name__)
+
+
+def take_ranking_snapshot(db: Session, match_id: str) -> int:
+    """
+    Agrega una foto del ranking actual con el siguiente número de secuencia.
+    Todas las filas se escriben con un único INSERT ... SELECT sobre la
+    consulta de ranking, sin traer los usuarios a Python. Hace commit.
+
+    Args:
+        db: Database session
+        match_id: Match recién puntuado (o recalculado) al que queda asociada
+
+    Returns:
+        Número de secuencia de la foto
+    """
+    # La DB asigna la secuencia: un scrape y un set-result a la vez no chocan
+    snapshot = sql_models.RankingSnapshot(matchId=match_id, createdAt=datetime.utcnow())
+    db.add(snapshot)
+    db.flush()
+    sequence = snapshot.sequence
+
+    ranking = crud.ranking_query().subquery()
+    entries = sql_models.RankingSnapshotEntry.__table__
+    db.execute(
+        insert(entries).from_select(
+            ["sequence", "userId", "points", "position"],
+            select(
+                literal(sequence),
+                ranking.c.userId,
+                ranking.c.points,
+                ranking.c.position,
+            ),
+        )
+    )
+    db.commit()
+
+    logger.info(f"📸 Saved ranking snapshot #{sequence} after match {match_id}")
+    return sequence
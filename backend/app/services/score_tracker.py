@@ -0,0 +1,350 @@
+"""
+Score Tracker Service
+
+Mantiene la tabla user_scores (puntos, aciertos y resultados exactos por
+usuario) y su desglose por fase en user_stage_scores aplicando deltas cada
+vez que cambian los puntos de una predicción, en lugar de recalcular el
+ranking leyendo todas las predicciones.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, bindparam, literal, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import crud, sql_models
+from app.database import run_after_commit
+from app.services.leaderboard import leaderboard
+
+logger = logging.getLogger(__name__)
+
+_DIALECT_INSERT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def score_contribution(
+    points: Optional[int], breakdown: Optional[str]
+) -> Tuple[int, int, int]:
+    """
+    Aporte de una predicción a los totales del usuario.
+
+    Returns:
+        (puntos, acierto, exacto) - acierto es 1 si sumó puntos,
+        exacto es 1 si acertó el resultado exacto.
+    """
+    points = points or 0
+    return (
+        points,
+        1 if points > 0 else 0,
+        1 if breakdown == "exact_result" else 0,
+    )
+
+
+class ScoreDeltas:
+    """
+    Acumula los cambios de puntos por usuario durante un cálculo y los
+    aplica con un UPDATE por lotes sobre user_scores y otro sobre
+    group_members (todos los grupos de cada usuario). Si se indica la fase
+    del partido, también acumula el desglose por (usuario, fase).
+    """
+
+    def __init__(self):
+        self._deltas: Dict[str, List[int]] = defaultdict(lambda: [0, 0, 0])
+        self._stage_deltas: Dict[Tuple[str, str], List[int]] = defaultdict(
+            lambda: [0, 0, 0]
+        )
+
+    def record(
+        self,
+        user_id: str,
+        old_points: Optional[int],
+        old_breakdown: Optional[str],
+        new_points: Optional[int],
+        new_breakdown: Optional[str],
+        stage: Optional[str] = None,
+    ) -> None:
+        """Registra el cambio de una predicción de (old) a (new)."""
+        old = score_contribution(old_points, old_breakdown)
+        new = score_contribution(new_points, new_breakdown)
+        delta = self._deltas[user_id]
+        # La fila de la fase se crea aunque el delta sea cero
+        stage_delta = self._stage_deltas[(user_id, stage)] if stage else None
+        for i in range(3):
+            delta[i] += new[i] - old[i]
+            if stage_delta is not None:
+                stage_delta[i] += new[i] - old[i]
+
+    def items(self) -> List[Tuple[str, Tuple[int, int, int]]]:
+        """Deltas distintos de cero como (userId, (puntos, aciertos, exactos))."""
+        return [
+            (user_id, tuple(delta))
+            for user_id, delta in self._deltas.items()
+            if any(delta)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.items())
+
+    def apply(self, db: Session) -> int:
+        """
+        Aplica los deltas a user_scores, group_members y user_stage_scores.
+        No hace commit: el llamador confirma junto con las predicciones para
+        que queden consistentes. El leaderboard en memoria se actualiza recién
+        cuando se confirma.
+
+        Returns:
+            Número de usuarios actualizados
+        """
+        self._apply_stages(db)
+
+        items = self.items()
+        rows = [
+            {
+                "user_id": user_id,
+                "d_points": points,
+                "d_correct": correct,
+                "d_exact": exact,
+                "now": datetime.utcnow(),
+            }
+            for user_id, (points, correct, exact) in items
+        ]
+        if not rows:
+            return 0
+
+        scores = sql_models.UserScore.__table__
+        db.execute(
+            scores.update()
+            .where(scores.c.userId == bindparam("user_id"))
+            .values(
+                points=scores.c.points + bindparam("d_points"),
+                correctPredictions=scores.c.correctPredictions + bindparam("d_correct"),
+                exactPredictions=scores.c.exactPredictions + bindparam("d_exact"),
+                updatedAt=bindparam("now"),
+            ),
+            rows,
+        )
+
+        # Same deltas for every group each user belongs to, in one batch
+        members = sql_models.GroupMember.__table__
+        db.execute(
+            members.update()
+            .where(members.c.userId == bindparam("user_id"))
+            .values(
+                points=members.c.points + bindparam("d_points"),
+                correctPredictions=members.c.correctPredictions
+                + bindparam("d_correct"),
+                exactPredictions=members.c.exactPredictions + bindparam("d_exact"),
+            ),
+            rows,
+        )
+
+        run_after_commit(db, lambda: leaderboard.apply_deltas(items))
+        return len(rows)
+
+    def _apply_stages(self, db: Session) -> None:
+        """Inserta las filas (usuario, fase) nuevas y actualiza el resto por lotes."""
+        if not self._stage_deltas:
+            return
+
+        stage_scores = sql_models.UserStageScore.__table__
+        now = datetime.utcnow()
+        existing = set(
+            db.execute(
+                select(stage_scores.c.userId, stage_scores.c.stage).where(
+                    stage_scores.c.stage.in_({s for _, s in self._stage_deltas}),
+                    stage_scores.c.userId.in_({u for u, _ in self._stage_deltas}),
+                )
+            ).all()
+        )
+
+        new_rows = []
+        update_rows = []
+        for (user_id, stage), (points, correct, exact) in self._stage_deltas.items():
+            if (user_id, stage) not in existing:
+                new_rows.append(
+                    {
+                        "userId": user_id,
+                        "stage": stage,
+                        "points": points,
+                        "correctPredictions": correct,
+                        "exactPredictions": exact,
+                        "updatedAt": now,
+                    }
+                )
+            elif points or correct or exact:
+                update_rows.append(
+                    {
+                        "user_id": user_id,
+                        "stage_name": stage,
+                        "d_points": points,
+                        "d_correct": correct,
+                        "d_exact": exact,
+                        "now": now,
+                    }
+                )
+
+        if new_rows:
+            db.execute(stage_scores.insert(), new_rows)
+        if update_rows:
+            db.execute(
+                stage_scores.update()
+                .where(
+                    stage_scores.c.userId == bindparam("user_id"),
+                    stage_scores.c.stage == bindparam("stage_name"),
+                )
+                .values(
+                    points=stage_scores.c.points + bindparam("d_points"),
+                    correctPredictions=stage_scores.c.correctPredictions
+                    + bindparam("d_correct"),
+                    exactPredictions=stage_scores.c.exactPredictions
+                    + bindparam("d_exact"),
+                    updatedAt=bindparam("now"),
+                ),
+                update_rows,
+            )
+
+
+def apply_delta_query(db: Session, deltas, stage: Optional[str] = None) -> List[str]:
+    """
+    Como ScoreDeltas.apply, con deltas que calcula la propia DB: deltas es un
+    SELECT de (userId, d_points, d_correct, d_exact), una fila por usuario.
+    Se aplica con UPDATE ... FROM e INSERT ... SELECT, sin traer los deltas a
+    Python; solo vuelven los totales nuevos de cada usuario, para el
+    leaderboard en memoria. No hace commit.
+
+    Returns:
+        IDs de los usuarios actualizados
+    """
+    deltas = deltas.subquery("deltas")
+    now = datetime.utcnow()
+
+    if stage:
+        stage_scores = sql_models.UserStageScore.__table__
+        insert = _DIALECT_INSERT[db.get_bind().dialect.name]
+        statement = insert(stage_scores).from_select(
+            [
+                "userId",
+                "stage",
+                "points",
+                "correctPredictions",
+                "exactPredictions",
+                "updatedAt",
+            ],
+            select(
+                deltas.c.userId,
+                literal(stage),
+                deltas.c.d_points,
+                deltas.c.d_correct,
+                deltas.c.d_exact,
+                literal(now, DateTime),
+            )
+            # SQLite necesita un WHERE para no confundir ON CONFLICT con un JOIN
+            .where(true()),
+        )
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[stage_scores.c.userId, stage_scores.c.stage],
+                set_={
+                    "points": stage_scores.c.points + statement.excluded.points,
+                    "correctPredictions": stage_scores.c.correctPredictions
+                    + statement.excluded.correctPredictions,
+                    "exactPredictions": stage_scores.c.exactPredictions
+                    + statement.excluded.exactPredictions,
+                    "updatedAt": statement.excluded.updatedAt,
+                },
+            )
+        )
+
+    members = sql_models.GroupMember.__table__
+    db.execute(
+        members.update()
+        .where(members.c.userId == deltas.c.userId)
+        .values(
+            points=members.c.points + deltas.c.d_points,
+            correctPredictions=members.c.correctPredictions + deltas.c.d_correct,
+            exactPredictions=members.c.exactPredictions + deltas.c.d_exact,
+        )
+    )
+
+    scores = sql_models.UserScore.__table__
+    statement = (
+        scores.update()
+        .where(scores.c.userId == deltas.c.userId)
+        .values(
+            points=scores.c.points + deltas.c.d_points,
+            correctPredictions=scores.c.correctPredictions + deltas.c.d_correct,
+            exactPredictions=scores.c.exactPredictions + deltas.c.d_exact,
+            updatedAt=now,
+        )
+    )
+    totals = (
+        scores.c.userId,
+        scores.c.points,
+        scores.c.correctPredictions,
+        scores.c.exactPredictions,
+    )
+    if db.get_bind().dialect.update_returning:
+        rows = db.execute(statement.returning(*totals)).all()
+    else:
+        db.execute(statement)
+        rows = db.execute(
+            select(*totals).where(scores.c.userId.in_(select(deltas.c.userId)))
+        ).all()
+
+    items = [(user_id, tuple(values)) for user_id, *values in rows]
+    run_after_commit(db, lambda: leaderboard.apply_totals(items))
+    return [user_id for user_id, _ in items]
+
+
+def rebuild_user_scores(db: Session) -> int:
+    """
+    Recalcula user_scores, user_stage_scores y los totales de group_members
+    desde cero agregando la tabla de predicciones. Se usa al iniciar la app
+    para rellenar usuarios existentes y corregir cualquier desvío; en
+    operación normal se mantiene solo con deltas.
+
+    Returns:
+        Número de usuarios con totales
+    """
+    now = datetime.utcnow()
+    rows = [
+        {**row._mapping, "updatedAt": now}
+        for row in db.execute(crud.user_totals_query())
+    ]
+
+    scores = sql_models.UserScore.__table__
+    db.execute(scores.delete())
+    if rows:
+        db.execute(scores.insert(), rows)
+
+    stage_scores = sql_models.UserStageScore.__table__
+    stage_rows = [
+        {**row._mapping, "updatedAt": now}
+        for row in db.execute(crud.user_stage_totals_query())
+    ]
+    db.execute(stage_scores.delete())
+    if stage_rows:
+        db.execute(stage_scores.insert(), stage_rows)
+
+    # Group leaderboards carry the same totals as user_scores
+    members = sql_models.GroupMember.__table__
+    db.execute(
+        members.update().values(
+            points=select(scores.c.points)
+            .where(scores.c.userId == members.c.userId)
+            .scalar_subquery(),
+            correctPredictions=select(scores.c.correctPredictions)
+            .where(scores.c.userId == members.c.userId)
+            .scalar_subquery(),
+            exactPredictions=select(scores.c.exactPredictions)
+            .where(scores.c.userId == members.c.userId)
+            .scalar_subquery(),
+        )
+    )
+    db.commit()
+
+    logger.info(f"📊 Rebuilt user_scores for {len(rows)} users")
+    return len(rows)
@@ -1,4 +1,15 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    String,
+    Integer,
+    Boolean,
+    DateTime,
+    FetchedValue,
+    ForeignKey,
+    Float,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -16,6 +27,7 @@ class User(Base):
 
     # Relationships
     predictions = relationship("Prediction", back_populates="user")
+    score = relationship("UserScore", back_populates="user", uselist=False)
 
 
 class Match(Base):
@@ -42,6 +54,9 @@ class Match(Base):
     city = Column(String, nullable=True)
     fifaMatchId = Column(String, nullable=True, unique=True)  # ID from FIFA API
     manualOverride = Column(Boolean, default=False)  # Flag for manual result entry
+    locked = Column(
+        Boolean, nullable=False, default=False
+    )  # Predictions closed; set at the deadline by services.deadline_locker
     updatedAt = Column(
         DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
     )
@@ -49,6 +64,17 @@ class Match(Base):
     # Relationships
     predictions = relationship("Prediction", back_populates="match")
 
+    __table_args__ = (
+        # Fixture windows in (date, id) keyset order: by date alone or
+        # narrowed by status, stage or group first
+        Index("ix_matches_date", "date", "id"),
+        Index("ix_matches_status_date", "status", "date", "id"),
+        Index("ix_matches_stage_date", "stage", "date", "id"),
+        Index("ix_matches_group_date", "group", "date", "id"),
+        # Delta sync from a timestamp (/sync?since=<time>)
+        Index("ix_matches_updated_at", "updatedAt"),
+    )
+
 
 class Prediction(Base):
     __tablename__ = "predictions"
@@ -72,6 +98,23 @@ class Prediction(Base):
     user = relationship("User", back_populates="predictions")
     match = relationship("Match", back_populates="predictions")
 
+    __table_args__ = (
+        # One prediction per user and match; the conflict target of the
+        # upsert in crud.upsert_predictions
+        Index("uq_predictions_user_match", "userId", "matchId", unique=True),
+        # Scoring a finished match reads all of its predictions
+        Index("ix_predictions_match", "matchId"),
+        # Points the user has not been told about yet (a small, hot subset)
+        Index(
+            "ix_predictions_unnotified",
+            "userId",
+            sqlite_where=points.isnot(None) & (notified == False),  # noqa: E712
+            postgresql_where=points.isnot(None) & (notified == False),  # noqa: E712
+        ),
+        # Delta sync from a timestamp: the caller's predictions changed since
+        Index("ix_predictions_user_updated_at", "userId", "updatedAt"),
+    )
+
 
 class ScraperLog(Base):
     """Log de ejecuciones del scraper de FIFA"""
@@ -89,3 +132,193 @@ class ScraperLog(Base):
     retryCount = Column(Integer, default=0)
     durationSeconds = Column(Float, nullable=True)
     createdAt = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Latest executions first, overall and per status
+        Index("ix_scraper_logs_execution_time", "executionTime"),
+        Index("ix_scraper_logs_status", "status", "executionTime"),
+    )
+
+
+class UserScore(Base):
+    """
+    Read model with each user's accumulated totals.
+
+    Maintained by delta from the points pipeline (see services.score_tracker)
+    so the ranking never has to aggregate the predictions table.
+    """
+
+    __tablename__ = "user_scores"
+
+    userId = Column(String, ForeignKey("users.id"), primary_key=True)
+    points = Column(Integer, nullable=False, default=0)
+    correctPredictions = Column(Integer, nullable=False, default=0)
+    exactPredictions = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(
+        DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
+    )
+
+    # Relationships
+    user = relationship("User", back_populates="score")
+
+    __table_args__ = (
+        # Matches the ranking ORDER BY so pages and rank counts are index range scans
+        Index(
+            "ix_user_scores_rank",
+            points.desc(),
+            exactPredictions.desc(),
+            correctPredictions.desc(),
+            userId,
+        ),
+    )
+
+
+class UserStageScore(Base):
+    """
+    Per-stage rollup of a user's totals (group stage, round of 16, ...),
+    maintained by the same deltas as user_scores. A row exists once one of
+    the user's predictions for that stage has been scored.
+    """
+
+    __tablename__ = "user_stage_scores"
+
+    userId = Column(String, ForeignKey("users.id"), primary_key=True)
+    stage = Column(String, primary_key=True)
+    points = Column(Integer, nullable=False, default=0)
+    correctPredictions = Column(Integer, nullable=False, default=0)
+    exactPredictions = Column(Integer, nullable=False, default=0)
+    updatedAt = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        # Stage ranking: index range scan in ranking order
+        Index(
+            "ix_user_stage_scores_rank",
+            stage,
+            points.desc(),
+            exactPredictions.desc(),
+            correctPredictions.desc(),
+            userId,
+        ),
+    )
+
+
+class MatchScoreline(Base):
+    """
+    Crowd histogram: how many predictions of a match picked each scoreline.
+    Built when the match locks (services.crowd_stats).
+    """
+
+    __tablename__ = "match_scorelines"
+
+    matchId = Column(String, ForeignKey("matches.id"), primary_key=True)
+    homeScore = Column(Integer, primary_key=True)
+    awayScore = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class RankingSnapshot(Base):
+    """Ranking frozen after one finished match was scored or recalculated"""
+
+    __tablename__ = "ranking_snapshots"
+
+    # Assigned by the database, so concurrent snapshots never collide
+    sequence = Column(Integer, primary_key=True, autoincrement=True)
+    matchId = Column(String, ForeignKey("matches.id"), nullable=True)
+    createdAt = Column(DateTime, default=datetime.datetime.utcnow)
+
+
+class RankingSnapshotEntry(Base):
+    """One user's cumulative points and position in a snapshot (append-only)"""
+
+    __tablename__ = "ranking_snapshot_entries"
+
+    sequence = Column(
+        Integer, ForeignKey("ranking_snapshots.sequence"), primary_key=True
+    )
+    userId = Column(String, ForeignKey("users.id"), primary_key=True)
+    points = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_ranking_snapshot_entries_position", "sequence", "position"),
+        Index("ix_ranking_snapshot_entries_user", "userId", "sequence"),
+    )
+
+
+class Group(Base):
+    """Private league with its own leaderboard"""
+
+    __tablename__ = "groups"
+
+    id = Column(String, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(String, nullable=True)
+    adminId = Column(String, ForeignKey("users.id"), nullable=False)
+    inviteCode = Column(String, unique=True, index=True, nullable=False)
+    scoringSystem = Column(String, nullable=False, default="classic")
+    status = Column(String, nullable=False, default="active")
+    playerCount = Column(Integer, nullable=False, default=0)
+    createdAt = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Relationships
+    members = relationship("GroupMember", back_populates="group")
+
+
+class GroupMember(Base):
+    """
+    Group membership plus the member's totals, kept in step with user_scores
+    by the same deltas (see services.score_tracker) so each group's
+    leaderboard is a single indexed read.
+    """
+
+    __tablename__ = "group_members"
+
+    groupId = Column(String, ForeignKey("groups.id"), primary_key=True)
+    userId = Column(String, ForeignKey("users.id"), primary_key=True)
+    isAdmin = Column(Boolean, nullable=False, default=False)
+    joinedAt = Column(DateTime, default=datetime.datetime.utcnow)
+    points = Column(Integer, nullable=False, default=0)
+    correctPredictions = Column(Integer, nullable=False, default=0)
+    exactPredictions = Column(Integer, nullable=False, default=0)
+
+    # Relationships
+    group = relationship("Group", back_populates="members")
+    user = relationship("User")
+
+    __table_args__ = (
+        # Membership lookup by user: which groups receive a user's deltas
+        Index("ix_group_members_user", "userId"),
+        Index(
+            "ix_group_members_rank",
+            groupId,
+            points.desc(),
+            exactPredictions.desc(),
+            correctPredictions.desc(),
+            userId,
+        ),
+    )
+
+
+class ChangeLog(Base):
+    """
+    Append-only log of match and prediction changes for delta sync; written
+    by app.changelog. userId is set for per-user entities (predictions).
+    """
+
+    __tablename__ = "change_log"
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String, nullable=False)  # 'match' or 'prediction'
+    entityId = Column(String, nullable=False)
+    userId = Column(String, nullable=True)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changedAt = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # Writing transaction on PostgreSQL, filled by the database (app.changelog)
+    txid = Column(BigInteger, nullable=True, server_default=FetchedValue())
+
+    __table_args__ = (
+        Index("ix_change_log_changed_at", "changedAt"),
+        Index("ix_change_log_txid", "txid"),
+        # Never reuse a sequence number on SQLite, even after pruning
+        {"sqlite_autoincrement": True},
+    )
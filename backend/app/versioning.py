@@ -0,0 +1,161 @@
+"""
+Per-table version counters for conditional GETs (ETag / If-None-Match).
+
+Every commit that wrote to a table bumps that table's version, whatever the
+writer (ORM unit of work or a bulk INSERT/UPDATE/DELETE through the session).
+Read endpoints derive an ETag from the versions of the tables they read and
+answer a matching If-None-Match with 304 before running any query.
+
+Predictions are versioned per user as well, so one user saving a prediction
+does not invalidate everyone else's /matches. Counters live in the process;
+the ETag carries a per-process id so a restart or another worker never
+produces a false match.
+"""
+
+import hashlib
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Imported first so its after_commit listener (run_after_commit callbacks,
+# which update in-process state such as the leaderboard) runs before ours.
+from . import database  # noqa: F401
+
+# Tables whose rows belong to a user: ORM writes bump only "<table>:<userId>",
+# bulk statements bump the whole table unless they carry the
+# versioning_user_id (or versioning_user_ids) execution option
+USER_SCOPED_TABLES = {"predictions"}
+
+_PROCESS_ID = uuid.uuid4().hex[:8]
+_lock = threading.Lock()
+_versions: Dict[str, int] = defaultdict(int)
+_expires_at: Dict[str, datetime] = {}
+
+
+def bump(*keys: str) -> None:
+    with _lock:
+        for key in keys:
+            _versions[key] += 1
+            _expires_at.pop(key, None)
+
+
+def version(key: str) -> int:
+    with _lock:
+        expires_at = _expires_at.get(key)
+        if expires_at is not None and datetime.utcnow() >= expires_at:
+            _versions[key] += 1
+            del _expires_at[key]
+        return _versions[key]
+
+
+def expire_at(key: str, when: Optional[datetime]) -> None:
+    """
+    Bump key at `when` even if nothing is written, for data that changes with
+    time alone (e.g. a match stops being editable at its deadline).
+    """
+    if when is None:
+        return
+    with _lock:
+        current = _expires_at.get(key)
+        if current is None or when < current:
+            _expires_at[key] = when
+
+
+def etag_for(*tables: str, user_id: str = None, scope: str = "") -> str:
+    parts = []
+    for table in tables:
+        parts.append(str(version(table)))
+        if user_id and table in USER_SCOPED_TABLES:
+            parts.append(str(version(f"{table}:{user_id}")))
+    digest = hashlib.sha1(f"{user_id}|{scope}".encode()).hexdigest()[:10]
+    return f'W/"{_PROCESS_ID}-{".".join(parts)}-{digest}"'
+
+
+def conditional_get(
+    request: Request,
+    response: Response,
+    *tables: str,
+    user_id: str = None,
+) -> Optional[Response]:
+    """
+    Compute the ETag for a read endpoint. Returns a ready 304 response when
+    the client's If-None-Match matches; otherwise sets the ETag on `response`
+    and returns None so the endpoint builds the body as usual.
+
+    Call it before querying, so a write that lands mid-request can only make
+    the ETag older than the data, never newer.
+    """
+    etag = etag_for(*tables, user_id=user_id, scope=str(request.url.query))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+# ----- Track which tables each session writes -----
+
+
+def _touch(session: Session, key: str) -> None:
+    session.info.setdefault("touched_tables", set()).add(key)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table is None:
+            continue
+        if table in USER_SCOPED_TABLES and getattr(obj, "userId", None):
+            _touch(session, f"{table}:{obj.userId}")
+        else:
+            _touch(session, table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_dml_tables(orm_execute_state):
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    name = getattr(table, "name", None)
+    if not name:
+        return
+    # Statements that only write some users' rows say so explicitly
+    options = orm_execute_state.execution_options
+    user_ids = options.get("versioning_user_ids")
+    if options.get("versioning_user_id"):
+        user_ids = (options["versioning_user_id"],)
+    if user_ids and name in USER_SCOPED_TABLES:
+        for user_id in user_ids:
+            _touch(orm_execute_state.session, f"{name}:{user_id}")
+    else:
+        _touch(orm_execute_state.session, name)
+
+
+# Runs after database's run_after_commit listener (see import above), so a
+# version only changes once in-process state has caught up with the commit.
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    touched = session.info.pop("touched_tables", None)
+    if touched:
+        bump(*touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session):
+    session.info.pop("touched_tables", None)
@@ -0,0 +1,153 @@
+"""
+Benchmark: FAST_JSON on vs off for the hot list endpoints.
+
+Builds an in-memory tournament (104 matches, 10k users with scores, one
+user with a prediction for every match) and times /matches, /ranking and
+/predictions/detailed through the ASGI app with each encoding mode.
+
+    uv run python -m benchmarks.bench_json [--users 10000] [--runs 20]
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import fast_json, sql_models
+from app.database import Base, get_db
+from app.main import app
+from app.utils import create_access_token
+
+MATCHES = 104
+
+
+def build_dataset(session, users: int) -> str:
+    start = datetime(2026, 6, 11, 18, 0)
+    session.execute(
+        sql_models.Match.__table__.insert(),
+        [
+            {
+                "id": f"match-{i}",
+                "homeTeam": f"Home {i}",
+                "awayTeam": f"Away {i}",
+                "homeFlag": "🏳️",
+                "awayFlag": "🏳️",
+                "date": start + timedelta(hours=6 * i),
+                "status": "finished" if i < 40 else "upcoming",
+                "homeScore": i % 4 if i < 40 else None,
+                "awayScore": i % 3 if i < 40 else None,
+                "matchNumber": i + 1,
+                "stage": "Group Stage" if i < 72 else "Round of 32",
+                "group": f"Group {chr(65 + i % 12)}",
+                "stadium": "Estadio",
+                "city": "Ciudad",
+                "fifaMatchId": f"fifa-{i}",
+                "manualOverride": False,
+                "locked": i < 40,
+                "updatedAt": start,
+            }
+            for i in range(MATCHES)
+        ],
+    )
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    session.execute(
+        sql_models.User.__table__.insert(),
+        [
+            {"id": uid, "email": f"user{i}@example.com", "name": f"User {i}"}
+            for i, uid in enumerate(user_ids)
+        ],
+    )
+    session.execute(
+        sql_models.UserScore.__table__.insert(),
+        [
+            {
+                "userId": uid,
+                "points": (i * 7919) % 200,
+                "correctPredictions": (i * 31) % 40,
+                "exactPredictions": (i * 17) % 10,
+            }
+            for i, uid in enumerate(user_ids)
+        ],
+    )
+    session.execute(
+        sql_models.Prediction.__table__.insert(),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "matchId": f"match-{i}",
+                "userId": user_ids[0],
+                "homeScore": 1,
+                "awayScore": 0,
+                "points": 3 if i < 40 else None,
+            }
+            for i in range(MATCHES)
+        ],
+    )
+    session.commit()
+    return create_access_token({"sub": "user0@example.com"}, timedelta(hours=1))
+
+
+def time_endpoint(client, url: str, headers: dict, runs: int) -> float:
+    client.get(url, headers=headers)  # warm up
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    token = build_dataset(Session(), args.users)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    auth = {"Authorization": f"Bearer {token}"}
+
+    endpoints = [
+        ("/api/matches", auth),
+        ("/api/ranking", {}),
+        ("/api/ranking?limit=100", {}),
+        ("/api/predictions/detailed", auth),
+    ]
+    encoder = "orjson" if fast_json.orjson is not None else "json"
+    print(f"{MATCHES} matches, {args.users} users, median of {args.runs} runs")
+    print(
+        f"{'endpoint':32} {'validated':>10} {'fast (' + encoder + ')':>14} {'speedup':>8}"
+    )
+    for url, headers in endpoints:
+        fast_json.ENABLED = False
+        validated = time_endpoint(client, url, headers, args.runs)
+        fast_json.ENABLED = True
+        fast = time_endpoint(client, url, headers, args.runs)
+        print(f"{url:32} {validated:>8.1f}ms {fast:>12.1f}ms {validated / fast:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: SCORING_ENGINE sql vs numpy for one finished match.
+
+Builds an in-memory match with one prediction per user (scorelines spread
+over 0-0 to 5-5) and times score_match_predictions with each engine. Every
+run is rolled back, so all of them score from the same unscored state.
+
+    uv run python -m benchmarks.bench_scoring [--predictions 200000] [--runs 5]
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import sql_models
+from app.database import Base
+from app.services import match_updater
+from app.services.score_tracker import ScoreDeltas
+
+
+def build_dataset(session, predictions: int) -> sql_models.Match:
+    kickoff = datetime(2026, 7, 19, 19, 0)
+    session.execute(
+        sql_models.Match.__table__.insert(),
+        {
+            "id": "final",
+            "homeTeam": "Home",
+            "awayTeam": "Away",
+            "homeFlag": "🏳️",
+            "awayFlag": "🏳️",
+            "date": kickoff,
+            "status": "finished",
+            "homeScore": 2,
+            "awayScore": 1,
+            "matchNumber": 104,
+            "stage": "Final",
+            "stadium": "Estadio",
+            "city": "Ciudad",
+            "fifaMatchId": "fifa-final",
+            "manualOverride": False,
+            "locked": True,
+            "updatedAt": kickoff,
+        },
+    )
+    session.execute(
+        sql_models.Prediction.__table__.insert(),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "matchId": "final",
+                "userId": str(uuid.uuid4()),
+                "homeScore": i % 6,
+                "awayScore": (i // 6) % 6,
+            }
+            for i in range(predictions)
+        ],
+    )
+    session.commit()
+    return session.get(sql_models.Match, "final")
+
+
+def time_engine(session, match, engine: str, runs: int) -> float:
+    match_updater.SCORING_ENGINE = engine
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        match_updater.score_match_predictions(session, match, ScoreDeltas())
+        samples.append(time.perf_counter() - started)
+        session.rollback()
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--predictions", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    match = build_dataset(session, args.predictions)
+
+    print(f"{args.predictions} predictions, median of {args.runs} runs")
+    numpy_ms = time_engine(session, match, "numpy", args.runs)
+    sql_ms = time_engine(session, match, "sql", args.runs)
+    print(f"{'numpy':8} {numpy_ms:>10.1f}ms")
+    print(f"{'sql':8} {sql_ms:>10.1f}ms {numpy_ms / sql_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
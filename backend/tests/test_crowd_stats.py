@@ -0,0 +1,152 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+def test_crowd_histogram_is_built_when_predictions_close(client, db):
+    from app import crud
+    from app.services.deadline_locker import lock_due_matches
+
+    alice, _ = register(client, "alice@example.com", "Alice")
+    bob, _ = register(client, "bob@example.com", "Bob")
+    carol, _ = register(client, "carol@example.com", "Carol")
+    db.add(
+        sql_models.Match(
+            id="crowd-match",
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(hours=3),
+            status="upcoming",
+        )
+    )
+    db.commit()
+
+    def save(headers, home, away):
+        client.post(
+            "/api/predictions",
+            json={"matchId": "crowd-match", "homeScore": home, "awayScore": away},
+            headers=headers,
+        )
+
+    save(alice, 1, 0)
+    save(alice, 2, 1)  # Moves alice's pick, does not add one
+    client.post(
+        "/api/predictions/bulk",
+        json={
+            "predictions": [{"matchId": "crowd-match", "homeScore": 2, "awayScore": 1}]
+        },
+        headers=bob,
+    )
+    save(carol, 0, 0)
+
+    # Saves do not touch the histogram
+    assert crud.get_match_scorelines(db, "crowd-match") == []
+
+    # Hidden while picks can still change
+    assert (
+        client.get("/api/matches/crowd-match/crowd", headers=alice).status_code == 403
+    )
+
+    lock_due_matches(db, now=datetime.utcnow() + timedelta(hours=3))
+    response = client.get("/api/matches/crowd-match/crowd", headers=alice)
+    assert response.status_code == 200
+    assert response.json() == {
+        "matchId": "crowd-match",
+        "totalPredictions": 3,
+        "homeWinPct": 66.7,
+        "drawPct": 33.3,
+        "awayWinPct": 0.0,
+        "avgHomeGoals": 1.33,
+        "avgAwayGoals": 0.67,
+        "scorelines": [
+            {"homeScore": 2, "awayScore": 1, "count": 2, "pct": 66.7},
+            {"homeScore": 0, "awayScore": 0, "count": 1, "pct": 33.3},
+        ],
+    }
+    assert client.get("/api/matches/nope/crowd", headers=alice).status_code == 404
+
+
+def test_crowd_locks_the_match_when_the_lock_job_is_late(client, db):
+    alice, alice_id = register(client, "alice@example.com", "Alice")
+    db.add(
+        sql_models.Match(
+            id="late-match",
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(minutes=30),
+            status="upcoming",
+        )
+    )
+    db.add(
+        sql_models.Prediction(
+            id="p1", userId=alice_id, matchId="late-match", homeScore=1, awayScore=1
+        )
+    )
+    db.commit()
+
+    response = client.get("/api/matches/late-match/crowd", headers=alice)
+    assert response.status_code == 200
+    assert response.json()["scorelines"] == [
+        {"homeScore": 1, "awayScore": 1, "count": 1, "pct": 100.0}
+    ]
+    db.expire_all()
+    assert db.get(sql_models.Match, "late-match").locked
@@ -0,0 +1,125 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models, versioning
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": email},
+    )
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def test_matches_etag_revalidates_until_a_write(client, db):
+    """GET /matches answers 304 for a matching ETag until matches change"""
+    alice = register(client, "alice@example.com")
+    bob = register(client, "bob@example.com")
+    db.add(
+        sql_models.Match(
+            id="etag-match",
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(days=2),
+            status="upcoming",
+        )
+    )
+    db.commit()
+
+    first = client.get("/api/matches", headers=alice)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get("/api/matches", headers={**alice, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # Another user's prediction does not invalidate Alice's view
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": "etag-match", "homeScore": 1, "awayScore": 0},
+        headers=bob,
+    )
+    assert response.status_code == 200
+    cached = client.get("/api/matches", headers={**alice, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    # Her own prediction does
+    client.post(
+        "/api/predictions",
+        json={"matchId": "etag-match", "homeScore": 2, "awayScore": 2},
+        headers=alice,
+    )
+    fresh = client.get("/api/matches", headers={**alice, "If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.json()[0]["userPrediction"]["homeScore"] == 2
+    assert fresh.headers["ETag"] != etag
+
+
+def test_ranking_etag_changes_when_a_user_registers(client):
+    etag = client.get("/api/ranking").headers["ETag"]
+    assert (
+        client.get("/api/ranking", headers={"If-None-Match": etag}).status_code == 304
+    )
+
+    register(client, "carol@example.com")
+    response = client.get("/api/ranking", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+def test_version_expires_at_deadline():
+    before = versioning.version("expiring")
+    versioning.expire_at("expiring", datetime.utcnow() - timedelta(seconds=1))
+    assert versioning.version("expiring") == before + 1
+    assert versioning.version("expiring") == before + 1
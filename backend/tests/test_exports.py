@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+def test_admin_exports_stream_predictions_and_ranking(client, db, monkeypatch):
+    from app import exports
+
+    # Several cursor batches even for a handful of rows
+    monkeypatch.setattr(exports, "BATCH_SIZE", 2)
+
+    admin, admin_id = register(client, "admin@example.com", "Admin")
+    db.query(sql_models.User).filter(sql_models.User.id == admin_id).update(
+        {"role": "admin"}
+    )
+    db.commit()
+    players = [register(client, f"p{i}@example.com", f"Player {i}") for i in range(3)]
+    for n in range(2):
+        db.add(
+            sql_models.Match(
+                id=f"m{n}",
+                homeTeam="Team A",
+                awayTeam="Team B",
+                date=datetime.utcnow() + timedelta(hours=3),
+                status="upcoming",
+            )
+        )
+    db.commit()
+    for i, (headers, _) in enumerate(players):
+        for n in range(2):
+            client.post(
+                "/api/predictions",
+                json={"matchId": f"m{n}", "homeScore": i, "awayScore": n},
+                headers=headers,
+            )
+    client.post(
+        "/api/admin/matches/m0/set-result",
+        json={"homeScore": 1, "awayScore": 0, "status": "finished"},
+        headers=admin,
+    )
+
+    response = client.get("/api/admin/export/predictions", headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "attachment" in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 6
+    scored = {row["userEmail"]: row["points"] for row in rows if row["matchId"] == "m0"}
+    assert scored == {
+        "p0@example.com": "1",
+        "p1@example.com": "5",
+        "p2@example.com": "3",
+    }
+    assert {row["points"] for row in rows if row["matchId"] == "m1"} == {""}
+
+    response = client.get("/api/admin/export/ranking?format=ndjson", headers=admin)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    ranking = [json.loads(line) for line in response.text.splitlines()]
+    assert [(r["email"], r["points"], r["position"]) for r in ranking[:3]] == [
+        ("p1@example.com", 5, 1),
+        ("p2@example.com", 3, 2),
+        ("p0@example.com", 1, 3),
+    ]
+    assert len(ranking) == 4
+
+    player_headers, _ = players[0]
+    for url in ("/api/admin/export/predictions", "/api/admin/export/ranking"):
+        assert client.get(url, headers=player_headers).status_code == 403
+    response = client.get("/api/admin/export/ranking?format=xml", headers=admin)
+    assert response.status_code == 422
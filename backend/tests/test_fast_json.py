@@ -0,0 +1,121 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+def test_fast_json_responses_match_validated_ones(client, db, monkeypatch):
+    """FAST_JSON changes how bodies are encoded, not what they contain"""
+    from app import fast_json
+
+    admin, admin_id = register(client, "admin@example.com", "Admin")
+    db.query(sql_models.User).filter(sql_models.User.id == admin_id).update(
+        {"role": "admin"}
+    )
+    db.commit()
+    alice, _ = register(client, "alice@example.com", "Alice")
+    register(client, "bob@example.com", "Bob")
+
+    for i in range(3):
+        db.add(
+            sql_models.Match(
+                id=f"fast-{i}",
+                homeTeam="Team A",
+                awayTeam="Team B",
+                date=datetime.utcnow() + timedelta(hours=3 + i, microseconds=7),
+                status="upcoming",
+                stage="Group Stage",
+            )
+        )
+    db.commit()
+    client.post(
+        "/api/predictions",
+        json={"matchId": "fast-0", "homeScore": 1, "awayScore": 0},
+        headers=alice,
+    )
+    client.post(
+        "/api/admin/matches/fast-0/set-result",
+        json={"homeScore": 1, "awayScore": 0, "status": "finished"},
+        headers=admin,
+    )
+
+    requests = [
+        ("/api/matches", alice),
+        ("/api/matches?limit=2", alice),
+        ("/api/ranking", None),
+        ("/api/ranking?limit=2", None),
+        ("/api/ranking?stage=Group%20Stage", None),
+        ("/api/predictions/detailed", alice),
+    ]
+    for url, headers in requests:
+        monkeypatch.setattr(fast_json, "ENABLED", False)
+        validated = client.get(url, headers=headers)
+        monkeypatch.setattr(fast_json, "ENABLED", True)
+        fast = client.get(url, headers=headers)
+
+        assert fast.status_code == validated.status_code == 200, url
+        assert fast.headers["content-type"] == "application/json"
+        assert fast.headers["etag"] == validated.headers["etag"]
+        assert fast.headers.get("x-next-cursor") == validated.headers.get(
+            "x-next-cursor"
+        )
+        assert fast.json() == validated.json(), url
+        assert fast.json(), url
@@ -0,0 +1,176 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+def test_group_leaderboard_follows_points(client, db):
+    """Creating, joining and scoring keeps each group's leaderboard current"""
+    admin, admin_id = register(client, "admin@example.com", "Admin")
+    db.query(sql_models.User).filter(sql_models.User.id == admin_id).update(
+        {"role": "admin"}
+    )
+    db.commit()
+    alice, alice_id = register(client, "alice@example.com", "Alice")
+    bob, bob_id = register(client, "bob@example.com", "Bob")
+    carol, carol_id = register(client, "carol@example.com", "Carol")
+
+    response = client.post("/api/groups", json={"name": "Office League"}, headers=alice)
+    assert response.status_code == 201
+    office = response.json()
+    assert office["isAdmin"] is True
+    assert office["playerCount"] == 1
+
+    response = client.post(
+        "/api/groups/join", json={"inviteCode": office["inviteCode"]}, headers=bob
+    )
+    assert response.status_code == 200
+    assert response.json()["playerCount"] == 2
+    assert response.json()["isMember"] is True
+    other = client.post("/api/groups", json={"name": "Family"}, headers=bob).json()
+
+    db.add(
+        sql_models.Match(
+            id="group-match",
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(hours=3),
+            status="upcoming",
+        )
+    )
+    db.commit()
+    for headers, score in ((alice, (1, 0)), (bob, (2, 1)), (carol, (2, 1))):
+        client.post(
+            "/api/predictions",
+            json={
+                "matchId": "group-match",
+                "homeScore": score[0],
+                "awayScore": score[1],
+            },
+            headers=headers,
+        )
+    client.post(
+        "/api/admin/matches/group-match/set-result",
+        json={"homeScore": 2, "awayScore": 1, "status": "finished"},
+        headers=admin,
+    )
+
+    ranking = client.get(f"/api/groups/{office['id']}/ranking", headers=alice).json()
+    assert [(m["userId"], m["points"], m["position"]) for m in ranking] == [
+        (bob_id, 5, 1),
+        (alice_id, 4, 2),
+    ]
+    family = client.get(f"/api/groups/{other['id']}/ranking", headers=bob).json()
+    assert [(m["userId"], m["points"]) for m in family] == [(bob_id, 5)]
+
+    # Carol joins late and brings her points with her
+    client.post(
+        "/api/groups/join", json={"inviteCode": office["inviteCode"]}, headers=carol
+    )
+    ranking = client.get(f"/api/groups/{office['id']}/ranking", headers=carol).json()
+    assert [m["position"] for m in ranking] == [1, 1, 3]
+
+    mine = client.get("/api/groups", headers=bob).json()
+    assert {g["name"] for g in mine} == {"Office League", "Family"}
+    outsider, _ = register(client, "dave@example.com", "Dave")
+    response = client.get(f"/api/groups/{office['id']}/ranking", headers=outsider)
+    assert response.status_code == 403
+
+
+def test_invite_code_is_only_shown_to_members_and_admins(client, db):
+    """GET /groups/{id} hides the invite code from users outside the group"""
+    alice, _ = register(client, "alice@example.com", "Alice")
+    outsider, _ = register(client, "dave@example.com", "Dave")
+    admin, admin_id = register(client, "admin@example.com", "Admin")
+    db.query(sql_models.User).filter(sql_models.User.id == admin_id).update(
+        {"role": "admin"}
+    )
+    db.commit()
+    office = client.post("/api/groups", json={"name": "Office"}, headers=alice).json()
+
+    member_view = client.get(f"/api/groups/{office['id']}", headers=alice).json()
+    assert member_view["inviteCode"] == office["inviteCode"]
+    assert member_view["inviteLink"].endswith(office["inviteCode"])
+
+    outsider_view = client.get(f"/api/groups/{office['id']}", headers=outsider)
+    assert outsider_view.status_code == 200
+    assert outsider_view.json()["inviteCode"] is None
+    assert outsider_view.json()["inviteLink"] is None
+
+    admin_view = client.get(f"/api/groups/{office['id']}", headers=admin).json()
+    assert admin_view["inviteCode"] == office["inviteCode"]
+
+
+def test_only_the_classic_scoring_system_is_accepted(client):
+    """Groups are ranked on classic points, so other systems are refused"""
+    alice, _ = register(client, "alice@example.com", "Alice")
+    response = client.post(
+        "/api/groups",
+        json={"name": "Office", "scoringSystem": "extended"},
+        headers=alice,
+    )
+    assert response.status_code == 422
+    response = client.post(
+        "/api/groups",
+        json={"name": "Office", "scoringSystem": "classic"},
+        headers=alice,
+    )
+    assert response.json()["scoringSystem"] == "classic"
@@ -0,0 +1,102 @@
+import random
+
+from app.services.leaderboard import Leaderboard
+
+
+def reference_ranking(entries):
+    """Plain sort + RANK() positions, as crud.ranking_query computes them"""
+    ordered = sorted(
+        entries,
+        key=lambda e: (
+            -e["points"],
+            -e["exactPredictions"],
+            -e["correctPredictions"],
+            e["userId"],
+        ),
+    )
+    rows = []
+    for i, entry in enumerate(ordered):
+        key = (entry["points"], entry["exactPredictions"], entry["correctPredictions"])
+        if i and key == rows[-1][1]:
+            position = rows[-1][0]["position"]
+        else:
+            position = i + 1
+        rows.append(({**entry, "position": position}, key))
+    return [row for row, _ in rows]
+
+
+def make_entries(count, rng):
+    return [
+        {
+            "userId": f"user-{i:04d}",
+            "name": f"User {i}",
+            "avatar": None,
+            "points": rng.randint(0, 40),
+            "exactPredictions": rng.randint(0, 3),
+            "correctPredictions": rng.randint(0, 5),
+        }
+        for i in range(count)
+    ]
+
+
+def test_leaderboard_matches_reference_ranking():
+    rng = random.Random(2026)
+    entries = make_entries(300, rng)
+    board = Leaderboard()
+    board.load(entries)
+    expected = reference_ranking(entries)
+
+    assert board.all() == expected
+    assert board.top(10) == expected[:10]
+    assert board.between(95, 130) == expected[94:130]
+    for row in expected[::17]:
+        assert board.rank_of(row["userId"]) == row["position"]
+
+    above, me, below = board.around(expected[150]["userId"], 3)
+    assert above == expected[147:150]
+    assert me == expected[150]
+    assert below == expected[151:154]
+
+    cursor_row = expected[41]
+    key = (
+        cursor_row["points"],
+        cursor_row["exactPredictions"],
+        cursor_row["correctPredictions"],
+        cursor_row["userId"],
+    )
+    assert board.page_after(key, 25) == expected[42:67]
+
+
+def test_leaderboard_applies_deltas_in_place():
+    rng = random.Random(48)
+    entries = make_entries(200, rng)
+    board = Leaderboard()
+    board.load(entries)
+
+    by_id = {e["userId"]: dict(e) for e in entries}
+    for _ in range(20):
+        deltas = []
+        for user_id in rng.sample(sorted(by_id), 15):
+            delta = (rng.choice([0, 1, 3, 4, 5]) * 10, rng.randint(0, 1), 0)
+            by_id[user_id]["points"] += delta[0]
+            by_id[user_id]["correctPredictions"] += delta[1]
+            deltas.append((user_id, delta))
+        board.apply_deltas(deltas)
+
+    board.add_user("user-new", "New", None)
+    by_id["user-new"] = {
+        "userId": "user-new",
+        "name": "New",
+        "avatar": None,
+        "points": 0,
+        "exactPredictions": 0,
+        "correctPredictions": 0,
+    }
+
+    assert board.all() == reference_ranking(by_id.values())
+    assert len(board) == 201
+
+    avatar = "https://example.com/new.png"
+    board.update_profile("user-new", "Renamed", avatar)
+    [entry] = [row for row in board.all() if row["userId"] == "user-new"]
+    assert entry["name"] == "Renamed" and entry["avatar"] == avatar
@@ -162,3 +162,298 @@ def test_editable_false_if_finished(client, db):
     assert len(matches) == 1
     assert matches[0]["editable"] is False  # Should NOT be editable
     assert matches[0]["status"] == "finished"
+
+
+def test_matches_loads_predictions_in_one_query(client, db):
+    """GET /api/matches issues the same number of queries for any match count"""
+    from sqlalchemy import event
+
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "user4@example.com",
+            "password": "password123",
+            "name": "Test User 4",
+        },
+    )
+    token = response.json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def add_matches(start, count_):
+        for i in range(start, start + count_):
+            db.add(
+                sql_models.Match(
+                    id=f"count-match-{i}",
+                    homeTeam="Team A",
+                    awayTeam="Team B",
+                    date=datetime.utcnow() + timedelta(hours=2 + i),
+                    status="upcoming",
+                )
+            )
+        db.commit()
+
+    add_matches(0, 1)
+    client.post(
+        "/api/predictions",
+        json={"matchId": "count-match-0", "homeScore": 2, "awayScore": 0},
+        headers=headers,
+    )
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        client.get("/api/matches", headers=headers)
+        with_one = len(statements)
+        add_matches(1, 5)
+        statements.clear()
+        response = client.get("/api/matches", headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert len(statements) == with_one
+    matches = {m["id"]: m for m in response.json()}
+    assert len(matches) == 6
+    assert matches["count-match-0"]["userPrediction"]["homeScore"] == 2
+    assert matches["count-match-3"].get("userPrediction") is None
+
+
+def test_cached_matches_overlay_predictions_and_follow_writes(client, db):
+    """With the shared cache on, /matches matches the uncached response"""
+    from app import crud
+    from app.services.match_cache import match_cache
+
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "user5@example.com",
+            "password": "password123",
+            "name": "Test User 5",
+        },
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    for i, hours in enumerate((3, 0.5, -2)):
+        db.add(
+            sql_models.Match(
+                id=f"cache-match-{i}",
+                homeTeam="Team A",
+                awayTeam="Team B",
+                date=datetime.utcnow() + timedelta(hours=hours),
+                status="finished" if hours < 0 else "upcoming",
+            )
+        )
+    db.commit()
+    client.post(
+        "/api/predictions",
+        json={"matchId": "cache-match-0", "homeScore": 1, "awayScore": 1},
+        headers=headers,
+    )
+    uncached = client.get("/api/matches", headers=headers).json()
+
+    match_cache.enable()
+    try:
+        cached = client.get("/api/matches", headers=headers)
+        assert cached.headers["etag"]
+        assert cached.json() == uncached
+        by_id = {m["id"]: m for m in cached.json()}
+        assert [by_id[f"cache-match-{i}"]["editable"] for i in range(3)] == [
+            True,
+            False,
+            False,
+        ]
+        assert by_id["cache-match-0"]["userPrediction"]["homeScore"] == 1
+        upcoming = client.get("/api/matches?status=upcoming", headers=headers)
+        assert {m["id"] for m in upcoming.json()} == {"cache-match-0", "cache-match-1"}
+
+        # A match write invalidates the shared list
+        crud.update_match(db, "cache-match-0", stadium="Azteca")
+        refreshed = client.get("/api/matches", headers=headers).json()
+        assert {m["id"]: m for m in refreshed}["cache-match-0"]["stadium"] == "Azteca"
+    finally:
+        match_cache.disable()
+
+
+def test_matches_window_and_cursor_pages(client, db):
+    """from/to/stage filters and limit/cursor pages walk matches in date order"""
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "user6@example.com",
+            "password": "password123",
+            "name": "Test User 6",
+        },
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    start = datetime(2030, 6, 11, 12, 0)
+    for i in range(7):
+        db.add(
+            sql_models.Match(
+                id=f"window-match-{i}",
+                homeTeam="Team A",
+                awayTeam="Team B",
+                # Two matches share each kick-off time; id breaks the tie
+                date=start + timedelta(days=i // 2),
+                status="upcoming",
+                stage="Group Stage" if i < 5 else "Round of 32",
+            )
+        )
+    db.commit()
+
+    day = client.get(
+        "/api/matches",
+        params={"from": "2030-06-12T00:00:00", "to": "2030-06-13T00:00:00"},
+        headers=headers,
+    )
+    assert [m["id"] for m in day.json()] == ["window-match-2", "window-match-3"]
+
+    knockout = client.get(
+        "/api/matches", params={"stage": "Round of 32"}, headers=headers
+    ).json()
+    assert [m["id"] for m in knockout] == ["window-match-5", "window-match-6"]
+
+    seen = []
+    params = {"limit": 3}
+    while True:
+        page = client.get("/api/matches", params=params, headers=headers)
+        assert page.status_code == 200
+        seen.extend(m["id"] for m in page.json())
+        next_cursor = page.headers.get("x-next-cursor")
+        if not next_cursor:
+            break
+        params = {"limit": 3, "cursor": next_cursor}
+    assert seen == [f"window-match-{i}" for i in range(7)]
+
+    bad = client.get(
+        "/api/matches", params={"limit": 3, "cursor": "bogus"}, headers=headers
+    )
+    assert bad.status_code == 400
+
+
+def test_deadline_locker_locks_due_matches_once(client, db):
+    """lock_due_matches flips locked at the deadline and read paths trust it"""
+    from app.services.deadline_locker import lock_due_matches, upcoming_deadlines
+
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "user7@example.com",
+            "password": "password123",
+            "name": "Test User 7",
+        },
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    now = datetime.utcnow()
+    for match_id, hours in (("lock-soon", 1.5), ("lock-later", 5)):
+        db.add(
+            sql_models.Match(
+                id=match_id,
+                homeTeam="Team A",
+                awayTeam="Team B",
+                date=now + timedelta(hours=hours),
+                status="upcoming",
+            )
+        )
+    db.commit()
+
+    assert {m for m, _ in upcoming_deadlines(db, now=now)} == {
+        "lock-soon",
+        "lock-later",
+    }
+    assert lock_due_matches(db, now=now) == []
+
+    # Half an hour later the first deadline has passed
+    later = now + timedelta(minutes=31)
+    assert lock_due_matches(db, now=later) == ["lock-soon"]
+    assert lock_due_matches(db, now=later) == []
+    assert [m for m, _ in upcoming_deadlines(db, now=later)] == ["lock-later"]
+
+    matches = {m["id"]: m for m in client.get("/api/matches", headers=headers).json()}
+    assert matches["lock-soon"]["locked"] is True
+    assert matches["lock-soon"]["editable"] is False
+    assert matches["lock-later"]["editable"] is True
+
+    # The stored flag wins even though the wall-clock deadline is still ahead
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": "lock-soon", "homeScore": 1, "awayScore": 0},
+        headers=headers,
+    )
+    assert response.status_code == 400
+    assert "locked" in response.json()["detail"]
+
+
+def test_deadline_lock_jobs_follow_kickoff_changes_in_utc(db, monkeypatch):
+    """Jobs fire at the naive-UTC deadline whatever the server timezone"""
+    import time
+    from datetime import timezone
+
+    import tzlocal
+
+    from app import scheduler
+    from app.services.match_updater import update_matches_from_scrape
+
+    monkeypatch.setenv("TZ", "America/Argentina/Buenos_Aires")
+    time.tzset()
+    tzlocal.reload_localzone()
+    scheduler.scheduler.start(paused=True)
+    try:
+        kickoff = datetime.utcnow() + timedelta(hours=5)
+        match = sql_models.Match(
+            id="moving",
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=kickoff,
+            status="upcoming",
+            fifaMatchId="fifa-moving",
+        )
+        db.add(match)
+        db.commit()
+
+        def next_lock():
+            return scheduler.scheduler.get_job("lock_moving").next_run_time
+
+        scheduler.rearm_deadline_lock(db, match)
+        assert next_lock() == (kickoff - timedelta(hours=1)).replace(
+            tzinfo=timezone.utc
+        )
+
+        # The scraper moves the kickoff earlier: the job moves with it
+        kickoff -= timedelta(hours=2)
+        update_matches_from_scrape(
+            db, [{"match_id": "fifa-moving", "kickoff_parsed": kickoff}]
+        )
+        assert next_lock() == (kickoff - timedelta(hours=1)).replace(
+            tzinfo=timezone.utc
+        )
+
+        # Moved inside the last hour: locked right away
+        update_matches_from_scrape(
+            db,
+            [
+                {
+                    "match_id": "fifa-moving",
+                    "kickoff_parsed": datetime.utcnow() + timedelta(minutes=30),
+                }
+            ],
+        )
+        db.expire_all()
+        assert db.get(sql_models.Match, "moving").locked
+
+        # Postponed again: predictions reopen and the lock is armed anew
+        kickoff = datetime.utcnow() + timedelta(hours=4)
+        update_matches_from_scrape(
+            db, [{"match_id": "fifa-moving", "kickoff_parsed": kickoff}]
+        )
+        db.expire_all()
+        assert not db.get(sql_models.Match, "moving").locked
+        assert next_lock() == (kickoff - timedelta(hours=1)).replace(
+            tzinfo=timezone.utc
+        )
+    finally:
+        scheduler.scheduler.shutdown(wait=False)
+        monkeypatch.delenv("TZ")
+        time.tzset()
+        tzlocal.reload_localzone()
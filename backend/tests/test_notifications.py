@@ -0,0 +1,220 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+def add_predicted_match(db, match_id, user_id, home, away):
+    db.add(
+        sql_models.Match(
+            id=match_id,
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() - timedelta(hours=2),
+            status="finished",
+            homeScore=2,
+            awayScore=1,
+        )
+    )
+    db.add(
+        sql_models.Prediction(
+            id=f"{match_id}-{user_id}",
+            matchId=match_id,
+            userId=user_id,
+            homeScore=home,
+            awayScore=away,
+        )
+    )
+    db.commit()
+
+
+async def next_events(stream):
+    """The next chunk with events, skipping keep-alive comments."""
+    while True:
+        chunk = await asyncio.wait_for(anext(stream), timeout=5)
+        if not chunk.startswith(":"):
+            return [
+                dict(line.split(": ", 1) for line in event.splitlines())
+                for event in chunk.strip().split("\n\n")
+            ]
+
+
+def test_stream_pushes_points_after_scoring(client, db):
+    """Pending points come first, then new points as soon as they are scored"""
+    from app.routers.notifications import points_event_stream
+    from app.services.match_updater import calculate_points_for_matches
+
+    _, alice_id = register(client, "alice@example.com", "Alice")
+    add_predicted_match(db, "m1", alice_id, 2, 1)
+    add_predicted_match(db, "m2", alice_id, 1, 0)
+    calculate_points_for_matches(db, ["m1"])
+
+    async def run():
+        stream = points_event_stream(db, alice_id, keepalive=0.05)
+        try:
+            assert (await anext(stream)).startswith("retry:")
+            [pending] = await next_events(stream)
+            assert pending["event"] == "points"
+            assert json.loads(pending["data"])["matchId"] == "m1"
+            assert json.loads(pending["data"])["points"] == 5
+
+            # Idle until the points pipeline publishes after its commit
+            assert await anext(stream) == ": keep-alive\n\n"
+            await asyncio.to_thread(calculate_points_for_matches, db, ["m2"])
+            [scored] = await next_events(stream)
+            assert json.loads(scored["data"])["matchId"] == "m2"
+            assert json.loads(scored["data"])["points"] == 4
+            return pending["id"], scored["id"]
+        finally:
+            await stream.aclose()
+
+    first_id, second_id = asyncio.run(run())
+    notified = db.query(sql_models.Prediction.notified).filter(
+        sql_models.Prediction.userId == alice_id
+    )
+    assert [row.notified for row in notified] == [True, True]
+
+    async def reconnect(last_event_id):
+        stream = points_event_stream(db, alice_id, last_event_id, keepalive=0.05)
+        try:
+            await anext(stream)
+            return await next_events(stream)
+        finally:
+            await stream.aclose()
+
+    # A reconnect replays everything after the last event the client saw,
+    # even though it was already marked as notified
+    [replayed] = asyncio.run(reconnect(first_id))
+    assert replayed["id"] == second_id
+
+
+def test_stream_endpoint_validation(client):
+    assert client.get("/api/notifications/stream").status_code == 401
+    headers, _ = register(client, "alice@example.com", "Alice")
+    response = client.get(
+        "/api/notifications/stream",
+        headers={**headers, "Last-Event-ID": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+
+
+def test_stream_query_token_is_short_lived_and_stream_only(client):
+    """?token= takes only stream tokens, and stream tokens open nothing else"""
+    headers, _ = register(client, "alice@example.com", "Alice")
+    access_token = headers["Authorization"].removeprefix("Bearer ")
+    response = client.get("/api/notifications/stream", params={"token": access_token})
+    assert response.status_code == 401
+
+    response = client.post("/api/notifications/stream-token", headers=headers)
+    assert response.status_code == 200
+    stream_token = response.json()["token"]
+    assert 0 < response.json()["expiresIn"] <= 300
+    stream_auth = {"Authorization": f"Bearer {stream_token}"}
+    assert client.get("/api/auth/me", headers=stream_auth).status_code == 401
+    response = client.get(
+        "/api/notifications/stream",
+        params={"token": stream_token},
+        headers={"Last-Event-ID": "not-a-cursor"},
+    )
+    assert response.status_code == 400  # authenticated, then rejects the cursor
+
+
+@pytest.mark.parametrize("update_returning", [True, False])
+def test_unnotified_is_acknowledged_once(client, db, monkeypatch, update_returning):
+    """Fetching unnotified predictions acknowledges them in the same statement"""
+    from app import crud
+
+    headers, alice_id = register(client, "alice@example.com", "Alice")
+    add_predicted_match(db, "m1", alice_id, 2, 1)
+    add_predicted_match(db, "m2", alice_id, 0, 0)
+    db.query(sql_models.Prediction).update({"points": 5})
+    db.commit()
+    # False takes the fallback for SQLite builds without RETURNING
+    monkeypatch.setattr(db.get_bind().dialect, "update_returning", update_returning)
+
+    statements = []
+    conn = db.connection()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(conn, "before_cursor_execute", capture)
+    try:
+        rows = crud.acknowledge_unnotified_predictions(db, alice_id)
+    finally:
+        event.remove(conn, "before_cursor_execute", capture)
+    assert [row["matchId"] for row in rows] == ["m1", "m2"]
+    assert all(row["notified"] for row in rows)
+    if update_returning:
+        # The UPDATE ... RETURNING plus the change log insert
+        assert len(statements) == 2
+        assert "RETURNING" in statements[0]
+
+    assert client.get("/api/predictions/unnotified", headers=headers).json() == []
+    db.query(sql_models.Prediction).filter(
+        sql_models.Prediction.matchId == "m2"
+    ).update({"notified": False})
+    db.commit()
+    [again] = client.get("/api/predictions/unnotified", headers=headers).json()
+    assert again["matchId"] == "m2" and again["notified"] is True
@@ -0,0 +1,60 @@
+import itertools
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+
+from app.services.points_calculator import (
+    BREAKDOWNS,
+    calculate_points,
+    calculate_points_batch,
+    points_case,
+)
+
+# Every scoreline from 0-0 to 10-10, for predictions and results alike
+GOALS = range(11)
+
+
+def test_batch_matches_scalar_on_the_whole_score_grid():
+    """Every (prediction, result) pair scores the same in both engines"""
+    grid = np.array(list(itertools.product(GOALS, repeat=4)))
+    points, codes = calculate_points_batch(*grid.T)
+
+    expected = [calculate_points(*map(int, row)) for row in grid]
+    assert points.tolist() == [p for p, _ in expected]
+    assert [BREAKDOWNS[code] for code in codes] == [b for _, b in expected]
+
+
+def test_batch_with_a_scalar_result():
+    """One match: arrays of predictions against the final score"""
+    predictions = np.array(list(itertools.product(GOALS, repeat=2)))
+    for real_home, real_away in itertools.product(GOALS, repeat=2):
+        points, codes = calculate_points_batch(
+            predictions[:, 0], predictions[:, 1], real_home, real_away
+        )
+        expected = [
+            calculate_points(int(h), int(a), real_home, real_away)
+            for h, a in predictions
+        ]
+        assert list(zip(points.tolist(), [BREAKDOWNS[c] for c in codes])) == expected
+
+
+def test_sql_case_matches_scalar_on_the_whole_score_grid():
+    """The UPDATE ... CASE expressions agree with calculate_points in SQLite"""
+    metadata = MetaData()
+    scores = Table("scores", metadata, Column("home", Integer), Column("away", Integer))
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    predictions = list(itertools.product(GOALS, repeat=2))
+
+    with engine.begin() as conn:
+        conn.execute(scores.insert(), [{"home": h, "away": a} for h, a in predictions])
+        for real_home, real_away in itertools.product(GOALS, repeat=2):
+            points, breakdown = points_case(
+                scores.c.home, scores.c.away, real_home, real_away
+            )
+            rows = conn.execute(
+                select(scores.c.home, scores.c.away, points, breakdown)
+            ).all()
+            assert [(p, b) for _, _, p, b in sorted(rows)] == [
+                calculate_points(h, a, real_home, real_away) for h, a in predictions
+            ]
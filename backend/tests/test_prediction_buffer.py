@@ -0,0 +1,348 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    data = response.json()
+    return {"Authorization": f"Bearer {data['token']}"}, data["user"]["id"]
+
+
+@pytest.fixture
+def buffer(db, tmp_path):
+    from app.services.prediction_buffer import prediction_buffer
+
+    # Flushes use their own sessions on the test connection, in savepoints so
+    # that a failed flush only rolls back its own writes
+    session_factory = lambda: TestingSessionLocal(  # noqa: E731
+        bind=db.connection(), join_transaction_mode="create_savepoint"
+    )
+    # A long interval: the tests flush by hand
+    prediction_buffer.enable(session_factory, str(tmp_path), flush_interval=60)
+    yield prediction_buffer
+    prediction_buffer.disable()
+
+
+def add_match(db, match_id, kickoff_in):
+    db.add(
+        sql_models.Match(
+            id=match_id,
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + kickoff_in,
+            status="upcoming",
+        )
+    )
+    db.commit()
+
+
+def saved_scores(db):
+    db.expire_all()
+    return [
+        (p.matchId, p.homeScore, p.awayScore)
+        for p in db.query(sql_models.Prediction).order_by(sql_models.Prediction.matchId)
+    ]
+
+
+def test_saves_are_journaled_then_flushed_in_one_batch(client, db, buffer, tmp_path):
+    """Repeated edits collapse, and a flush writes everyone's saves at once"""
+    alice, _ = register(client, "alice@example.com", "Alice")
+    bob, _ = register(client, "bob@example.com", "Bob")
+    add_match(db, "m1", timedelta(hours=3))
+    add_match(db, "m2", timedelta(hours=3))
+
+    first = client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 1, "awayScore": 0},
+        headers=alice,
+    )
+    assert first.status_code == 200
+    second = client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 3, "awayScore": 1},
+        headers=alice,
+    ).json()
+    assert second["id"] == first.json()["id"]
+    assert (second["homeScore"], second["awayScore"]) == (3, 1)
+    client.post(
+        "/api/predictions",
+        json={"matchId": "m2", "homeScore": 0, "awayScore": 0},
+        headers=bob,
+    )
+
+    # Acknowledged from the journal, not yet in the database
+    [journal] = [name for name in os.listdir(tmp_path) if name.endswith(".jsonl")]
+    assert len((tmp_path / journal).read_text().splitlines()) == 3
+    assert saved_scores(db) == []
+    assert buffer.pending_count() == 2
+
+    assert buffer.flush() == 2
+    assert saved_scores(db) == [("m1", 3, 1), ("m2", 0, 0)]
+    assert not (tmp_path / journal).exists()
+
+
+def test_journal_is_replayed_after_a_crash(client, db, tmp_path):
+    """Saves acknowledged by a process that died before flushing are not lost"""
+    from app.services.prediction_buffer import PredictionBuffer
+
+    _, alice_id = register(client, "alice@example.com", "Alice")
+    add_match(db, "m1", timedelta(hours=3))
+    # What the dead process left: two edits, the last one cut short
+    row = {"id": "p1", "userId": alice_id, "matchId": "m1", "awayScore": 2}
+    (tmp_path / "000000000007.jsonl").write_text(
+        json.dumps({**row, "homeScore": 1})
+        + "\n"
+        + json.dumps({**row, "homeScore": 2})
+        + "\n"
+        + '{"id": "p1", "userId"'
+    )
+
+    restarted = PredictionBuffer()
+    restarted.enable(lambda: TestingSessionLocal(bind=db.connection()), str(tmp_path))
+    try:
+        assert saved_scores(db) == [("m1", 2, 2)]
+        assert not (tmp_path / "000000000007.jsonl").exists()
+    finally:
+        restarted.disable()
+    assert os.listdir(tmp_path) == []
+
+
+def test_workers_sharing_a_journal_only_replay_dead_ones(client, db, tmp_path):
+    """A starting worker leaves live workers' segments alone and adopts dead ones"""
+    from app.services.prediction_buffer import PredictionBuffer
+
+    _, alice_id = register(client, "alice@example.com", "Alice")
+    add_match(db, "m1", timedelta(hours=3))
+    session_factory = lambda: TestingSessionLocal(  # noqa: E731
+        bind=db.connection(), join_transaction_mode="create_savepoint"
+    )
+    deadline = datetime.utcnow() + timedelta(hours=2)
+
+    first = PredictionBuffer()
+    first.enable(session_factory, str(tmp_path), flush_interval=60)
+    first.submit(alice_id, "m1", 1, 0, deadline)
+    [live_segment] = [p for p in tmp_path.iterdir() if p.suffix == ".jsonl"]
+
+    second = PredictionBuffer()
+    second.enable(session_factory, str(tmp_path), flush_interval=60)
+    try:
+        assert live_segment.exists()
+        assert saved_scores(db) == []
+
+        # The first worker dies without flushing: its lock goes with it
+        first._stopping = True
+        with first._lock:
+            first._wakeup.notify()
+        first._thread.join()
+        first._owner_lock.close()
+
+        third = PredictionBuffer()
+        third.enable(session_factory, str(tmp_path), flush_interval=60)
+        third.disable()
+        assert saved_scores(db) == [("m1", 1, 0)]
+        assert not live_segment.exists()
+    finally:
+        second.disable()
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_saves_share_journal_syncs(buffer, monkeypatch):
+    """Saves arriving during an fsync are acknowledged together by the next one"""
+    import threading
+    import time
+
+    from app.services import prediction_buffer as module
+
+    synced = []
+
+    def slow_fsync(fd):
+        # Everything written so far is what this sync makes durable
+        synced.append(os.fstat(fd).st_size)
+        time.sleep(0.02)
+
+    monkeypatch.setattr(module.os, "fsync", slow_fsync)
+    deadline = datetime.utcnow() + timedelta(hours=2)
+    acknowledged = []
+
+    def save(i):
+        buffer.submit(f"user-{i}", "m1", i % 5, 0, deadline)
+        acknowledged.append(i)
+
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(acknowledged) == 20
+    assert 1 <= len(synced) < 20
+    # The last sync covers every acknowledged save
+    assert synced[-1] == buffer._journal.tell()
+    # Made-up users and match: nothing to flush at teardown
+    buffer._pending.clear()
+
+
+def test_no_write_is_accepted_after_the_deadline(client, db, buffer):
+    """Buffered saves reach the database before the lock; later ones are refused"""
+    from app.services.deadline_locker import lock_due_matches
+
+    alice, _ = register(client, "alice@example.com", "Alice")
+    add_match(db, "m1", timedelta(hours=3))
+    client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 1, "awayScore": 1},
+        headers=alice,
+    )
+
+    deadline = datetime.utcnow() - timedelta(seconds=1)
+    with pytest.raises(ValueError):
+        buffer.submit("someone", "m1", 0, 0, deadline)
+
+    # The lock flushes first, so the accepted save is not lost
+    lock_due_matches(db, now=datetime.utcnow() + timedelta(hours=3))
+    assert saved_scores(db) == [("m1", 1, 1)]
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 2, "awayScore": 0},
+        headers=alice,
+    )
+    assert response.status_code == 400
+    assert buffer.pending_count() == 0
+
+
+def test_buffered_saves_answer_with_the_stored_id(client, db, buffer):
+    """An existing prediction keeps its id in the response, as without the buffer"""
+    alice, alice_id = register(client, "alice@example.com", "Alice")
+    add_match(db, "m1", timedelta(hours=3))
+    db.add(
+        sql_models.Prediction(
+            id="stored", userId=alice_id, matchId="m1", homeScore=0, awayScore=0
+        )
+    )
+    db.commit()
+
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 1, "awayScore": 0},
+        headers=alice,
+    )
+    assert response.json()["id"] == "stored"
+    buffer.flush()
+    assert [p.id for p in db.query(sql_models.Prediction)] == ["stored"]
+
+
+def test_bulk_saves_go_through_the_buffer(client, db, buffer):
+    """An older buffered edit cannot flush over a newer bulk save"""
+    alice, _ = register(client, "alice@example.com", "Alice")
+    add_match(db, "m1", timedelta(hours=3))
+    add_match(db, "m2", timedelta(hours=3))
+    client.post(
+        "/api/predictions",
+        json={"matchId": "m1", "homeScore": 1, "awayScore": 0},
+        headers=alice,
+    )
+
+    response = client.post(
+        "/api/predictions/bulk",
+        json={
+            "predictions": [
+                {"matchId": "m1", "homeScore": 2, "awayScore": 2},
+                {"matchId": "m2", "homeScore": 0, "awayScore": 1},
+            ]
+        },
+        headers=alice,
+    )
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["updated", "created"]
+    assert buffer.pending_count() == 2
+
+    buffer.flush()
+    assert saved_scores(db) == [("m1", 2, 2), ("m2", 0, 1)]
+
+
+def test_a_rejected_row_is_dead_lettered_without_blocking_the_rest(
+    client, db, buffer, tmp_path
+):
+    """One row the database refuses does not hold back the batch or the lock"""
+    from app.services.deadline_locker import lock_due_matches
+    from app.services.prediction_buffer import DEAD_LETTER_FILE
+
+    _, alice_id = register(client, "alice@example.com", "Alice")
+    _, bob_id = register(client, "bob@example.com", "Bob")
+    add_match(db, "m1", timedelta(hours=3))
+    deadline = datetime.utcnow() + timedelta(hours=2)
+    buffer.submit(alice_id, "m1", 2, 1, deadline)
+    buffer.submit(bob_id, "m1", None, 1, deadline)  # NOT NULL violation
+
+    assert buffer.flush() == 1
+    assert saved_scores(db) == [("m1", 2, 1)]
+    assert buffer.pending_count() == 0
+    [rejected] = (tmp_path / DEAD_LETTER_FILE).read_text().splitlines()
+    assert json.loads(rejected)["userId"] == bob_id
+
+    # A flush that cannot reach the database does not stop the lock either
+    buffer.submit(alice_id, "m1", 3, 3, deadline)
+    buffer.flush, flush = (lambda: 1 / 0), buffer.flush
+    try:
+        assert lock_due_matches(db, now=datetime.utcnow() + timedelta(hours=3)) == [
+            "m1"
+        ]
+    finally:
+        buffer.flush = flush
@@ -0,0 +1,213 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def add_match(db, match_id, hours, status="upcoming"):
+    db.add(
+        sql_models.Match(
+            id=match_id,
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(hours=hours),
+            status=status,
+        )
+    )
+
+
+def test_bulk_predictions_per_item_results(client, db):
+    """Valid items are saved together; invalid ones are reported per item"""
+    from sqlalchemy import event
+
+    response = client.post(
+        "/api/auth/register",
+        json={"email": "bulk@example.com", "password": "password123", "name": "Bulk"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    for i in range(4):
+        add_match(db, f"day-{i}", hours=3 + i)
+    add_match(db, "kicked-off", hours=-1, status="live")
+    add_match(db, "closing", hours=0.5)
+    db.commit()
+    client.post(
+        "/api/predictions",
+        json={"matchId": "day-0", "homeScore": 0, "awayScore": 0},
+        headers=headers,
+    )
+
+    items = [
+        {"matchId": "day-0", "homeScore": 1, "awayScore": 0},
+        {"matchId": "day-1", "homeScore": 2, "awayScore": 2},
+        {"matchId": "kicked-off", "homeScore": 1, "awayScore": 1},
+        {"matchId": "closing", "homeScore": 1, "awayScore": 1},
+        {"matchId": "nope", "homeScore": 1, "awayScore": 1},
+        {"matchId": "day-2", "homeScore": 0, "awayScore": 1},
+        {"matchId": "day-3", "homeScore": 3, "awayScore": 0},
+        {"matchId": "day-2", "homeScore": 4, "awayScore": 1},
+    ]
+    inserts = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO predictions"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.post(
+            "/api/predictions/bulk", json={"predictions": items}, headers=headers
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["saved"] == 4 and data["rejected"] == 4
+    assert [r["status"] for r in data["results"]] == [
+        "updated",
+        "created",
+        "rejected",
+        "rejected",
+        "rejected",
+        "rejected",
+        "created",
+        "created",
+    ]
+    assert "live" in data["results"][2]["error"]
+    assert "deadline" in data["results"][3]["error"]
+    assert data["results"][4]["error"] == "Match not found"
+    assert data["results"][7]["prediction"]["homeScore"] == 4
+    assert len(inserts) == 1  # New rows go in one batched INSERT
+
+    stored = {
+        p.matchId: (p.homeScore, p.awayScore)
+        for p in db.query(sql_models.Prediction).all()
+    }
+    assert stored == {
+        "day-0": (1, 0),
+        "day-1": (2, 2),
+        "day-2": (4, 1),
+        "day-3": (3, 0),
+    }
+
+
+def test_bulk_predictions_rejects_oversized_batches(client, db):
+    """More than 100 items is a validation error"""
+    response = client.post(
+        "/api/auth/register",
+        json={"email": "bulk2@example.com", "password": "password123", "name": "B"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    items = [{"matchId": f"m{i}", "homeScore": 0, "awayScore": 0} for i in range(101)]
+    response = client.post(
+        "/api/predictions/bulk", json={"predictions": items}, headers=headers
+    )
+    assert response.status_code == 422
+
+
+def test_prediction_save_is_one_upsert_statement(client, db):
+    """Saving twice updates the same row with a single upsert per save"""
+    from sqlalchemy import event
+    from sqlalchemy.exc import IntegrityError
+
+    response = client.post(
+        "/api/auth/register",
+        json={"email": "upsert@example.com", "password": "password123", "name": "U"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+    user_id = response.json()["user"]["id"]
+    add_match(db, "upsert-match", hours=5)
+    db.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "SELECT")):
+            statements.append(statement)
+
+    first = client.post(
+        "/api/predictions",
+        json={"matchId": "upsert-match", "homeScore": 1, "awayScore": 0},
+        headers=headers,
+    ).json()
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        second = client.post(
+            "/api/predictions",
+            json={"matchId": "upsert-match", "homeScore": 3, "awayScore": 2},
+            headers=headers,
+        ).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert second["id"] == first["id"]
+    assert (second["homeScore"], second["awayScore"]) == (3, 2)
+    upserts = [s for s in statements if s.startswith("INSERT INTO predictions")]
+    assert len(upserts) == 1 and "ON CONFLICT" in upserts[0]
+    assert not any(s.startswith("UPDATE predictions") for s in statements)
+    assert not any(
+        s.startswith("SELECT") and "FROM predictions" in s for s in statements
+    )
+
+    # The unique index rejects a second row for the same user and match
+    db.add(
+        sql_models.Prediction(
+            id="duplicate",
+            matchId="upsert-match",
+            userId=user_id,
+            homeScore=0,
+            awayScore=0,
+        )
+    )
+    with pytest.raises(IntegrityError):
+        db.flush()
+    db.rollback()
@@ -268,3 +268,57 @@ def test_predictions_detailed_filter_by_status(client, db):
     assert len(predictions) == 1
     assert predictions[0]["match"]["status"] == "finished"
     assert predictions[0]["points"] == 5
+
+
+def test_predictions_detailed_single_query(client, db):
+    """Match data comes from the JOIN: no extra query per prediction"""
+    from sqlalchemy import event
+
+    response = client.post(
+        "/api/auth/register",
+        json={
+            "email": "user-count@example.com",
+            "password": "password123",
+            "name": "Count User",
+        },
+    )
+    headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    for i in range(5):
+        db.add(
+            sql_models.Match(
+                id=f"count-match-{i}",
+                homeTeam="Team A",
+                awayTeam="Team B",
+                date=datetime.utcnow() + timedelta(hours=3 + i),
+                status="upcoming",
+            )
+        )
+    db.commit()
+    for i in range(5):
+        client.post(
+            "/api/predictions",
+            json={"matchId": f"count-match-{i}", "homeScore": i, "awayScore": 0},
+            headers=headers,
+        )
+    # Start from a clean identity map, as a fresh request session would
+    db.expire_all()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/api/predictions/detailed", headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert response.status_code == 200
+    predictions = response.json()
+    assert [p["match"]["id"] for p in predictions] == [
+        f"count-match-{i}" for i in reversed(range(5))
+    ]
+    # One query to authenticate the user, one for predictions with matches
+    assert len(statements) == 2
@@ -0,0 +1,455 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import crud, sql_models, versioning
+from app.services import match_updater
+from app.services.leaderboard import leaderboard
+from app.services.score_tracker import rebuild_user_scores
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    assert response.status_code == 201
+    data = response.json()
+    return data["token"], data["user"]["id"]
+
+
+def make_admin(db, user_id):
+    user = db.query(sql_models.User).filter(sql_models.User.id == user_id).first()
+    user.role = "admin"
+    db.commit()
+
+
+def add_match(db, match_id, stage=None):
+    match = sql_models.Match(
+        id=match_id,
+        homeTeam="Team A",
+        awayTeam="Team B",
+        date=datetime.utcnow() + timedelta(hours=3),
+        status="upcoming",
+        stage=stage,
+    )
+    db.add(match)
+    db.commit()
+    return match
+
+
+def predict(client, token, match_id, home, away):
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": match_id, "homeScore": home, "awayScore": away},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+
+
+def set_result(client, token, match_id, home, away):
+    response = client.post(
+        f"/api/admin/matches/{match_id}/set-result",
+        json={"homeScore": home, "awayScore": away, "status": "finished"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize("scoring_engine", ["sql", "numpy"])
+def test_user_scores_follow_set_result_and_recalculation(
+    client, db, monkeypatch, scoring_engine
+):
+    """user_scores is maintained by delta when points are set and recalculated"""
+    monkeypatch.setattr(match_updater, "SCORING_ENGINE", scoring_engine)
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    bob_token, bob_id = register(client, "bob@example.com", "Bob")
+
+    add_match(db, "m1")
+    predict(client, alice_token, "m1", 2, 1)
+    predict(client, bob_token, "m1", 0, 0)
+
+    set_result(client, admin_token, "m1", 2, 1)
+
+    ranking = client.get("/api/ranking").json()
+    assert [r["userId"] for r in ranking][:1] == [alice_id]
+    alice = next(r for r in ranking if r["userId"] == alice_id)
+    bob = next(r for r in ranking if r["userId"] == bob_id)
+    assert alice["points"] == 5 and alice["correctPredictions"] == 1
+    assert bob["points"] == 0 and bob["correctPredictions"] == 0
+
+    # Correct the result and recalculate: totals move by the difference only
+    match = db.query(sql_models.Match).filter(sql_models.Match.id == "m1").first()
+    match.homeScore, match.awayScore = 1, 1
+    db.commit()
+    response = client.post(
+        "/api/admin/matches/m1/recalculate-points",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+
+    scores = {s.userId: s for s in db.query(sql_models.UserScore).all()}
+    assert scores[alice_id].points == 1  # one_score_match
+    assert scores[bob_id].points == 4  # draw with same goal difference
+    assert scores[alice_id].exactPredictions == 0
+    assert scores[bob_id].correctPredictions == 1
+
+    # A full rebuild from predictions agrees with the incremental totals
+    rebuild_user_scores(db)
+    rebuilt = {s.userId: s for s in db.query(sql_models.UserScore).all()}
+    for user_id in (alice_id, bob_id, admin_id):
+        assert rebuilt[user_id].points == scores[user_id].points
+        assert rebuilt[user_id].correctPredictions == scores[user_id].correctPredictions
+
+
+def test_sql_scoring_only_touches_the_scored_users(client, db, monkeypatch):
+    """The sql engine moves group and leaderboard totals, /sync and ETags per user"""
+    monkeypatch.setattr(match_updater, "SCORING_ENGINE", "sql")
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    _, bob_id = register(client, "bob@example.com", "Bob")
+    response = client.post(
+        "/api/groups",
+        json={"name": "Office"},
+        headers={"Authorization": f"Bearer {alice_token}"},
+    )
+    assert response.status_code == 201
+    group_id = response.json()["id"]
+
+    add_match(db, "m1", stage="Group Stage")
+    predict(client, alice_token, "m1", 2, 1)
+    alice_version = versioning.version(f"predictions:{alice_id}")
+    bob_version = versioning.version(f"predictions:{bob_id}")
+    table_version = versioning.version("predictions")
+    set_result(client, admin_token, "m1", 2, 1)
+
+    assert versioning.version(f"predictions:{alice_id}") > alice_version
+    assert versioning.version(f"predictions:{bob_id}") == bob_version
+    assert versioning.version("predictions") == table_version
+    member = db.get(sql_models.GroupMember, (group_id, alice_id))
+    db.refresh(member)
+    assert member.points == 5 and member.exactPredictions == 1
+    stage = db.get(sql_models.UserStageScore, (alice_id, "Group Stage"))
+    assert stage.points == 5
+    logged = db.query(sql_models.ChangeLog).filter_by(entity="prediction").all()
+    assert [entry.userId for entry in logged][-1:] == [alice_id]
+    me = client.get(
+        "/api/ranking/me",
+        params={"radius": 0},
+        headers={"Authorization": f"Bearer {alice_token}"},
+    ).json()["me"]
+    assert me["points"] == 5
+
+
+def test_stage_rollups_back_stage_ranking_and_breakdown(client, db):
+    """user_stage_scores follows scoring per stage and agrees with a rebuild"""
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    bob_token, bob_id = register(client, "bob@example.com", "Bob")
+
+    add_match(db, "m1", stage="Group Stage")
+    add_match(db, "m2", stage="Round of 16")
+    predict(client, alice_token, "m1", 2, 1)
+    predict(client, bob_token, "m1", 0, 0)
+    predict(client, alice_token, "m2", 0, 2)
+    predict(client, bob_token, "m2", 1, 0)
+    set_result(client, admin_token, "m1", 2, 1)
+    set_result(client, admin_token, "m2", 1, 0)
+
+    knockout = client.get("/api/ranking", params={"stage": "Round of 16"}).json()
+    assert [(r["userId"], r["points"], r["position"]) for r in knockout] == [
+        (bob_id, 5, 1),
+        (alice_id, 0, 2),
+    ]
+    top = client.get("/api/ranking", params={"stage": "Round of 16", "limit": 1})
+    assert [r["userId"] for r in top.json()] == [bob_id]
+
+    auth = {"Authorization": f"Bearer {alice_token}"}
+    stages = client.get("/api/ranking/me/stages", headers=auth).json()
+    assert [(s["stage"], s["points"], s["position"]) for s in stages] == [
+        ("Group Stage", 5, 1),
+        ("Round of 16", 0, 2),
+    ]
+    assert stages[0]["exactPredictions"] == 1
+
+    # Recalculating a corrected result moves only that stage's totals
+    match = db.query(sql_models.Match).filter(sql_models.Match.id == "m1").first()
+    match.homeScore, match.awayScore = 0, 0
+    db.commit()
+    client.post(
+        "/api/admin/matches/m1/recalculate-points",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    group_stage = client.get("/api/ranking", params={"stage": "Group Stage"}).json()
+    assert [(r["userId"], r["points"]) for r in group_stage] == [
+        (bob_id, 5),
+        (alice_id, 0),
+    ]
+
+    def stage_totals():
+        return {
+            (s.userId, s.stage): (s.points, s.correctPredictions, s.exactPredictions)
+            for s in db.query(sql_models.UserStageScore).all()
+        }
+
+    incremental = stage_totals()
+    rebuild_user_scores(db)
+    assert stage_totals() == incremental
+
+
+def test_ranking_ties_share_position_with_tie_breakers(client, db):
+    """Positions come from RANK(): exact results break ties, full ties share"""
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    bob_token, bob_id = register(client, "bob@example.com", "Bob")
+    carol_token, carol_id = register(client, "carol@example.com", "Carol")
+
+    add_match(db, "m1")
+    add_match(db, "m2")
+    # Alice: exact (5) + nothing (0); Bob: 4 + 1; Carol: 4 + 1
+    predict(client, alice_token, "m1", 2, 1)
+    predict(client, alice_token, "m2", 0, 3)
+    predict(client, bob_token, "m1", 3, 2)
+    predict(client, bob_token, "m2", 1, 2)
+    predict(client, carol_token, "m1", 3, 2)
+    predict(client, carol_token, "m2", 1, 2)
+    set_result(client, admin_token, "m1", 2, 1)
+    set_result(client, admin_token, "m2", 1, 0)
+
+    ranking = client.get("/api/ranking").json()
+    positions = {r["userId"]: r["position"] for r in ranking}
+    assert positions[alice_id] == 1  # 5 points, more exact results
+    assert positions[bob_id] == positions[carol_id] == 2
+    assert positions[admin_id] == 4
+    assert [r["userId"] for r in ranking][1:3] == sorted([bob_id, carol_id])
+
+    # Aggregating predictions directly gives the same ranking
+    aggregated = crud.get_ranking(db, crud.user_totals_query().subquery())
+    assert [dict(r) for r in aggregated] == [dict(r) for r in crud.get_ranking(db)]
+
+
+def seed_scores(db, totals):
+    """Insert users with given (points, exact, correct) totals directly"""
+    for i, (points, exact, correct) in enumerate(totals):
+        user_id = f"user-{i:02d}"
+        db.add(
+            sql_models.User(id=user_id, email=f"{user_id}@example.com", name=user_id)
+        )
+        db.add(
+            sql_models.UserScore(
+                userId=user_id,
+                points=points,
+                exactPredictions=exact,
+                correctPredictions=correct,
+            )
+        )
+    db.commit()
+
+
+def test_ranking_keyset_pages_match_full_ranking(client, db):
+    """Walking /ranking with limit/after yields the same rows and positions"""
+    seed_scores(
+        db,
+        [(10, 1, 2), (7, 0, 2), (10, 1, 2), (3, 0, 1), (7, 1, 2), (0, 0, 0), (7, 0, 2)]
+        + [(5, 0, 1)] * 4,
+    )
+    full = client.get("/api/ranking").json()
+
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["after"] = cursor
+        response = client.get("/api/ranking", params=params)
+        assert response.status_code == 200
+        pages.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == full
+    assert (
+        client.get("/api/ranking", params={"limit": 3, "after": "bogus"}).status_code
+        == 400
+    )
+
+
+def test_ranking_around_me(client, db):
+    """/ranking/me returns the caller's position and neighbours"""
+    seed_scores(db, [(20, 0, 4), (15, 0, 3), (12, 0, 3), (12, 0, 3), (1, 0, 1)])
+    token, user_id = register(client, "me@example.com", "Me")  # 0 points, last
+
+    full = client.get("/api/ranking").json()
+    response = client.get(
+        "/api/ranking/me",
+        params={"radius": 2},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    window = response.json()
+    assert window["me"] == full[-1]
+    assert window["above"] == full[-3:-1]
+    assert window["below"] == []
+
+    # A user in the middle of a tie
+    db.query(sql_models.UserScore).filter(
+        sql_models.UserScore.userId == user_id
+    ).update({"points": 12, "correctPredictions": 3})
+    db.commit()
+    full = client.get("/api/ranking").json()
+    index = next(i for i, r in enumerate(full) if r["userId"] == user_id)
+    window = client.get(
+        "/api/ranking/me",
+        params={"radius": 1},
+        headers={"Authorization": f"Bearer {token}"},
+    ).json()
+    assert window["me"]["position"] == 3
+    assert window["above"] == full[index - 1 : index]
+    assert window["below"] == full[index + 1 : index + 2]
+
+
+def test_ranking_served_from_loaded_leaderboard(client, db):
+    """Once loaded, the in-memory leaderboard follows committed point changes"""
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+
+    leaderboard.load(crud.get_ranking(db))
+    try:
+        bob_token, bob_id = register(client, "bob@example.com", "Bob")
+        add_match(db, "m1")
+        predict(client, alice_token, "m1", 1, 0)
+        predict(client, bob_token, "m1", 2, 0)
+        set_result(client, admin_token, "m1", 2, 0)
+
+        assert leaderboard.rank_of(bob_id) == 1
+        assert client.get("/api/ranking").json() == [
+            dict(r) for r in crud.get_ranking(db)
+        ]
+        page = client.get("/api/ranking", params={"limit": 2}).json()
+        assert [r["userId"] for r in page] == [bob_id, alice_id]
+    finally:
+        leaderboard.reset()
+
+
+def test_ranking_snapshots_record_position_changes(client, db):
+    """Each scored match appends a snapshot; history shows position movement"""
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    bob_token, bob_id = register(client, "bob@example.com", "Bob")
+    auth = {"Authorization": f"Bearer {alice_token}"}
+
+    add_match(db, "m1")
+    add_match(db, "m2")
+    predict(client, alice_token, "m1", 0, 0)
+    predict(client, bob_token, "m1", 1, 0)
+    predict(client, alice_token, "m2", 3, 0)
+    predict(client, bob_token, "m2", 0, 2)
+
+    set_result(client, admin_token, "m1", 1, 0)  # Bob 5, Alice 1
+    set_result(client, admin_token, "m2", 3, 0)  # Alice 1+5, Bob 5+0
+
+    snapshots = client.get("/api/ranking/snapshots").json()
+    assert [s["matchId"] for s in snapshots] == ["m2", "m1"]
+    first, second = snapshots[1]["sequence"], snapshots[0]["sequence"]
+
+    history = client.get("/api/ranking/me/history", headers=auth).json()
+    assert [h["sequence"] for h in history] == [first, second]
+    assert [h["points"] for h in history] == [1, 6]
+    assert [h["position"] for h in history] == [2, 1]
+    assert [h["positionChange"] for h in history] == [None, 1]
+
+    as_of_first = client.get(f"/api/ranking/snapshots/{first}").json()
+    assert as_of_first[0]["userId"] == bob_id
+    assert as_of_first[0]["position"] == 1
+    assert client.get("/api/ranking/snapshots/999").status_code == 404
+
+
+def test_scrape_batches_snapshot_each_match_in_order(client, db):
+    """Matches finishing in one scrape get a snapshot each, by kickoff"""
+    admin_token, admin_id = register(client, "admin@example.com", "Admin")
+    make_admin(db, admin_id)
+    alice_token, alice_id = register(client, "alice@example.com", "Alice")
+    bob_token, _ = register(client, "bob@example.com", "Bob")
+
+    late = add_match(db, "late")
+    early = add_match(db, "early")
+    predict(client, alice_token, "early", 1, 0)
+    predict(client, bob_token, "late", 2, 2)
+    early.date = late.date - timedelta(hours=2)
+    for match, score in ((early, (1, 0)), (late, (2, 2))):
+        match.homeScore, match.awayScore = score
+        match.status = "finished"
+    db.commit()
+
+    match_updater.calculate_points_for_matches(db, ["late", "early"])
+    snapshots = client.get("/api/ranking/snapshots").json()
+    assert [s["matchId"] for s in snapshots] == ["late", "early"]
+
+    # A recalculation leaves its own snapshot with the corrected totals
+    early.homeScore, early.awayScore = 0, 3
+    db.commit()
+    client.post(
+        "/api/admin/matches/early/recalculate-points",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    latest = client.get("/api/ranking/snapshots", params={"limit": 1}).json()[0]
+    assert latest["matchId"] == "early"
+    ranking = client.get(f"/api/ranking/snapshots/{latest['sequence']}").json()
+    assert next(r for r in ranking if r["userId"] == alice_id)["points"] == 0
@@ -0,0 +1,144 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from datetime import datetime, timedelta
+from app.database import Base, get_db
+from app import sql_models
+
+# Use in-memory SQLite database for tests
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(scope="function")
+def db(db_engine):
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = TestingSessionLocal(bind=connection)
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def test_client(db):
+    def override_get_db():
+        yield db
+
+    from app.main import app
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    del app.dependency_overrides[get_db]
+
+
+@pytest.fixture
+def client(test_client):
+    return test_client
+
+
+def register(client, email, name):
+    response = client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "password123", "name": name},
+    )
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def add_match(db, match_id):
+    db.add(
+        sql_models.Match(
+            id=match_id,
+            homeTeam="Team A",
+            awayTeam="Team B",
+            date=datetime.utcnow() + timedelta(days=1),
+            status="upcoming",
+        )
+    )
+    db.commit()
+
+
+def predict(client, headers, match_id, home, away):
+    response = client.post(
+        "/api/predictions",
+        json={"matchId": match_id, "homeScore": home, "awayScore": away},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.fixture
+def no_grace(monkeypatch):
+    """Make a timestamp sync read only what changed after it"""
+    from app import changelog
+
+    monkeypatch.setattr(changelog, "COMMIT_GRACE", timedelta(0))
+
+
+def test_sync_returns_only_changes_since_watermark(client, db):
+    """Each sync returns what changed after the previous watermark"""
+    from app import crud
+
+    alice = register(client, "alice@example.com", "Alice")
+    bob = register(client, "bob@example.com", "Bob")
+    add_match(db, "m1")
+    add_match(db, "m2")
+
+    full = client.get("/api/sync", headers=alice).json()
+    assert {m["id"] for m in full["matches"]} == {"m1", "m2"}
+    watermark = full["watermark"]
+
+    mine = predict(client, alice, "m1", 1, 0)
+    predict(client, bob, "m2", 2, 2)
+    crud.update_match(db, "m2", stadium="Azteca")
+
+    delta = client.get("/api/sync", params={"since": watermark}, headers=alice)
+    data = delta.json()
+    assert [m["id"] for m in data["matches"]] == ["m2"]
+    assert data["matches"][0]["stadium"] == "Azteca"
+    assert [p["id"] for p in data["predictions"]] == [mine["id"]]
+    assert data["deleted"] == []
+    assert data["watermark"] > watermark
+
+    empty = client.get(
+        "/api/sync", params={"since": data["watermark"]}, headers=alice
+    ).json()
+    assert empty["matches"] == [] and empty["predictions"] == []
+
+    db.delete(db.get(sql_models.Prediction, mine["id"]))
+    db.commit()
+    gone = client.get(
+        "/api/sync", params={"since": data["watermark"]}, headers=alice
+    ).json()
+    assert gone["deleted"] == [{"entity": "prediction", "id": mine["id"]}]
+
+
+def test_sync_since_timestamp_and_invalid_watermark(client, db, no_grace):
+    """A timestamp watermark reads updatedAt; garbage is rejected"""
+    alice = register(client, "alice2@example.com", "Alice")
+    add_match(db, "m3")
+    since = datetime.utcnow().isoformat()
+    predict(client, alice, "m3", 0, 0)
+
+    data = client.get("/api/sync", params={"since": since}, headers=alice).json()
+    assert [p["matchId"] for p in data["predictions"]] == ["m3"]
+
+    bad = client.get("/api/sync", params={"since": "yesterday"}, headers=alice)
+    assert bad.status_code == 400
@@ -4,6 +4,9 @@ import type { components } from "@/types/api";
 
 type Prediction = components["schemas"]["Prediction"];
 
+// Wait before asking for a new stream token, in milliseconds
+const RECONNECT_MS = 5000;
+
 export const useNotifications = (enabled: boolean = true) => {
   const [unnotifiedPredictions, setUnnotifiedPredictions] = useState<Prediction[]>([]);
   const [notificationCount, setNotificationCount] = useState(0);
@@ -11,28 +14,62 @@ export const useNotifications = (enabled: boolean = true) => {
 
   useEffect(() => {
     if (!enabled) return;
+    if (!localStorage.getItem("token")) return;
 
-    const fetchUnnotified = async () => {
-      try {
-        const { data } = await client.GET("/api/predictions/unnotified");
-        if (data) {
-          setUnnotifiedPredictions(data);
-          setNotificationCount(data.length);
-        }
-      } catch (error) {
-        console.error("Failed to fetch unnotified predictions", error);
+    const baseUrl = import.meta.env.VITE_API_URL || "";
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let stopped = false;
+
+    // Server pushes points as they are scored. EventSource cannot send
+    // headers, so it opens the stream with a short-lived stream-only token
+    // instead of the access token, which would otherwise end up in URLs and
+    // logs. It reconnects on its own with Last-Event-ID; once the token has
+    // expired the server refuses, and a fresh token reopens the stream
+    // (pending points are replayed then)
+    const connect = async () => {
+      const { data } = await client
+        .POST("/api/notifications/stream-token")
+        .catch(() => ({ data: undefined }));
+      if (stopped) return;
+      if (!data) {
+        retry = setTimeout(connect, RECONNECT_MS);
+        return;
       }
-    };
 
-    // Fetch immediately
-    fetchUnnotified();
+      source = new EventSource(
+        `${baseUrl}/api/notifications/stream?token=${encodeURIComponent(data.token)}`
+      );
 
-    // Poll every 30 seconds
-    const interval = setInterval(fetchUnnotified, 30000);
+      source.addEventListener("points", (event) => {
+        const prediction: Prediction = JSON.parse((event as MessageEvent).data);
+        setUnnotifiedPredictions((current) => [
+          ...current.filter((p) => p.id !== prediction.id),
+          prediction,
+        ]);
+      });
 
-    return () => clearInterval(interval);
+      source.onerror = () => {
+        console.error("Notification stream interrupted, reconnecting");
+        if (source?.readyState === EventSource.CLOSED) {
+          retry = setTimeout(connect, RECONNECT_MS);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      stopped = true;
+      clearTimeout(retry);
+      source?.close();
+    };
   }, [enabled]);
 
+  useEffect(() => {
+    setNotificationCount(unnotifiedPredictions.length);
+  }, [unnotifiedPredictions]);
+
   const openNotificationCenter = () => {
     setIsOpen(true);
   };
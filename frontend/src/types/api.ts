@@ -524,8 +524,8 @@ export interface components {
             description?: string | null;
             adminId: string;
             playerCount?: number;
-            inviteCode: string;
-            inviteLink?: string;
+            inviteCode?: string | null;
+            inviteLink?: string | null;
             /** @enum {string} */
             scoringSystem: "classic" | "extended" | "simple";
             /** Format: date-time */